@@ -0,0 +1,384 @@
+import os
+import sys
+import csv
+import heapq
+import sqlite3
+import argparse
+from itertools import islice
+from datetime import date, timedelta
+
+import history
+import storage
+
+# ===================== 管理命令行（无需启动游戏/显示器） =====================
+# 用法：python admin.py <子命令> [参数]，适合在服务器上做夜间批量维护
+# 所有读取都是流式的，导入按批次处理，写回用临时文件+原子替换
+
+CSV_HEADER = ["username", "password", "best_score", "points", "owned_weapons", "current_weapon", "last_level"]
+
+
+def _batches(iterable, size):
+    """把可迭代对象切分为固定大小的批次"""
+    it = iter(iterable)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+# ===================== 玩家导入/导出 =====================
+def cmd_export_players(args):
+    """流式导出所有玩家到CSV（已购武器用|分隔）"""
+    count = 0
+    with open(args.output, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        for batch in _batches(storage.iter_users(), args.batch_size):
+            writer.writerows([u["username"], u["password"], u["best_score"], u["points"],
+                              "|".join(u["owned_weapons"]), u["current_weapon"], u["last_level"]]
+                             for u in batch)
+            count += len(batch)
+    print(f"已导出 {count} 名玩家到 {args.output}")
+
+
+def _read_player_csv(path, stats):
+    """流式读取玩家CSV，逐行转换为玩家字典；无效行跳过并提示行号，计入stats["invalid"]"""
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            if not row.get("username"):
+                print(f"第{reader.line_num}行：用户名为空，已跳过")
+                stats["invalid"] += 1
+                continue
+            owned = [w for w in (row.get("owned_weapons") or "").split("|") if w] or ['普通子弹']
+            try:
+                user = {
+                    "username": row["username"],
+                    "password": row.get("password") or "",
+                    "best_score": int(row.get("best_score") or 0),
+                    "points": int(row.get("points") or 0),
+                    "owned_weapons": owned,
+                    "current_weapon": row.get("current_weapon") or owned[0],
+                    "last_level": int(row.get("last_level") or 1),
+                }
+            except ValueError as e:
+                print(f"第{reader.line_num}行（{row['username']}）无效：{e}，已跳过")
+                stats["invalid"] += 1
+                continue
+            yield user
+
+
+def cmd_import_players(args):
+    """按批次合并CSV中的玩家：已存在的玩家被覆盖（--keep-existing则跳过）；
+    每批读完即提交（一次追加日志），内存中只保留当前批次，中途中断时已提交的批次保留"""
+    storage.init_weapon_db()  # 已购武器按武器库ID编码，先确保武器目录存在
+    names = None
+    if args.dry_run:
+        names = {u["username"] for u in storage.iter_users()}
+    added = updated = skipped = 0
+    stats = {"invalid": 0}
+    for batch_no, batch in enumerate(_batches(_read_player_csv(args.input, stats), args.batch_size), 1):
+        if args.dry_run:
+            for user in batch:
+                if user["username"] not in names:
+                    names.add(user["username"])
+                    added += 1
+                elif args.keep_existing:
+                    skipped += 1
+                else:
+                    updated += 1
+        else:
+            counts = storage.put_users(batch, args.keep_existing)
+            added, updated, skipped = added + counts[0], updated + counts[1], skipped + counts[2]
+        print(f"批次 {batch_no}：累计新增 {added} | 覆盖 {updated} | 跳过 {skipped} | 无效行 {stats['invalid']}")
+
+    if args.dry_run:
+        print(f"试运行，未写入（无效行 {stats['invalid']}）")
+        return
+    print(f"导入完成：新增 {added} 名玩家，覆盖 {updated} 名，跳过无效行 {stats['invalid']}")
+
+
+# ===================== 排行榜 =====================
+def cmd_leaderboard(args):
+    """流式重算排行榜：只在堆中保留前K名，不整体排序"""
+    top = heapq.nlargest(args.top, storage.iter_users(), key=lambda u: u["best_score"]) if args.top \
+        else sorted(storage.iter_users(), key=lambda u: u["best_score"], reverse=True)
+    ranking = [{"username": u["username"], "best_score": u["best_score"],
+                "points": u["points"], "last_level": u["last_level"]} for u in top]
+    if args.output:
+        success, msg = storage.export_full_ranking_data(ranking, args.output)
+        print(msg)
+        if not success:
+            sys.exit(1)
+        return
+    for idx, user in enumerate(ranking, 1):
+        print(f"{idx}\t{user['username']}\t{user['best_score']}\t{user['points']}\t{user['last_level']}")
+
+
+# ===================== 武器目录 =====================
+def cmd_weapon(args):
+    """武器目录增删改查"""
+    storage.init_weapon_db()  # 旧版本/新建的武器库先迁移到最新结构（已是最新时不写库）
+    if args.action == "list":
+        for name, (price, damage, bullet_type) in storage.get_weapon_catalog().items():
+            print(f"{name}\t价格 {price}\t伤害 {damage}\t{bullet_type}")
+    elif args.action == "seed":
+        print(f"从 {args.file} 新增武器 {storage.seed_weapons(args.file)} 个（已有武器不变）")
+    elif args.action == "reset":
+        storage.reset_weapon_catalog(args.file)
+        print(f"武器目录已恢复为 {args.file}")
+    elif args.action == "delete":
+        if not storage.delete_weapon(args.name):
+            print(f"武器不存在：{args.name}")
+            sys.exit(1)
+        print(f"已删除武器：{args.name}")
+    else:
+        current = storage.get_weapon_info(args.name)
+        if args.action == "add" and current:
+            print(f"武器名称 {args.name} 已存在（添加失败）")
+            sys.exit(1)
+        if args.action == "update" and not current:
+            print(f"武器不存在：{args.name}")
+            sys.exit(1)
+        price, damage, bullet_type = current or (0, 10, "normal")
+        storage.save_weapon(args.name,
+                            price if args.price is None else args.price,
+                            damage if args.damage is None else args.damage,
+                            args.bullet_type or bullet_type)
+        print(f"已保存武器：{args.name}")
+
+
+# ===================== 对局历史 =====================
+def cmd_history(args):
+    """单个玩家最近的对局"""
+    runs = history.get_history().user_history(args.username, args.limit)
+    if not runs:
+        print(f"没有 {args.username} 的对局记录")
+        return
+    for run in runs:
+        print(f"{run['time']:%Y-%m-%d %H:%M:%S}\t关卡 {run['level']}\t得分 {run['score']}\t击杀 {run['kills']}\t"
+              f"{run['duration'] // 60}分{run['duration'] % 60:02d}秒\t{run['weapon']}\t"
+              f"{history.CAUSE_NAMES[run['cause']]}")
+
+
+def cmd_active(args):
+    """每日活跃玩家数（最近N天）"""
+    first = date.today() - timedelta(days=args.days - 1) if args.days else None
+    for day, count in history.get_history().daily_active_players(first):
+        print(f"{day}\t{count}")
+
+
+def cmd_scores(args):
+    """各关卡得分分布"""
+    for level, buckets in history.get_history().score_distribution(args.level, args.bucket).items():
+        total = sum(count for _, count in buckets)
+        print(f"关卡 {level}（{total} 局）")
+        for start, count in buckets:
+            print(f"  {start:>6}-{start + args.bucket - 1:<6}\t{count}\t{'#' * max(1, count * 40 // total)}")
+
+
+def cmd_report(args):
+    """经营报表（只读汇总表）：各关卡平均得分、武器使用率、流失点、每日概况"""
+    runs = history.get_history()
+    if args.kind == "levels":
+        print("关卡\t局数\t平均得分\t最高分\t平均击杀\t平均时长\t被撞毁")
+        for level, count, avg_score, max_score, avg_kills, avg_duration, death_rate in runs.level_report():
+            print(f"{level}\t{count}\t{avg_score:.0f}\t{max_score}\t{avg_kills:.1f}\t{avg_duration:.0f}秒\t"
+                  f"{death_rate:.0%}")
+    elif args.kind == "weapons":
+        first = date.today() - timedelta(days=args.days - 1) if args.days else None
+        for name, count, share in runs.weapon_report(first):
+            print(f"{name}\t{count}局\t{share:.1%}")
+    elif args.kind == "churn":
+        print("关卡\t停在该关\t到达该关\t停留比例")
+        for level, stopped, reached, rate in runs.churn_report():
+            print(f"{level}\t{stopped}\t{reached}\t{rate:.1%}")
+    else:
+        first = date.today() - timedelta(days=args.days - 1) if args.days else None
+        for day, count, players, avg_score in runs.daily_report(first):
+            print(f"{day}\t{count}局\t{players}人\t平均得分 {avg_score:.0f}")
+
+
+def cmd_rollup(args):
+    """从对局历史重新生成汇总表（一次流式遍历）"""
+    print(f"已回填 {history.get_history().rebuild_rollups()} 局")
+
+
+# ===================== 压缩/完整性检查 =====================
+def cmd_compact(args):
+    """压缩玩家文件（合并日志、去掉重复用户名）并对武器库执行VACUUM"""
+    before = os.path.getsize(storage.USER_FILE) if os.path.exists(storage.USER_FILE) else 0
+    # 持文件锁重写快照：内存表已按用户名去重（保留第一条，与登录时按文件顺序匹配一致），不会覆盖其他机器的写入
+    count = storage.checkpoint_users(force=True)
+    print(f"玩家文件：{count} 名玩家，{before} -> {os.path.getsize(storage.USER_FILE)} 字节")
+    if os.path.exists(storage.DB_FILE):
+        conn = sqlite3.connect(storage.DB_FILE, timeout=10)
+        try:
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+        print(f"武器库已压缩：{storage.DB_FILE}")
+
+
+def _check_user_records(data, offset, label, weapon_names, players, snapshot):
+    """检查一段玩家记录（快照或日志），把玩家名按记录顺序应用到players；返回发现的问题数"""
+    problems = 0
+    end = offset
+    record_no = 0
+    for end, op, username, _, _, _, mask, current_id, _ in storage.iter_raw_user_records(data, offset):
+        record_no += 1
+        if op == storage.OP_RESET and not snapshot:
+            players.clear()
+            continue
+        if op != storage.OP_PUT:
+            print(f"{label}第{record_no}条记录：{'快照中出现非玩家记录' if snapshot else '未知操作'}（操作{op}）")
+            problems += 1
+            continue
+        if snapshot and username in players:
+            print(f"{label}第{record_no}条记录：重复用户名 {username}")
+            problems += 1
+        players.add(username)
+        if weapon_names:
+            owned_ids = [i + 1 for i in range(mask.bit_length()) if mask >> i & 1]
+            unknown = sorted({i for i in owned_ids + [current_id] if i and i not in weapon_names})
+            if unknown:
+                print(f"{label}第{record_no}条记录：未知武器ID {unknown}")
+                problems += 1
+        if current_id and not mask >> (current_id - 1) & 1:
+            print(f"{label}第{record_no}条记录：当前武器未购买 {weapon_names.get(current_id, current_id)}")
+            problems += 1
+    if end != len(data):
+        print(f"{label}第{record_no + 1}条记录：损坏（偏移{end}，校验失败或被截断，"
+              f"之后{len(data) - end}字节{'被忽略' if snapshot else '在下次写入时丢弃'}）")
+        problems += 1
+    return problems
+
+
+def cmd_check(args):
+    """完整性检查：文件头、损坏记录、重复用户、未知武器、数据库完整性；有问题时退出码为1
+    只读：不压缩日志、不截断损坏的尾部（修复用 compact）"""
+    problems = 0
+    weapon_names = {}
+    if os.path.exists(storage.DB_FILE):
+        conn = sqlite3.connect(storage.DB_FILE, timeout=10)
+        try:
+            result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+            version = storage.schema_version(conn)
+        finally:
+            conn.close()
+        if result != "ok":
+            print(f"武器库损坏：{result}")
+            problems += 1
+        latest = storage.WEAPON_MIGRATIONS[-1][0]
+        print(f"武器库结构版本 {version}/{latest}")
+        if version < latest:
+            print("武器库结构不是最新（启动游戏或执行任意weapon命令即可迁移）")
+            problems += 1
+        try:
+            weapon_names = {weapon_id: name for name, weapon_id in storage.get_weapon_ids().items()} \
+                if storage.get_weapon_catalog() else {}
+        except sqlite3.Error as e:
+            print(f"武器目录不可读：{e}")
+            problems += 1
+    else:
+        print(f"武器库不存在：{storage.DB_FILE}")
+        problems += 1
+
+    players = set()
+    journal_path = storage.USER_FILE + storage.JOURNAL_SUFFIX
+    if os.path.exists(storage.USER_FILE):
+        with open(storage.USER_FILE, "rb") as f:
+            data = f.read()
+        if not data.startswith(storage.USER_FILE_MAGIC):
+            print("文件头不匹配（不是二进制玩家文件）")
+            problems += 1
+        else:
+            problems += _check_user_records(data, len(storage.USER_FILE_MAGIC), "快照", weapon_names, players, True)
+    if os.path.exists(journal_path):
+        with open(journal_path, "rb") as f:
+            data = f.read()
+        if data:
+            print(f"日志中有 {len(data)} 字节尚未压缩")
+            problems += _check_user_records(data, 0, "日志", weapon_names, players, False)
+    if os.path.exists(storage.USER_FILE) or os.path.exists(journal_path):
+        print(f"玩家文件：{len(players)} 名玩家")
+
+    print("检查通过" if not problems else f"发现 {problems} 个问题")
+    if problems:
+        sys.exit(1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="外星人大战数据管理工具")
+    parser.add_argument("--user-file", help="玩家数据文件（默认桌面上的alien_war_users.dat）")
+    parser.add_argument("--db-file", help="武器数据库（默认桌面上的alien_war_weapons.db）")
+    parser.add_argument("--history-file", help="对局历史库（默认桌面上的alien_war_history.db）")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("export-players", help="导出玩家到CSV")
+    p.add_argument("output")
+    p.add_argument("--batch-size", type=int, default=1000)
+    p.set_defaults(func=cmd_export_players)
+
+    p = sub.add_parser("import-players", help="从CSV批量导入玩家")
+    p.add_argument("input")
+    p.add_argument("--batch-size", type=int, default=1000)
+    p.add_argument("--keep-existing", action="store_true", help="已存在的玩家不覆盖")
+    p.add_argument("--dry-run", action="store_true")
+    p.set_defaults(func=cmd_import_players)
+
+    p = sub.add_parser("leaderboard", help="重算排行榜")
+    p.add_argument("--top", type=int, default=0, help="只保留前K名（0=全部）")
+    p.add_argument("--output", help="导出到文件（默认打印）")
+    p.set_defaults(func=cmd_leaderboard)
+
+    p = sub.add_parser("weapon", help="武器目录管理")
+    p.add_argument("action", choices=["list", "add", "update", "delete", "seed", "reset"],
+                   help="seed：写入种子表中新增的武器；reset：目录恢复为种子表")
+    p.add_argument("name", nargs="?")
+    p.add_argument("--price", type=int)
+    p.add_argument("--damage", type=int)
+    p.add_argument("--bullet-type", choices=["normal", "laser", "missile", "super_laser"])
+    p.add_argument("--file", default=storage.WEAPON_FILE, help="武器种子表（seed/reset）")
+    p.set_defaults(func=cmd_weapon)
+
+    p = sub.add_parser("history", help="玩家最近的对局")
+    p.add_argument("username")
+    p.add_argument("--limit", type=int, default=20)
+    p.set_defaults(func=cmd_history)
+
+    p = sub.add_parser("active", help="每日活跃玩家数")
+    p.add_argument("--days", type=int, default=30, help="最近N天（0=全部）")
+    p.set_defaults(func=cmd_active)
+
+    p = sub.add_parser("scores", help="各关卡得分分布")
+    p.add_argument("--level", type=int, help="只看某一关")
+    p.add_argument("--bucket", type=int, default=100, help="分段大小")
+    p.set_defaults(func=cmd_scores)
+
+    p = sub.add_parser("report", help="经营报表（各关卡/武器使用率/流失点/每日概况）")
+    p.add_argument("kind", choices=["levels", "weapons", "churn", "daily"])
+    p.add_argument("--days", type=int, default=30, help="weapons/daily：最近N天（0=全部）")
+    p.set_defaults(func=cmd_report)
+
+    p = sub.add_parser("rollup", help="重新生成报表汇总表")
+    p.set_defaults(func=cmd_rollup)
+
+    p = sub.add_parser("compact", help="压缩玩家文件和武器库")
+    p.set_defaults(func=cmd_compact)
+
+    p = sub.add_parser("check", help="完整性检查")
+    p.set_defaults(func=cmd_check)
+
+    args = parser.parse_args(argv)
+    if args.command == "weapon" and args.action in ("add", "update", "delete") and not args.name:
+        parser.error("请指定武器名称")
+    if args.user_file:
+        storage.USER_FILE = args.user_file
+    if args.db_file:
+        storage.DB_FILE = args.db_file
+    if args.history_file:
+        history.HISTORY_FILE = args.history_file
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -1,24 +1,61 @@
 import pygame
 import sys
+import math
 import random
-import sqlite3
 import os
+import argparse
 import traceback
-from datetime import datetime
+from collections import deque
+from itertools import islice
+from functools import lru_cache
+
+import asset_pack
+import collision
+import history
+import leaderboard
+from particles import ParticleSystem
+from audio import AudioManager
+from events import EventBus, AlienHit, AlienKilled, ShipHit, LevelUp, WeaponSwitched
+from scene import Scene, SceneManager
+from profiler import FrameStats, ProfilerOverlay, QualityGovernor, QUALITY_NAMES, memory_usage_mb
+from waves import WaveTable, SpawnQueue
+from storage import (
+    DESKTOP_PATH, reset_users, recover_users, checkpoint_users,
+    save_user_async, check_user_async, get_user_data, get_owned_weapons, get_current_weapon,
+    update_user_data, purchase_weapon, get_all_users_ranking, export_full_ranking_data,
+    init_weapon_db, reset_weapon_catalog, get_weapon_catalog, get_bullet_type, submit_write, flush_writes
+)
 
 # ===================== 全局初始化 =====================
-pygame.init()
-
-# 游戏窗口设置
+# 游戏窗口设置（显示/音频由run()中的init_display()初始化，导入本模块不会打开窗口）
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
-SCREEN = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption('外星人大战 - 排行榜优化版')
+SCREEN = None
+SHIP_MASK = ALIEN_MASK = None  # 碰撞遮罩，load_assets()中生成；未加载图片（批量模拟）时为None，按矩形判断
+
+# 预打包资源（python asset_pack.py 生成；设为空字符串则强制使用散装文件）
+ASSET_PACK_FILE = os.environ.get("ALIEN_WAR_ASSET_PACK", asset_pack.PACK_FILE)
+
+# 关卡/波次表（首次使用时加载，见get_waves）
+WAVES = None
+
+# 碰撞检测后端（brute/rect/sweep/grid，见collision.py；命令行 --collision 可覆盖）
+COLLISION_BACKEND = os.environ.get("ALIEN_WAR_COLLISION", collision.DEFAULT_BACKEND)
+# 逐像素碰撞：矩形相交后再比较图片遮罩，飞船/外星人的透明区域不算碰撞（设为0则只用矩形）
+PIXEL_COLLISION = os.environ.get("ALIEN_WAR_PIXEL_COLLISION", "1") != "0"
 
-# 路径配置（账号/数据存桌面，易查找）
-DESKTOP_PATH = os.path.join(os.path.expanduser("~"), "Desktop")
-USER_FILE = os.path.join(DESKTOP_PATH, "alien_war_users.txt")  # 玩家数据文件
-DB_FILE = os.path.join(DESKTOP_PATH, "alien_war_weapons.db")  # 武器数据库
+# 联网排行榜（可选，"主机:端口"；命令行 --leaderboard 可覆盖，见leaderboard.py）
+LEADERBOARD_ADDRESS = os.environ.get("ALIEN_WAR_LEADERBOARD", "")
+LEADERBOARD = None  # LeaderboardClient，run()中按地址创建
+
+# 画质：auto按帧耗时自动升降档，或固定为 高/中/低/最低（命令行 --quality 可覆盖，见profiler.QualityGovernor）
+QUALITY_MODE = os.environ.get("ALIEN_WAR_QUALITY", "auto")
+QUALITY = QualityGovernor()  # create_scene_manager中挂到主循环上
+
+# 音频管理（通道分组/限频，背景音乐流式播放）
+AUDIO = AudioManager()
+EVENT_SOUNDS = {AlienHit: 'hit', ShipHit: 'hurt', LevelUp: 'level_up'}  # 游戏事件 -> 音效
+BGM_PATHS = ["sounds/bgm.wav", os.path.join(DESKTOP_PATH, "外星人大战", "sounds/bgm.wav")]
 
 # 游戏参数
 FPS = 60
@@ -42,10 +79,23 @@ YELLOW = (255, 255, 0)
 GRAY = (100, 100, 100)
 LIGHT_BLUE = (100, 180, 255)
 
+# 子弹参数（批量平衡模拟 simulate.py 会按参数网格缩放此表）
+BULLET_STATS = {
+    'normal': dict(speed=10, damage=10, color=YELLOW, width=BULLET_WIDTH, height=BULLET_HEIGHT,
+                   pierce=1, splash_radius=0, splash_damage=0),
+    'laser': dict(speed=15, damage=20, color=RED, width=8, height=BULLET_HEIGHT,
+                  pierce=1, splash_radius=0, splash_damage=0),
+    'missile': dict(speed=8, damage=30, color=GREEN, width=10, height=20,
+                    pierce=1, splash_radius=60, splash_damage=15),
+    'super_laser': dict(speed=20, damage=25, color=BLUE, width=8, height=BULLET_HEIGHT,
+                        pierce=None, splash_radius=0, splash_damage=0),
+}
+
 
 # ===================== 资源加载函数（修复核心） =====================
+@lru_cache(maxsize=None)
 def get_font(size):
-    """加载自定义字体（路径对应：外星人大战/fonts/font.ttf）"""
+    """加载自定义字体（路径对应：外星人大战/fonts/font.ttf）；按字号缓存，每帧绘制不再重复打开字体文件"""
     try:
         # 相对路径（推荐）：fonts文件夹和游戏脚本同目录，适配所有电脑
         font_path = "fonts/font.ttf"
@@ -63,8 +113,13 @@ def get_font(size):
         return pygame.font.Font(None, size)
 
 
-def load_image(path, width=None, height=None):
-    """加载图片（强化日志+绝对路径备选+强制缩放）"""
+def load_image(path, width=None, height=None, pack=None):
+    """加载图片（优先资源包，其次强化日志+绝对路径备选+强制缩放）"""
+    if pack is not None:
+        img = pack.image(path, width, height)
+        if img is not None:
+            return img
+
     # 1. 先尝试相对路径
     rel_path = path
     # 2. 备选绝对路径（适配桌面目录）
@@ -108,9 +163,33 @@ def load_image(path, width=None, height=None):
     return img
 
 
-def load_sound(filename, volume=0.5):
-    """加载音效（兼容文件缺失，设置音量）"""
+# 碰撞遮罩：按 (图片路径, 尺寸) 缓存，每张图片只生成一次，游戏中不再逐帧生成
+_sprite_masks = {}
+
+
+def load_mask(path, image):
+    """图片的碰撞遮罩（不透明像素为1）"""
+    key = (path, image.get_size())
+    mask = _sprite_masks.get(key)
+    if mask is None:
+        mask = _sprite_masks[key] = pygame.mask.from_surface(image)
+    return mask
+
+
+@lru_cache(maxsize=None)
+def rect_mask(width, height):
+    """实心矩形遮罩（子弹等没有图片的实体），按尺寸缓存"""
+    return pygame.mask.Mask((width, height), fill=True)
+
+
+def load_sound(filename, volume=0.5, pack=None):
+    """加载音效（优先资源包，兼容文件缺失，设置音量）"""
     sound_path = f"sounds/{filename}"
+    if pack is not None:
+        sound = pack.sound(sound_path, volume)
+        if sound is not None:
+            return sound
+
     abs_sound_path = os.path.join(DESKTOP_PATH, "外星人大战", sound_path)
 
     try:
@@ -132,240 +211,61 @@ def load_sound(filename, volume=0.5):
             return EmptySound()
 
 
-# ---------------------- 强制加载所有图片资源（修复核心） ----------------------
-# 背景图（强制800x600）
-BACKGROUND_IMG = load_image("images/background/bg_star.png", SCREEN_WIDTH, SCREEN_HEIGHT)
-# 飞船图（强制50x50）
-SHIP_IMG = load_image("images/ship/ship_white.png", SHIP_WIDTH, SHIP_HEIGHT)
-# 外星人图（强制50x50）
-ALIEN_IMG = load_image("images/alien/alien_red.png", ALIEN_WIDTH, ALIEN_HEIGHT)
-# 游戏图标（强制64x64）
-GAME_ICON = load_image("images/icon/game_icon.png", 64, 64)
-pygame.display.set_icon(GAME_ICON)  # 设置窗口图标
-
-# ---------------------- 加载所有音效资源 ----------------------
-BGM_SOUND = load_sound("bgm.wav", 0.4)  # 背景音乐（音量40%）
-SHOOT_SOUND = load_sound("shoot.wav", 0.6)  # 射击音效（音量60%）
-HIT_SOUND = load_sound("hit.wav", 0.7)  # 击中音效（音量70%）
-HURT_SOUND = load_sound("hurt.wav", 0.8)  # 受伤音效（音量80%）
-GAME_OVER_SOUND = load_sound("game_over.wav", 0.7)  # 游戏结束音效
-LEVEL_UP_SOUND = load_sound("level_up.wav", 0.7)  # 升级音效（可选）
-
-
-# ===================== 工具函数（无修改） =====================
-def save_user(username, password):
-    """注册新用户（初始化所有字段）"""
-    if not os.path.exists(USER_FILE):
-        with open(USER_FILE, "w", encoding="utf-8") as f:
-            f.write("username,password,best_score,points,owned_weapons,current_weapon,last_level\n")
-
-    with open(USER_FILE, "r+", encoding="utf-8") as f:
-        lines = f.readlines()
-        for line in lines[1:]:
-            if line.strip().split(",")[0] == username:
-                return False
-        f.write(f"{username},{password},0,0,普通子弹,普通子弹,1\n")
-        return True
-
-
-def check_user(username, password):
-    """验证登录"""
-    if not os.path.exists(USER_FILE):
-        return False
-    with open(USER_FILE, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-        for line in lines[1:]:
-            line = line.strip()
-            if not line:
-                continue
-            parts = line.split(",")
-            if len(parts) < 2:
-                continue
-            u = parts[0]
-            p = parts[1]
-            if u == username and p == password:
-                return True
-    return False
-
-
-def get_user_data(username):
-    """获取玩家核心数据"""
-    if not os.path.exists(USER_FILE):
-        return 0, 0, 1
-    with open(USER_FILE, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-        for line in lines[1:]:
-            line = line.strip()
-            if not line:
-                continue
-            parts = line.split(",")
-            if len(parts) < 1 or parts[0] != username:
-                continue
-            best = int(parts[2]) if (len(parts) >= 3 and parts[2].isdigit()) else 0
-            points = int(parts[3]) if (len(parts) >= 4 and parts[3].isdigit()) else 0
-            last_level = int(parts[6]) if (len(parts) >= 7 and parts[6].isdigit()) else 1
-            return best, points, last_level
-    return 0, 0, 1
-
-
-def get_owned_weapons(username):
-    """获取已购武器列表"""
-    if not os.path.exists(USER_FILE):
-        return ['普通子弹']
-    with open(USER_FILE, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-        for line in lines[1:]:
-            line = line.strip()
-            if not line:
-                continue
-            parts = line.split(",")
-            if len(parts) < 1 or parts[0] != username:
-                continue
-            owned = parts[4] if len(parts) >= 5 else '普通子弹'
-            return owned.split(",") if owned else ['普通子弹']
-    return ['普通子弹']
-
-
-def get_current_weapon(username):
-    """获取上次使用的武器"""
-    if not os.path.exists(USER_FILE):
-        return '普通子弹'
-    with open(USER_FILE, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-        for line in lines[1:]:
-            line = line.strip()
-            if not line:
-                continue
-            parts = line.split(",")
-            if len(parts) < 1 or parts[0] != username:
-                continue
-            return parts[5] if (len(parts) >= 6 and parts[5]) else '普通子弹'
-    return '普通子弹'
-
-
-def update_user_data(username, best_score=0, points=0, current_weapon="", last_level=0):
-    """更新玩家数据"""
-    if not os.path.exists(USER_FILE):
-        return
-    lines = []
-    with open(USER_FILE, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
-    for i in range(1, len(lines)):
-        line = lines[i].strip()
-        if not line:
-            continue
-        parts = line.split(",")
-        if len(parts) < 1 or parts[0] != username:
-            continue
-
-        pwd = parts[1] if len(parts) >= 2 else ""
-        old_best = int(parts[2]) if (len(parts) >= 3 and parts[2].isdigit()) else 0
-        old_points = int(parts[3]) if (len(parts) >= 4 and parts[3].isdigit()) else 0
-        old_owned = parts[4] if len(parts) >= 5 else "普通子弹"
-        old_weapon = parts[5] if len(parts) >= 6 else "普通子弹"
-        old_level = int(parts[6]) if (len(parts) >= 7 and parts[6].isdigit()) else 1
-
-        new_best = max(old_best, best_score) if best_score != 0 else old_best
-        new_points = old_points + points if points != 0 else old_points
-        new_weapon = current_weapon if current_weapon else old_weapon
-        new_level = last_level if last_level != 0 else old_level
-
-        lines[i] = f"{username},{pwd},{new_best},{new_points},{old_owned},{new_weapon},{new_level}\n"
-        break
-
-    with open(USER_FILE, "w", encoding="utf-8") as f:
-        f.writelines(lines)
-
-
-def save_owned_weapons(username, owned_weapons):
-    """保存已购武器列表"""
-    if not os.path.exists(USER_FILE):
-        return
-    lines = []
-    with open(USER_FILE, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
-    for i in range(1, len(lines)):
-        line = lines[i].strip()
-        if not line:
-            continue
-        parts = line.split(",")
-        if len(parts) < 1 or parts[0] != username:
-            continue
-
-        pwd = parts[1] if len(parts) >= 2 else ""
-        best = parts[2] if len(parts) >= 3 else "0"
-        points = parts[3] if len(parts) >= 4 else "0"
-        weapon = parts[5] if len(parts) >= 6 else "普通子弹"
-        level = parts[6] if len(parts) >= 7 else "1"
-        owned_str = ",".join(owned_weapons)
-
-        lines[i] = f"{username},{pwd},{best},{points},{owned_str},{weapon},{level}\n"
-        break
-
-    with open(USER_FILE, "w", encoding="utf-8") as f:
-        f.writelines(lines)
-
-
-def get_all_users_ranking():
-    """获取所有用户排行榜数据（按最佳分数降序）"""
-    if not os.path.exists(USER_FILE):
-        return []
-
-    ranking = []
-    with open(USER_FILE, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-        for line in lines[1:]:
-            line = line.strip()
-            if not line:
-                continue
-            parts = line.split(",")
-            if len(parts) < 3:
-                continue
-
-            username = parts[0]
-            best_score = int(parts[2]) if (parts[2].isdigit()) else 0
-            points = int(parts[3]) if (len(parts) >= 4 and parts[3].isdigit()) else 0
-            last_level = int(parts[6]) if (len(parts) >= 7 and parts[6].isdigit()) else 1
-
-            ranking.append({
-                "username": username,
-                "best_score": best_score,
-                "points": points,
-                "last_level": last_level
-            })
-
-    # 按最佳分数降序排序
-    ranking.sort(key=lambda x: x["best_score"], reverse=True)
-    return ranking
-
-
-def export_full_ranking_data():
-    """导出完整排行榜数据到桌面"""
-    ranking = get_all_users_ranking()
-    if not ranking:
-        return False, "暂无用户数据可导出"
-
-    # 生成导出文件名（带时间戳）
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    export_filename = f"alien_war_full_ranking_{timestamp}.txt"
-    export_path = os.path.join(DESKTOP_PATH, export_filename)
-
-    try:
-        with open(export_path, "w", encoding="utf-8") as f:
-            f.write("===== 外星人大战完整排行榜数据 =====\n")
-            f.write(f"导出时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("排名\t用户名\t最佳分数\t当前积分\t最高关卡\n")
-            f.write("-" * 60 + "\n")
-
-            for idx, user in enumerate(ranking, 1):
-                f.write(f"{idx}\t{user['username']}\t{user['best_score']}\t{user['points']}\t{user['last_level']}\n")
-
-            f.write("=" * 60 + "\n")
-        return True, f"完整排行榜已导出到桌面"
-    except Exception as e:
-        return False, f"导出失败：{str(e)}"
+def load_assets():
+    """加载所有图片/音效资源（资源包存在时直接映射原始数据，跳过解码）"""
+    global BACKGROUND_IMG, SHIP_IMG, ALIEN_IMG, GAME_ICON, SHIP_MASK, ALIEN_MASK
+    global SHOOT_SOUND, HIT_SOUND, HURT_SOUND, GAME_OVER_SOUND, LEVEL_UP_SOUND
+
+    pack = asset_pack.open_pack(ASSET_PACK_FILE)
+
+    # ---------------------- 强制加载所有图片资源（修复核心） ----------------------
+    # 背景图（强制800x600）
+    BACKGROUND_IMG = load_image("images/background/bg_star.png", SCREEN_WIDTH, SCREEN_HEIGHT, pack)
+    # 飞船图（强制50x50）
+    SHIP_IMG = load_image("images/ship/ship_white.png", SHIP_WIDTH, SHIP_HEIGHT, pack)
+    # 外星人图（强制50x50）
+    ALIEN_IMG = load_image("images/alien/alien_red.png", ALIEN_WIDTH, ALIEN_HEIGHT, pack)
+    # 逐像素碰撞用的遮罩（加载时生成一次）
+    SHIP_MASK = load_mask("images/ship/ship_white.png", SHIP_IMG)
+    ALIEN_MASK = load_mask("images/alien/alien_red.png", ALIEN_IMG)
+    # 游戏图标（强制64x64）
+    GAME_ICON = load_image("images/icon/game_icon.png", 64, 64, pack)
+    pygame.display.set_icon(GAME_ICON)  # 设置窗口图标
+
+    # ---------------------- 加载所有音效资源（背景音乐不预加载，游戏开始时流式播放） ----------------------
+    SHOOT_SOUND = load_sound("shoot.wav", 0.6, pack)  # 射击音效（音量60%）
+    HIT_SOUND = load_sound("hit.wav", 0.7, pack)  # 击中音效（音量70%）
+    HURT_SOUND = load_sound("hurt.wav", 0.8, pack)  # 受伤音效（音量80%）
+    GAME_OVER_SOUND = load_sound("game_over.wav", 0.7, pack)  # 游戏结束音效
+    LEVEL_UP_SOUND = load_sound("level_up.wav", 0.7, pack)  # 升级音效（可选）
+
+    # 登记到音频管理器：名称、通道分组、同名音效最小间隔（毫秒）
+    AUDIO.init()
+    AUDIO.register('shoot', SHOOT_SOUND, 'sfx', 60)
+    AUDIO.register('hit', HIT_SOUND, 'sfx', 50)
+    AUDIO.register('hurt', HURT_SOUND, 'sfx', 200)
+    AUDIO.register('game_over', GAME_OVER_SOUND, 'ui', 500)
+    AUDIO.register('level_up', LEVEL_UP_SOUND, 'ui', 500)
+
+    if pack is not None:
+        pack.close()
+
+
+def get_waves():
+    """关卡表（alien_war_waves.txt），首次调用时加载并预计算出生表"""
+    global WAVES
+    if WAVES is None:
+        WAVES = WaveTable(screen_width=SCREEN_WIDTH, alien_width=ALIEN_WIDTH)
+    return WAVES
+
+
+def init_display():
+    """初始化pygame、创建窗口并加载资源（只在真正进入游戏时调用）"""
+    global SCREEN
+    pygame.init()
+    SCREEN = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption('外星人大战 - 排行榜优化版')
+    load_assets()
 
 
 def draw_ranking_style(surface, x, y, width, height):
@@ -378,38 +278,116 @@ def draw_ranking_style(surface, x, y, width, height):
     surface.blit(bg_surface, (x, y))
 
 
-def ranking_interface():
+class RankingScene(Scene):
     """优化版排行榜界面（滚动/实时更新/适配窗口）"""
-    clock = pygame.time.Clock()
-    current_page = 1
     RANK_PER_PAGE = 6  # 每页显示6条，适配600窗口
-    selected_menu = 0
-    menu_options = ["导出完整数据", "刷新排行榜", "返回主菜单"]
-    tip_msg = ""
-    tip_color = WHITE
-
-    while running := True:
-        clock.tick(FPS)
+    LOCAL_REFRESH_MS = int(leaderboard.CACHE_TTL * 1000)  # 本机排行榜要复制并排序全部玩家，过期后才重新计算
 
+    def __init__(self):
+        super().__init__()
+        self.current_page = 1
+        self.selected_menu = 0
+        self.menu_options = ["导出完整数据", "刷新排行榜", "返回主菜单"]
+        self.tip_msg = ""
+        self.tip_color = WHITE
+        self.ranking = []
+        self.total_users = 0
+        self.source = "本机"
+        self.total_pages = 1
+        self.refresh_at = 0  # 下次重新读取排行榜的时间（毫秒）
+        self.handlers = {
+            'page_up': self.prev_page, 'page_down': self.next_page,
+            'up': self.select_prev, 'down': self.select_next,
+            'back': self.back, 'confirm': self.confirm,
+        }
+
+    def on_enter(self):
+        self.refresh()
+
+    def refresh(self, local=True):
+        # 联网时只读客户端缓存的前TOP_K名（过期由后台刷新，不阻塞）；未连上服务器时显示本机数据（local=False时不重算）
+        cached = LEADERBOARD.top() if LEADERBOARD is not None else None
+        if cached is not None:
+            self.total_users, self.ranking = cached
+            self.source = "联网" if LEADERBOARD.online else "联网缓存"
+        elif local:
+            self.ranking = get_all_users_ranking()
+            self.total_users = len(self.ranking)
+            self.source = "本机"
+            self.refresh_at = pygame.time.get_ticks() + self.LOCAL_REFRESH_MS
+        else:
+            return
+        self.total_pages = max(1, (len(self.ranking) + self.RANK_PER_PAGE - 1) // self.RANK_PER_PAGE)
+        self.current_page = min(self.current_page, self.total_pages)
+
+    def update(self, now):
+        # 联网缓存每帧读取（后台拉到新数据后立即显示）；本机排行榜过期后才重算
+        if LEADERBOARD is not None or now >= self.refresh_at:
+            self.refresh(local=now >= self.refresh_at)
+
+    def command_handlers(self):
+        return self.handlers
+
+    def handle_command(self, command):
+        self.tip_msg = ""
+        self.tip_color = WHITE
+        return super().handle_command(command)
+
+    # 排行榜翻页
+    def prev_page(self):
+        if self.current_page > 1:
+            self.current_page -= 1
+
+    def next_page(self):
+        if self.current_page < self.total_pages:
+            self.current_page += 1
+
+    # 菜单选择
+    def select_prev(self):
+        self.selected_menu = (self.selected_menu - 1) % len(self.menu_options)
+
+    def select_next(self):
+        self.selected_menu = (self.selected_menu + 1) % len(self.menu_options)
+
+    def back(self):
+        # ESC直接返回主菜单
+        self.manager.pop()
+
+    def confirm(self):
+        # 执行菜单操作
+        if self.selected_menu == 0:
+            # 导出完整数据
+            success, msg = export_full_ranking_data()
+            self.tip_msg = msg
+            self.tip_color = GREEN if success else RED
+        elif self.selected_menu == 1:
+            # 刷新排行榜（实时更新；联网时让后台立即重新拉取）
+            if LEADERBOARD is not None:
+                LEADERBOARD.invalidate()
+            self.refresh()
+            self.tip_msg = "排行榜已实时更新！"
+            self.tip_color = LIGHT_BLUE
+        elif self.selected_menu == 2:
+            # 返回主菜单
+            self.manager.pop()
+
+    def draw(self, surface):
         # ========== 强制绘制背景图（修复核心） ==========
         # 第一步：清空屏幕（必须）
-        SCREEN.fill(BLACK)
+        surface.fill(BLACK)
         # 第二步：绘制背景图（确保在最底层）
-        SCREEN.blit(BACKGROUND_IMG, (0, 0))
+        surface.blit(BACKGROUND_IMG, (0, 0))
 
-        # 实时获取最新排行榜数据
-        ranking = get_all_users_ranking()
-        total_users = len(ranking)
-        total_pages = max(1, (total_users + RANK_PER_PAGE - 1) // RANK_PER_PAGE)
+        total_users = self.total_users
 
         # 绘制排行榜背景和标题
         rank_x, rank_y = 30, 20
         rank_width, rank_height = 740, 380
-        draw_ranking_style(SCREEN, rank_x, rank_y, rank_width, rank_height)
+        draw_ranking_style(surface, rank_x, rank_y, rank_width, rank_height)
 
         # 排行榜标题
         title_text = get_font(40).render("玩家排行榜", True, YELLOW)
-        SCREEN.blit(title_text, (SCREEN_WIDTH // 2 - title_text.get_width() // 2, rank_y + 10))
+        surface.blit(title_text, (SCREEN_WIDTH // 2 - title_text.get_width() // 2, rank_y + 10))
 
         # 绘制表头
         header_font = get_font(24)
@@ -417,13 +395,13 @@ def ranking_interface():
         header_xs = [rank_x + 40, rank_x + 160, rank_x + 320, rank_x + 450, rank_x + 580]
         for i, header in enumerate(headers):
             header_text = header_font.render(header, True, LIGHT_BLUE)
-            SCREEN.blit(header_text, (header_xs[i], rank_y + 60))
-        pygame.draw.line(SCREEN, GRAY, (rank_x + 20, rank_y + 90), (rank_x + 720, rank_y + 90), 1)
+            surface.blit(header_text, (header_xs[i], rank_y + 60))
+        pygame.draw.line(surface, GRAY, (rank_x + 20, rank_y + 90), (rank_x + 720, rank_y + 90), 1)
 
         # 绘制当前页排名数据
-        start_idx = (current_page - 1) * RANK_PER_PAGE
-        end_idx = min(start_idx + RANK_PER_PAGE, total_users)
-        current_data = ranking[start_idx:end_idx]
+        start_idx = (self.current_page - 1) * self.RANK_PER_PAGE
+        end_idx = min(start_idx + self.RANK_PER_PAGE, total_users)
+        current_data = self.ranking[start_idx:end_idx]
 
         y_pos = rank_y + 105
         for idx, user in enumerate(current_data):
@@ -445,94 +423,32 @@ def ranking_interface():
             points_text = get_font(22).render(f"{user['points']}", True, GREEN)
             level_text = get_font(22).render(f"{user['last_level']}", True, BLUE)
 
-            SCREEN.blit(rank_text, (header_xs[0], y_pos))
-            SCREEN.blit(name_text, (header_xs[1], y_pos))
-            SCREEN.blit(score_text, (header_xs[2], y_pos))
-            SCREEN.blit(points_text, (header_xs[3], y_pos))
-            SCREEN.blit(level_text, (header_xs[4], y_pos))
+            surface.blit(rank_text, (header_xs[0], y_pos))
+            surface.blit(name_text, (header_xs[1], y_pos))
+            surface.blit(score_text, (header_xs[2], y_pos))
+            surface.blit(points_text, (header_xs[3], y_pos))
+            surface.blit(level_text, (header_xs[4], y_pos))
 
-            pygame.draw.line(SCREEN, (50, 50, 50), (rank_x + 20, y_pos + 30), (rank_x + 720, y_pos + 30), 1)
+            pygame.draw.line(surface, (50, 50, 50), (rank_x + 20, y_pos + 30), (rank_x + 720, y_pos + 30), 1)
             y_pos += 35
 
         # 绘制页码信息
-        page_text = get_font(20).render(f"第 {current_page}/{total_pages} 页 (共{total_users}名玩家)", True, LIGHT_BLUE)
-        SCREEN.blit(page_text, (SCREEN_WIDTH // 2 - page_text.get_width() // 2, rank_y + rank_height - 25))
+        page_text = get_font(20).render(f"第 {self.current_page}/{self.total_pages} 页 (共{total_users}名玩家·{self.source})", True,
+                                        LIGHT_BLUE)
+        surface.blit(page_text, (SCREEN_WIDTH // 2 - page_text.get_width() // 2, rank_y + rank_height - 25))
 
         # 绘制操作菜单（适配窗口，不超出）
         menu_y = rank_y + rank_height + 15
-        for i, opt in enumerate(menu_options):
-            color = RED if i == selected_menu else WHITE
+        for i, opt in enumerate(self.menu_options):
+            color = RED if i == self.selected_menu else WHITE
             opt_text = get_font(28).render(opt, True, color)
             menu_pos_y = menu_y + i * 45
-            SCREEN.blit(opt_text, (SCREEN_WIDTH // 2 - opt_text.get_width() // 2, menu_pos_y))
+            surface.blit(opt_text, (SCREEN_WIDTH // 2 - opt_text.get_width() // 2, menu_pos_y))
 
         # 绘制提示信息
-        if tip_msg:
-            tip_text = get_font(24).render(tip_msg, True, tip_color)
-            SCREEN.blit(tip_text, (SCREEN_WIDTH // 2 - tip_text.get_width() // 2, rank_y + rank_height - 50))
-
-        # 事件处理
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.KEYDOWN:
-                tip_msg = ""
-                tip_color = WHITE
-                # 排行榜翻页
-                if event.key == pygame.K_PAGEUP:
-                    if current_page > 1:
-                        current_page -= 1
-                elif event.key == pygame.K_PAGEDOWN:
-                    if current_page < total_pages:
-                        current_page += 1
-                # 菜单选择
-                elif event.key == pygame.K_UP:
-                    selected_menu = (selected_menu - 1) % len(menu_options)
-                elif event.key == pygame.K_DOWN:
-                    selected_menu = (selected_menu + 1) % len(menu_options)
-                # ESC直接返回主菜单
-                elif event.key == pygame.K_ESCAPE:
-                    return
-                # 执行菜单操作
-                elif event.key == pygame.K_RETURN:
-                    if selected_menu == 0:
-                        # 导出完整数据
-                        success, msg = export_full_ranking_data()
-                        tip_msg = msg
-                        tip_color = GREEN if success else RED
-                    elif selected_menu == 1:
-                        # 刷新排行榜（实时更新）
-                        tip_msg = "排行榜已实时更新！"
-                        tip_color = LIGHT_BLUE
-                    elif selected_menu == 2:
-                        # 返回主菜单
-                        return
-
-        pygame.display.flip()
-
-
-def init_weapon_db():
-    """初始化武器数据库"""
-    try:
-        conn = sqlite3.connect(DB_FILE, timeout=10)
-        c = conn.cursor()
-        c.execute('DROP TABLE IF EXISTS weapons')
-        c.execute('CREATE TABLE weapons (name TEXT PRIMARY KEY, price INTEGER, damage INTEGER, bullet_type TEXT)')
-        weapons_data = [
-            ('普通子弹', 0, 10, 'normal'),
-            ('激光', 500, 20, 'laser'),
-            ('导弹', 1000, 30, 'missile'),
-            ('超级激光', 2000, 25, 'super_laser')
-        ]
-        c.executemany('INSERT INTO weapons VALUES (?,?,?,?)', weapons_data)
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        print(f"武器数据库初始化失败：{e}")
-        if os.path.exists(DB_FILE):
-            os.remove(DB_FILE)
-        init_weapon_db()
+        if self.tip_msg:
+            tip_text = get_font(24).render(self.tip_msg, True, self.tip_color)
+            surface.blit(tip_text, (SCREEN_WIDTH // 2 - tip_text.get_width() // 2, rank_y + rank_height - 50))
 
 
 # ===================== 核心类定义（修复绘制逻辑） =====================
@@ -542,9 +458,10 @@ class Player:
         self.best_score, self.points, self.level = get_user_data(username)
         self.current_score = 0
         self.kill_count = 0
-        self.level_kill_target = 10 * self.level
+        self.level_kill_target = get_waves().wave(self.level).kill_target
         self.owned_weapons = get_owned_weapons(username)
         self.current_weapon = get_current_weapon(username)
+        self.weapon_slot = self.owned_weapons.index(self.current_weapon) if self.current_weapon in self.owned_weapons else 0
         self.last_failed_level = self.level
 
     def update_score(self, add_score):
@@ -553,59 +470,65 @@ class Player:
 
     def update_points(self, points):
         self.points += points
-        update_user_data(self.username, points=points)
+        # 每帧合并调用一次（见GameScene.on_score_events）：交给后台写线程追加日志（日志记录需要fsync）
+        submit_write(update_user_data, self.username, points=points)
 
     def level_up(self):
+        """升级只修改状态；存档/音效由GameScene的事件订阅者处理，过场提示由LevelTransitionScene负责"""
         self.level += 1
         self.kill_count = 0
-        self.level_kill_target = 10 * self.level
-        update_user_data(self.username, last_level=self.level)
-        LEVEL_UP_SOUND.play()  # 新增：播放升级音效
-        tip_text = get_font(48).render(f'恭喜！升级到第{self.level}关', True, YELLOW)
-        SCREEN.blit(tip_text, (SCREEN_WIDTH // 2 - tip_text.get_width() // 2, SCREEN_HEIGHT // 2))
-        pygame.display.flip()
-        pygame.time.wait(2000)
+        self.level_kill_target = get_waves().wave(self.level).kill_target
 
     def buy_weapon(self, weapon_name):
+        """购买并装备武器（存档层一次提交），成功后用存档中的结果刷新内存状态；返回 (是否成功, 提示信息)"""
+        flush_writes()  # 先让后台排队的积分落盘，购买以存档中的积分为准
         try:
-            conn = sqlite3.connect(DB_FILE, timeout=10)
-            c = conn.cursor()
-            c.execute('SELECT price FROM weapons WHERE name=?', (weapon_name,))
-            price_data = c.fetchone()
-            if not price_data:
-                conn.close()
-                return False
-
-            price = price_data[0]
-            if self.points >= price:
-                self.points -= price
-                update_user_data(self.username, points=-price)
-                self.current_weapon = weapon_name
-                if weapon_name not in self.owned_weapons:
-                    self.owned_weapons.append(weapon_name)
-                    save_owned_weapons(self.username, self.owned_weapons)
-                update_user_data(self.username, current_weapon=weapon_name)
-                conn.close()
-                return True
-            conn.close()
-            return False
+            success, msg = purchase_weapon(self.username, weapon_name)
         except Exception as e:
             print(f"购买武器失败：{e}")
-            conn.close()
+            return False, f'购买失败：{e}'
+        if success:
+            _, self.points, _ = get_user_data(self.username)
+            self.owned_weapons = get_owned_weapons(self.username)
+            self.current_weapon = weapon_name
+            self.weapon_slot = self.owned_weapons.index(weapon_name)
+        return success, msg
+
+    def switch_weapon(self, offset):
+        """在已购武器中前后切换（记住当前位置，不再每次查找），返回是否切换；保存由调用方负责"""
+        if len(self.owned_weapons) <= 1:
             return False
+        self.weapon_slot = (self.weapon_slot + offset) % len(self.owned_weapons)
+        self.current_weapon = self.owned_weapons[self.weapon_slot]
+        return True
+
+    def save_weapon(self):
+        """当前武器交给后台写线程保存"""
+        submit_write(update_user_data, self.username, current_weapon=self.current_weapon)
+
+    def submit_score(self):
+        """联网时把成绩交给排行榜客户端（后台合并批量提交，不等待网络）"""
+        if LEADERBOARD is not None:
+            LEADERBOARD.submit(self.username, self.best_score, self.points, self.level)
+
+    def record_run(self, score, duration, kills, cause):
+        """记录一局到对局历史（缓冲后批量写入）"""
+        history.record_run(self.username, score, duration, self.level, kills, self.current_weapon, cause)
 
     def save_failed_level(self):
         update_user_data(self.username, last_level=self.level)
         self.last_failed_level = self.level
+        self.submit_score()
         print(f"保存失败关卡：{self.level}，用户：{self.username}")
 
-    def save_current_progress(self):
-        update_user_data(
-            self.username,
-            best_score=self.best_score,
-            current_weapon=self.current_weapon,
-            last_level=self.level
-        )
+    def save_current_progress(self, background=False):
+        """保存进度；background=True时交给后台写线程，不阻塞当前帧"""
+        progress = dict(best_score=self.best_score, current_weapon=self.current_weapon, last_level=self.level)
+        if background:
+            submit_write(update_user_data, self.username, **progress)
+        else:
+            update_user_data(self.username, **progress)
+        self.submit_score()
         print(f"保存当前进度：关卡{self.level}，武器{self.current_weapon}，用户{self.username}")
 
 
@@ -615,6 +538,7 @@ class Spaceship:
         self.y = SCREEN_HEIGHT - SHIP_HEIGHT - 20
         self.width = SHIP_WIDTH
         self.height = SHIP_HEIGHT
+        self.mask = SHIP_MASK
         self.bullets = []
         # 调试：输出飞船初始位置
         print(f"飞船初始化：x={self.x}, y={self.y}, 尺寸={self.width}x{self.height}")
@@ -629,18 +553,16 @@ class Spaceship:
         bullet_x = self.x + self.width // 2 - BULLET_WIDTH // 2
         bullet_y = self.y - BULLET_HEIGHT
         self.bullets.append(Bullet(bullet_x, bullet_y, bullet_type))
-        SHOOT_SOUND.play()  # 新增：播放射击音效
+        AUDIO.play('shoot')  # 新增：播放射击音效
 
     def update_bullets(self):
-        for bullet in self.bullets[:]:
+        for bullet in self.bullets:
             bullet.move()
-            if bullet.y < 0:
-                self.bullets.remove(bullet)
+        # 重建列表代替逐个remove（子弹上千时remove是O(n^2)）
+        self.bullets = [bullet for bullet in self.bullets if bullet.y >= 0]
 
     def draw(self):
         # ========== 修复：强制绘制飞船图片 ==========
-        # 调试：输出绘制位置
-        print(f"绘制飞船：x={self.x}, y={self.y}")
         # 直接绘制图片（覆盖原矩形）
         SCREEN.blit(SHIP_IMG, (self.x, self.y))
         # 可选：绘制碰撞框（调试用）
@@ -648,23 +570,22 @@ class Spaceship:
 
 
 class Alien:
-    def __init__(self, level):
-        self.x = random.randint(0, SCREEN_WIDTH - ALIEN_WIDTH)
-        self.y = random.randint(-100, -50)
+    def __init__(self, level, x=None, y=None):
+        """速度/血量取自关卡表；x/y通常由出生队列给出"""
+        wave = get_waves().wave(level)
+        self.x = random.randint(0, SCREEN_WIDTH - ALIEN_WIDTH) if x is None else x
+        self.y = random.randint(-100, -50) if y is None else y
         self.width = ALIEN_WIDTH
         self.height = ALIEN_HEIGHT
-        self.speed = ALIEN_SPEED_BASE + (level - 1) * 0.5
-        self.health = 10 + (level - 1) * 5
-        # 调试：输出外星人初始位置
-        print(f"外星人初始化：x={self.x}, y={self.y}, 尺寸={self.width}x{self.height}")
+        self.mask = ALIEN_MASK
+        self.speed = wave.alien_speed
+        self.health = wave.alien_health
 
     def move(self):
         self.y += self.speed
 
     def draw(self):
         # ========== 修复：强制绘制外星人图片 ==========
-        # 调试：输出绘制位置
-        print(f"绘制外星人：x={self.x}, y={self.y}")
         # 直接绘制图片（覆盖原矩形）
         SCREEN.blit(ALIEN_IMG, (self.x, self.y))
         # 可选：绘制碰撞框（调试用）
@@ -678,26 +599,17 @@ class Bullet:
         self.width = BULLET_WIDTH
         self.height = BULLET_HEIGHT
         self.type = bullet_type
-        if bullet_type == 'laser':
-            self.speed = 15
-            self.damage = 20
-            self.color = RED
-            self.width = 8
-        elif bullet_type == 'missile':
-            self.speed = 8
-            self.damage = 30
-            self.color = GREEN
-            self.width = 10
-            self.height = 20
-        elif bullet_type == 'super_laser':
-            self.speed = 20
-            self.damage = 25
-            self.color = BLUE
-            self.width = 8
-        else:
-            self.speed = 10
-            self.damage = 10
-            self.color = YELLOW
+        self.hits = set()  # 已命中过的外星人，同一目标只结算一次
+        stats = BULLET_STATS.get(bullet_type, BULLET_STATS['normal'])
+        self.speed = stats['speed']
+        self.damage = stats['damage']
+        self.color = stats['color']
+        self.width = stats['width']
+        self.height = stats['height']
+        self.pierce = stats['pierce']  # 最多命中几个不同的外星人（None=无限穿透）
+        self.splash_radius = stats['splash_radius']  # 命中时的爆炸半径（0=无范围伤害）
+        self.splash_damage = stats['splash_damage']
+        self.mask = rect_mask(self.width, self.height)
 
     def move(self):
         self.y -= self.speed
@@ -708,23 +620,46 @@ class Bullet:
 
 
 class Background:
-    def __init__(self, level):
+    def __init__(self, level, lazy=False):
+        """lazy=True时不立即生成星星，由调用方分帧执行generate_stars_iter"""
         self.stars = []
-        self.generate_stars(level)
+        if not lazy:
+            self.generate_stars(level)
 
     def generate_stars(self, level):
-        star_count = 100 + level * 10
-        for _ in range(star_count):
-            self.stars.append({
-                'x': random.randint(0, SCREEN_WIDTH),
-                'y': random.randint(0, SCREEN_HEIGHT),
-                'size': random.randint(1, 3),
-                'color': (random.randint(100, 255), random.randint(100, 255), random.randint(100, 255)),
-                'speed': random.randint(1, 3) + (level - 1) * 0.2
-            })
+        for _ in self.generate_stars_iter(level):
+            pass
+
+    def generate_stars_iter(self, level, chunk=50):
+        """逐批生成星星，每生成chunk颗让出一次（用于升级过场中分帧预建）"""
+        wave = get_waves().wave(level)
+        for i in range(wave.star_count):
+            if i and i % chunk == 0:
+                yield
+            self.stars.append(self.make_star(wave))
+
+    def add_stars(self, count, level):
+        """追加count颗星星（压力测试逐步加压用）"""
+        wave = get_waves().wave(level)
+        self.stars.extend(self.make_star(wave) for _ in range(count))
+
+    @staticmethod
+    def make_star(wave):
+        return {
+            'x': random.randint(0, SCREEN_WIDTH),
+            'y': random.randint(0, SCREEN_HEIGHT),
+            'size': random.randint(1, 3),
+            'color': (random.randint(100, 255), random.randint(100, 255), random.randint(100, 255)),
+            'speed': random.randint(1, 3) + wave.star_speed
+        }
+
+    def visible_stars(self):
+        """按画质档位只更新/绘制前一部分星星（星星位置随机，取前缀即均匀抽稀）"""
+        count = int(len(self.stars) * QUALITY.settings['stars'])
+        return self.stars if count >= len(self.stars) else islice(self.stars, count)
 
     def update(self):
-        for star in self.stars:
+        for star in self.visible_stars():
             star['y'] += star['speed']
             if star['y'] > SCREEN_HEIGHT:
                 star['y'] = -star['size']
@@ -737,587 +672,1039 @@ class Background:
         # 第二步：绘制背景图（确保在最底层）
         SCREEN.blit(BACKGROUND_IMG, (0, 0))
         # 第三步：绘制星星（叠加在背景图上）
-        for star in self.stars:
+        for star in self.visible_stars():
             pygame.draw.circle(SCREEN, star['color'], (star['x'], star['y']), star['size'])
 
 
-# ===================== 界面函数（修复背景绘制） =====================
-def login_register_interface():
+# ===================== 界面场景（修复背景绘制） =====================
+class LoginScene(Scene):
     """登录/注册界面（强制绘制背景图）"""
-    clock = pygame.time.Clock()
-    mode = 'login'
-    username_input = ''
-    password_input = ''
-    error_msg = ''
-    tip_msg = ''
-    active_input = 'username'
 
-    while running := True:
-        clock.tick(FPS)
+    def __init__(self):
+        super().__init__()
+        self.mode = 'login'
+        self.username_input = ''
+        self.password_input = ''
+        self.error_msg = ''
+        self.tip_msg = ''
+        self.active_input = 'username'
+        # 登录/注册的哈希计算在验证线程上进行，界面每帧轮询结果
+        self.pending = None
+        self.pending_mode = None
+        self.pending_username = ''
+
+    def handle_event(self, event):
+        if self.pending is not None:  # 验证期间不响应输入
+            return
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_TAB:
+                self.mode = 'register' if self.mode == 'login' else 'login'
+                self.error_msg = ''
+                self.tip_msg = ''
+            elif event.key == pygame.K_RETURN:
+                if len(self.username_input) < 3 or len(self.password_input) < 3:
+                    self.error_msg = '用户名/密码至少3位'
+                else:
+                    self.error_msg = ''
+                    self.tip_msg = ''
+                    submit = check_user_async if self.mode == 'login' else save_user_async
+                    self.pending = submit(self.username_input, self.password_input)
+                    self.pending_mode = self.mode
+                    self.pending_username = self.username_input
+            elif event.key == pygame.K_BACKSPACE:
+                if pygame.key.get_mods() & pygame.KMOD_CTRL:
+                    self.username_input = ''
+                    self.password_input = ''
+                else:
+                    if self.active_input == 'username':
+                        self.username_input = self.username_input[:-1]
+                    else:
+                        self.password_input = self.password_input[:-1]
+            else:
+                if event.unicode.isalnum() or event.unicode == '_':
+                    if self.active_input == 'username' and len(self.username_input) < 20:
+                        self.username_input += event.unicode
+                    elif self.active_input == 'password' and len(self.password_input) < 20:
+                        self.password_input += event.unicode
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            mouse_pos = pygame.mouse.get_pos()
+            if 350 <= mouse_pos[0] <= 650 and 250 <= mouse_pos[1] <= 300:
+                self.active_input = 'username'
+            elif 350 <= mouse_pos[0] <= 650 and 350 <= mouse_pos[1] <= 400:
+                self.active_input = 'password'
+            elif 350 <= mouse_pos[0] <= 450 and 450 <= mouse_pos[1] <= 500:
+                self.mode = 'login'
+                self.error_msg = ''
+                self.tip_msg = ''
+            elif 450 <= mouse_pos[0] <= 550 and 450 <= mouse_pos[1] <= 500:
+                self.mode = 'register'
+                self.error_msg = ''
+                self.tip_msg = ''
+
+    def update(self, now):
+        if self.pending is None or not self.pending.done():
+            return
+        future, self.pending = self.pending, None
+        try:
+            ok = future.result()
+        except Exception as e:
+            self.error_msg = f'验证失败：{e}'
+            return
+        if self.pending_mode == 'login':
+            if ok:
+                self.manager.push(MenuScene(self.pending_username))
+            else:
+                self.error_msg = '用户名或密码错误'
+        else:
+            if ok:
+                self.tip_msg = '注册成功！请登录'
+                self.mode = 'login'
+                self.username_input = ''
+                self.password_input = ''
+            else:
+                self.error_msg = '用户名已存在'
 
+    def draw(self, surface):
         # ========== 强制绘制背景图（修复核心） ==========
-        SCREEN.fill(BLACK)  # 先清空
-        SCREEN.blit(BACKGROUND_IMG, (0, 0))  # 再绘制背景
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_TAB:
-                    mode = 'register' if mode == 'login' else 'login'
-                    error_msg = ''
-                    tip_msg = ''
-                elif event.key == pygame.K_RETURN:
-                    if len(username_input) < 3 or len(password_input) < 3:
-                        error_msg = '用户名/密码至少3位'
-                    else:
-                        if mode == 'login':
-                            if check_user(username_input, password_input):
-                                shop_or_game(username_input)
-                            else:
-                                error_msg = '用户名或密码错误'
-                        else:
-                            if save_user(username_input, password_input):
-                                tip_msg = '注册成功！请登录'
-                                mode = 'login'
-                                username_input = ''
-                                password_input = ''
-                            else:
-                                error_msg = '用户名已存在'
-                elif event.key == pygame.K_BACKSPACE:
-                    if pygame.key.get_mods() & pygame.KMOD_CTRL:
-                        username_input = ''
-                        password_input = ''
-                    else:
-                        if active_input == 'username':
-                            username_input = username_input[:-1]
-                        else:
-                            password_input = password_input[:-1]
-                else:
-                    if event.unicode.isalnum() or event.unicode == '_':
-                        if active_input == 'username' and len(username_input) < 20:
-                            username_input += event.unicode
-                        elif active_input == 'password' and len(password_input) < 20:
-                            password_input += event.unicode
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                mouse_pos = pygame.mouse.get_pos()
-                if 350 <= mouse_pos[0] <= 650 and 250 <= mouse_pos[1] <= 300:
-                    active_input = 'username'
-                elif 350 <= mouse_pos[0] <= 650 and 350 <= mouse_pos[1] <= 400:
-                    active_input = 'password'
-                elif 350 <= mouse_pos[0] <= 450 and 450 <= mouse_pos[1] <= 500:
-                    mode = 'login'
-                    error_msg = ''
-                    tip_msg = ''
-                elif 450 <= mouse_pos[0] <= 550 and 450 <= mouse_pos[1] <= 500:
-                    mode = 'register'
-                    error_msg = ''
-                    tip_msg = ''
+        surface.fill(BLACK)  # 先清空
+        surface.blit(BACKGROUND_IMG, (0, 0))  # 再绘制背景
 
         # 绘制界面
         title_text = get_font(60).render('外星人大战', True, WHITE)
-        SCREEN.blit(title_text, (SCREEN_WIDTH // 2 - title_text.get_width() // 2, 80))
+        surface.blit(title_text, (SCREEN_WIDTH // 2 - title_text.get_width() // 2, 80))
 
-        mode_text = get_font(36).render(f'当前模式：{mode}', True, YELLOW)
-        SCREEN.blit(mode_text, (SCREEN_WIDTH // 2 - mode_text.get_width() // 2, 160))
+        mode_text = get_font(36).render(f'当前模式：{self.mode}', True, YELLOW)
+        surface.blit(mode_text, (SCREEN_WIDTH // 2 - mode_text.get_width() // 2, 160))
 
         # 用户名输入框
-        pygame.draw.rect(SCREEN, (80, 80, 80) if active_input == 'username' else (50, 50, 50), (350, 250, 300, 50), 0,
-                         5)
-        pygame.draw.rect(SCREEN, WHITE, (350, 250, 300, 50), 2, 5)
+        pygame.draw.rect(surface, (80, 80, 80) if self.active_input == 'username' else (50, 50, 50),
+                         (350, 250, 300, 50), 0, 5)
+        pygame.draw.rect(surface, WHITE, (350, 250, 300, 50), 2, 5)
         username_label = get_font(36).render('用户名：', True, WHITE)
-        SCREEN.blit(username_label, (220, 255))
-        username_text = get_font(36).render(username_input, True, WHITE)
-        SCREEN.blit(username_text, (360, 255))
+        surface.blit(username_label, (220, 255))
+        username_text = get_font(36).render(self.username_input, True, WHITE)
+        surface.blit(username_text, (360, 255))
 
         # 密码输入框
-        pygame.draw.rect(SCREEN, (80, 80, 80) if active_input == 'password' else (50, 50, 50), (350, 350, 300, 50), 0,
-                         5)
-        pygame.draw.rect(SCREEN, WHITE, (350, 350, 300, 50), 2, 5)
+        pygame.draw.rect(surface, (80, 80, 80) if self.active_input == 'password' else (50, 50, 50),
+                         (350, 350, 300, 50), 0, 5)
+        pygame.draw.rect(surface, WHITE, (350, 350, 300, 50), 2, 5)
         password_label = get_font(36).render('密码：', True, WHITE)
-        SCREEN.blit(password_label, (240, 355))
-        password_hide = '*' * len(password_input)
+        surface.blit(password_label, (240, 355))
+        password_hide = '*' * len(self.password_input)
         password_text = get_font(36).render(password_hide, True, WHITE)
-        SCREEN.blit(password_text, (360, 355))
+        surface.blit(password_text, (360, 355))
 
         # 切换按钮
-        pygame.draw.rect(SCREEN, BLUE if mode == 'login' else (30, 30, 30), (350, 450, 100, 50), 0, 5)
+        pygame.draw.rect(surface, BLUE if self.mode == 'login' else (30, 30, 30), (350, 450, 100, 50), 0, 5)
         login_btn = get_font(30).render('登录', True, WHITE)
-        SCREEN.blit(login_btn, (370, 460))
+        surface.blit(login_btn, (370, 460))
 
-        pygame.draw.rect(SCREEN, BLUE if mode == 'register' else (30, 30, 30), (450, 450, 100, 50), 0, 5)
+        pygame.draw.rect(surface, BLUE if self.mode == 'register' else (30, 30, 30), (450, 450, 100, 50), 0, 5)
         reg_btn = get_font(30).render('注册', True, WHITE)
-        SCREEN.blit(reg_btn, (470, 460))
+        surface.blit(reg_btn, (470, 460))
 
         # 提示信息
-        if error_msg:
-            error_text = get_font(24).render(error_msg, True, RED)
-            SCREEN.blit(error_text, (SCREEN_WIDTH // 2 - error_text.get_width() // 2, 560))
-        if tip_msg:
-            tip_text = get_font(24).render(tip_msg, True, GREEN)
-            SCREEN.blit(tip_text, (SCREEN_WIDTH // 2 - tip_text.get_width() // 2, 560))
-
-        pygame.display.flip()
-
-
-def shop_interface(player):
+        if self.pending is not None:
+            dots = '.' * (pygame.time.get_ticks() // 300 % 4)
+            wait_text = get_font(24).render(f'正在验证{dots}', True, LIGHT_BLUE)
+            surface.blit(wait_text, (SCREEN_WIDTH // 2 - wait_text.get_width() // 2, 530))
+        if self.error_msg:
+            error_text = get_font(24).render(self.error_msg, True, RED)
+            surface.blit(error_text, (SCREEN_WIDTH // 2 - error_text.get_width() // 2, 560))
+        if self.tip_msg:
+            tip_text = get_font(24).render(self.tip_msg, True, GREEN)
+            surface.blit(tip_text, (SCREEN_WIDTH // 2 - tip_text.get_width() // 2, 560))
+
+
+class ShopScene(Scene):
     """武器商店界面（强制绘制背景图）"""
-    clock = pygame.time.Clock()
-    selected_weapon = 0
-    weapons = ['普通子弹', '激光', '导弹', '超级激光']
-    tip_msg = ''
 
-    while running := True:
-        clock.tick(FPS)
+    def __init__(self, player):
+        super().__init__()
+        self.player = player
+        self.selected_weapon = 0
+        self.weapons = ['普通子弹', '激光', '导弹', '超级激光']
+        self.tip_msg = ''
+        self.tip_color = GREEN
+        self.handlers = {'up': self.select_prev, 'down': self.select_next,
+                         'confirm': self.confirm, 'back': self.back}
+
+    def command_handlers(self):
+        return self.handlers
+
+    def select_prev(self):
+        self.selected_weapon = (self.selected_weapon - 1) % len(self.weapons)
+        self.tip_msg = ''
+
+    def select_next(self):
+        self.selected_weapon = (self.selected_weapon + 1) % len(self.weapons)
+        self.tip_msg = ''
+
+    def confirm(self):
+        weapon_name = self.weapons[self.selected_weapon]
+        if weapon_name == '普通子弹':
+            self.tip_msg = '默认拥有普通子弹！'
+            self.tip_color = GREEN
+        else:
+            # 购买已包含装备和存档，不再额外保存进度
+            success, self.tip_msg = self.player.buy_weapon(weapon_name)
+            self.tip_color = GREEN if success else RED
+
+    def back(self):
+        self.player.save_current_progress()
+        self.manager.pop()
 
+    def draw(self, surface):
         # ========== 强制绘制背景图（修复核心） ==========
-        SCREEN.fill(BLACK)  # 先清空
-        SCREEN.blit(BACKGROUND_IMG, (0, 0))  # 再绘制背景
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_UP:
-                    selected_weapon = (selected_weapon - 1) % len(weapons)
-                    tip_msg = ''
-                elif event.key == pygame.K_DOWN:
-                    selected_weapon = (selected_weapon + 1) % len(weapons)
-                    tip_msg = ''
-                elif event.key == pygame.K_RETURN:
-                    weapon_name = weapons[selected_weapon]
-                    if weapon_name == '普通子弹':
-                        tip_msg = '默认拥有普通子弹！'
-                    else:
-                        if player.buy_weapon(weapon_name):
-                            tip_msg = f'购买{weapon_name}成功！'
-                            player.save_current_progress()
-                        else:
-                            tip_msg = '积分不足，无法购买！'
-                elif event.key == pygame.K_ESCAPE:
-                    player.save_current_progress()
-                    return
+        surface.fill(BLACK)  # 先清空
+        surface.blit(BACKGROUND_IMG, (0, 0))  # 再绘制背景
 
         # 绘制界面
         title = get_font(48).render('武器商店', True, WHITE)
-        SCREEN.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 50))
+        surface.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 50))
 
-        points_text = get_font(36).render(f'当前积分：{player.points}', True, YELLOW)
-        SCREEN.blit(points_text, (SCREEN_WIDTH // 2 - points_text.get_width() // 2, 120))
+        points_text = get_font(36).render(f'当前积分：{self.player.points}', True, YELLOW)
+        surface.blit(points_text, (SCREEN_WIDTH // 2 - points_text.get_width() // 2, 120))
 
         y_offset = 200
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        for i, weapon in enumerate(weapons):
-            c.execute('SELECT price, damage FROM weapons WHERE name=?', (weapon,))
-            data = c.fetchone()
-            price, damage = data if data else (0, 0)
-            color = RED if i == selected_weapon else WHITE
+        catalog = get_weapon_catalog()
+        for i, weapon in enumerate(self.weapons):
+            price, damage, _ = catalog.get(weapon, (0, 0, 'normal'))
+            color = RED if i == self.selected_weapon else WHITE
             text = get_font(36).render(f'{weapon} - 价格：{price} 积分 | 伤害：{damage}', True, color)
-            SCREEN.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, y_offset + i * 60))
-        conn.close()
+            surface.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, y_offset + i * 60))
 
-        curr_weapon = get_font(36).render(f'当前武器：{player.current_weapon}', True, GREEN)
-        SCREEN.blit(curr_weapon, (SCREEN_WIDTH // 2 - curr_weapon.get_width() // 2, 480))
+        curr_weapon = get_font(36).render(f'当前武器：{self.player.current_weapon}', True, GREEN)
+        surface.blit(curr_weapon, (SCREEN_WIDTH // 2 - curr_weapon.get_width() // 2, 480))
 
-        if tip_msg:
-            tip_text = get_font(36).render(tip_msg, True, RED if '不足' in tip_msg else GREEN)
-            SCREEN.blit(tip_text, (SCREEN_WIDTH // 2 - tip_text.get_width() // 2, 540))
+        if self.tip_msg:
+            tip_text = get_font(36).render(self.tip_msg, True, self.tip_color)
+            surface.blit(tip_text, (SCREEN_WIDTH // 2 - tip_text.get_width() // 2, 540))
 
         exit_text = get_font(24).render('按ESC返回主菜单', True, WHITE)
-        SCREEN.blit(exit_text, (20, 20))
+        surface.blit(exit_text, (20, 20))
 
-        pygame.display.flip()
 
-
-def shop_or_game(username):
+class MenuScene(Scene):
     """主菜单界面（强制绘制背景图）"""
-    clock = pygame.time.Clock()
-    player = Player(username)
-    selected = 0
-    # 移除“导出数据”，新增“排行榜”
-    options = ['开始游戏', '武器商店', '排行榜', '重置数据', '退出游戏']
-    tip_msg = ''
-
-    while running := True:
-        clock.tick(FPS)
+    RESET_TIP_TIME = 2000  # 重置数据后提示停留时间（毫秒）
 
+    def __init__(self, username):
+        super().__init__()
+        self.username = username
+        self.player = Player(username)
+        self.selected = 0
+        # 移除“导出数据”，新增“排行榜”
+        self.options = ['开始游戏', '武器商店', '排行榜', '压力测试', '重置数据', '退出游戏']
+        self.tip_msg = ''
+        self.reset_at = None
+        self.handlers = {'up': self.select_prev, 'down': self.select_next, 'confirm': self.confirm}
+
+    def on_resume(self):
+        # 从游戏返回时重新读取存档（关卡/积分可能已变化），先等后台存档落盘
+        flush_writes()
+        self.player = Player(self.username)
+
+    def on_quit(self):
+        if self.reset_at is None:
+            self.player.save_current_progress()
+
+    def command_handlers(self):
+        # 重置数据后等待回到登录界面，期间不响应操作
+        return self.handlers if self.reset_at is None else {}
+
+    def select_prev(self):
+        self.selected = (self.selected - 1) % len(self.options)
+        self.tip_msg = ''
+
+    def select_next(self):
+        self.selected = (self.selected + 1) % len(self.options)
+        self.tip_msg = ''
+
+    def confirm(self):
+        if self.selected == 0:
+            self.manager.push(GameScene(self.username))
+        elif self.selected == 1:
+            self.manager.push(ShopScene(self.player))
+        elif self.selected == 2:
+            # 进入排行榜界面
+            self.manager.push(RankingScene())
+        elif self.selected == 3:
+            # 无尽压力测试：实体数量逐步增加到上千，结束后显示性能汇总
+            self.manager.push(StressScene())
+        elif self.selected == 4:
+            flush_writes()
+            reset_users()
+            reset_weapon_catalog()
+            self.tip_msg = '数据已重置！请重新登录'
+            # 提示停留一段时间后回到登录界面（不阻塞主循环）
+            self.reset_at = pygame.time.get_ticks()
+        elif self.selected == 5:
+            self.player.save_current_progress()
+            self.manager.reset(LoginScene())
+
+    def update(self, now):
+        if self.reset_at is not None and now - self.reset_at >= self.RESET_TIP_TIME:
+            self.manager.reset(LoginScene())
+
+    def draw(self, surface):
         # ========== 强制绘制背景图（修复核心） ==========
-        SCREEN.fill(BLACK)  # 先清空
-        SCREEN.blit(BACKGROUND_IMG, (0, 0))  # 再绘制背景
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                player.save_current_progress()
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_UP:
-                    selected = (selected - 1) % len(options)
-                    tip_msg = ''
-                elif event.key == pygame.K_DOWN:
-                    selected = (selected + 1) % len(options)
-                    tip_msg = ''
-                elif event.key == pygame.K_RETURN:
-                    if selected == 0:
-                        main_game(username)
-                    elif selected == 1:
-                        shop_interface(player)
-                    elif selected == 2:
-                        # 进入排行榜界面
-                        ranking_interface()
-                    elif selected == 3:
-                        if os.path.exists(USER_FILE):
-                            os.remove(USER_FILE)
-                        init_weapon_db()
-                        tip_msg = '数据已重置！请重新登录'
-                        pygame.display.flip()
-                        pygame.time.wait(2000)
-                        login_register_interface()
-                    elif selected == 4:
-                        player.save_current_progress()
-                        login_register_interface()
+        surface.fill(BLACK)  # 先清空
+        surface.blit(BACKGROUND_IMG, (0, 0))  # 再绘制背景
 
         # 绘制界面
-        welcome = get_font(36).render(f'欢迎 {username} | 最后关卡：{player.level} | 积分：{player.points}', True, WHITE)
-        SCREEN.blit(welcome, (SCREEN_WIDTH // 2 - welcome.get_width() // 2, 50))
+        welcome = get_font(36).render(
+            f'欢迎 {self.username} | 最后关卡：{self.player.level} | 积分：{self.player.points}', True, WHITE)
+        surface.blit(welcome, (SCREEN_WIDTH // 2 - welcome.get_width() // 2, 50))
 
-        y_offset = 200
-        for i, opt in enumerate(options):
-            color = RED if i == selected else WHITE
+        y_offset = 160
+        for i, opt in enumerate(self.options):
+            color = RED if i == self.selected else WHITE
             text = get_font(48).render(opt, True, color)
-            SCREEN.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, y_offset + i * 80))
-
-        if tip_msg:
-            tip_color = GREEN if '成功' in tip_msg else RED
-            tip_text = get_font(36).render(tip_msg, True, tip_color)
-            SCREEN.blit(tip_text, (SCREEN_WIDTH // 2 - tip_text.get_width() // 2, 500))
+            surface.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, y_offset + i * 60))
 
-        pygame.display.flip()
+        if self.tip_msg:
+            tip_color = GREEN if '成功' in self.tip_msg else RED
+            tip_text = get_font(36).render(self.tip_msg, True, tip_color)
+            surface.blit(tip_text, (SCREEN_WIDTH // 2 - tip_text.get_width() // 2, 540))
 
 
-def main_game(username):
-    """核心游戏逻辑（优化音效播放+强制绘制图片+新增ESC暂停功能）"""
-    clock = pygame.time.Clock()
-    player = Player(username)
-    print(f"加载用户 {username} 的关卡：{player.level}")
+class GameScene(Scene):
+    """核心游戏逻辑（优化音效播放+强制绘制图片+ESC暂停功能）"""
+    MAX_CATCH_UP_STEPS = 5  # 一帧内最多补跑的模拟步数
 
-    spaceship = Spaceship()
-    background = Background(player.level)
-    aliens = [Alien(player.level) for _ in range(5 + player.level * 2)]
+    def __init__(self, username, player=None):
+        super().__init__()
+        self.username = username
+        self.player = player or Player(username)
+        print(f"加载用户 {username} 的关卡：{self.player.level}")
+
+        self.spaceship = Spaceship()
+        self.background = Background(self.player.level)
+        # 外星人不再开局批量生成，而是按关卡表的出生时间表从队列中逐个出场
+        self.aliens = []
+        self.spawns = SpawnQueue(get_waves(), self.player.level)
+        self.collision = collision.get_backend(COLLISION_BACKEND, PIXEL_COLLISION)
+        self.particles = ParticleSystem()  # 命中火花/爆炸特效（固定容量，满了覆盖最旧的）
+
+        self.invulnerable = False
+        self.invulnerable_time = 2000
+        self.last_hurt_time = 0
+        self.lives_exhausted = False
+        self.max_lives = 3
+        self.current_lives = self.max_lives
+
+        # 本局统计（结束时写入对局历史，只写一次）
+        self.run_kills = 0
+        self.play_steps = 0  # 实际进行的模拟步数（不含暂停），用于计算本局时长
+        self.run_recorded = False
+
+        # 游戏事件：模拟步只发布，每帧结束时整批分发给音效/特效/计分存档/HUD/统计（见events.py）
+        self.events = EventBus()
+        self.events.subscribe(self.on_audio_events, AlienHit, ShipHit, LevelUp)
+        self.events.subscribe(self.on_effect_events, AlienHit, AlienKilled, ShipHit)
+        self.events.subscribe(self.on_score_events, AlienKilled, LevelUp, WeaponSwitched)
+        self.events.subscribe(self.on_hud_events)
+        self.events.subscribe(self.on_analytics_events, AlienKilled)
+        self.hud_texts = None  # (抗锯齿, [(文字, 位置)...])，事件到来时作废重绘
+
+        self.auto_attack = True
+        self.weapon_interval = {'normal': 300, 'laser': 500, 'missile': 800, 'super_laser': 400}
+        self.last_attack_time = 0
+
+        # ========== 暂停功能核心变量 ==========
+        self.paused = False  # 暂停状态
+        self.pause_menu_options = ["继续游戏", "退出游戏"]  # 暂停菜单选项
+        self.pause_selected = 0  # 当前选中的菜单项（0=继续，1=退出）
+        self.resume_countdown = 0  # 继续游戏倒计时计时器
+        self.resume_seconds = 3  # 继续游戏倒计时秒数
+        self.countdown_active = False  # 是否处于倒计时阶段
+        self.current_time = 0
+
+        # ========== 命令队列 + 固定步长模拟时钟 ==========
+        self.commands = deque()  # 已翻译的命令，由下一个模拟步消费
+        self.sim_origin = None  # 模拟时钟起点（第一次update时确定）
+        self.sim_steps = 0
+        self.play_handlers = {'back': self.pause, 'fire': self.fire,
+                              'prev_weapon': self.prev_weapon, 'next_weapon': self.next_weapon}
+        self.pause_handlers = {'back': self.unpause, 'up': self.pause_select_prev,
+                               'down': self.pause_select_next, 'confirm': self.pause_confirm}
+        self.game_over_handlers = {'back': self.leave, 'restart': self.restart}
+
+    def on_enter(self):
+        # 播放背景音乐（流式，循环播放）
+        AUDIO.play_music(BGM_PATHS, 0.4)
+
+    def on_exit(self):
+        self.stop_bgm()
+
+    def on_quit(self):
+        self.end_run('closed')
+        self.player.save_current_progress()
+
+    def end_run(self, cause):
+        """本局结束：记录得分/时长/击杀/武器/结束原因"""
+        if self.run_recorded:
+            return
+        self.run_recorded = True
+        self.events.dispatch()  # 本帧还没分发的击杀先计入得分/统计
+        self.player.record_run(self.player.current_score, self.play_steps / FPS, self.run_kills, cause)
+
+    def stop_bgm(self):
+        AUDIO.stop_music()  # 停止背景音乐
+
+    # ---------------------- 命令处理 ----------------------
+    def command_handlers(self):
+        if self.countdown_active:  # 倒计时期间不响应菜单操作
+            return {}
+        if self.paused:
+            return self.pause_handlers
+        if self.lives_exhausted:
+            return self.game_over_handlers
+        return self.play_handlers
+
+    def handle_command(self, command):
+        """命令先入队，由下一个模拟步按当时的状态分发（与模拟时钟对齐，回放可复现）"""
+        if command not in self.command_handlers():
+            return False
+        self.commands.append(command)
+        return True
 
-    # 替换为加载的音效（新增）
-    hit_sound = HIT_SOUND
-    hurt_sound = HURT_SOUND
-    game_over_sound = GAME_OVER_SOUND
+    def pause(self):
+        # ESC键触发暂停
+        self.paused = True
+
+    def unpause(self):
+        # ESC再次按下取消暂停
+        self.paused = False
+
+    def pause_select_prev(self):
+        self.pause_selected = (self.pause_selected - 1) % len(self.pause_menu_options)
+
+    def pause_select_next(self):
+        self.pause_selected = (self.pause_selected + 1) % len(self.pause_menu_options)
+
+    def pause_confirm(self):
+        if self.pause_selected == 0:
+            # 选择继续游戏：启动3秒倒计时
+            self.countdown_active = True
+            self.resume_countdown = self.current_time
+        elif self.pause_selected == 1:
+            # 选择退出游戏：保存进度并返回主菜单
+            self.end_run('quit')
+            self.player.save_current_progress()
+            self.manager.pop()
+
+    def fire(self):
+        self.spaceship.shoot(self.current_bullet_type())
+        self.last_attack_time = self.current_time
+
+    def prev_weapon(self):
+        if self.player.switch_weapon(-1):
+            self.events.publish(WeaponSwitched(self.player.current_weapon))
+
+    def next_weapon(self):
+        if self.player.switch_weapon(1):
+            self.events.publish(WeaponSwitched(self.player.current_weapon))
+
+    def leave(self):
+        self.manager.pop()
+
+    def restart(self):
+        # 重新开始（继续当前关卡）
+        self.manager.replace(GameScene(self.username))
+
+    # ---------------------- 逻辑更新 ----------------------
+    def on_resume(self):
+        # 升级过场等上层场景出栈后重新开始计时，不追赶过场期间的时间
+        self.sim_origin = None
+
+    def update(self, now):
+        """固定步长推进模拟：每1000//FPS毫秒一步，与渲染帧率无关；
+        卡顿后最多追赶MAX_CATCH_UP_STEPS步，其余时间直接丢弃（避免越卡越慢）"""
+        if self.sim_origin is None:
+            self.sim_origin, self.sim_steps = now - 1000 // FPS, 0
+        steps = 0
+        while not (self.manager and self.manager.switching):
+            step_time = self.sim_origin + (self.sim_steps + 1) * 1000 // FPS
+            if step_time > now:
+                break
+            if steps == self.MAX_CATCH_UP_STEPS:
+                self.sim_origin, self.sim_steps = now, 0
+                break
+            self.sim_steps += 1
+            steps += 1
+            self.step(step_time)
+        self.events.dispatch()  # 本帧所有模拟步的事件一次分发
+
+    def step(self, now):
+        """一个模拟步：先按顺序消费命令队列，再推进游戏逻辑"""
+        self.current_time = now
+        while self.commands:
+            Scene.handle_command(self, self.commands.popleft())
+            if self.manager and self.manager.switching:
+                return
+        if self.paused or self.countdown_active:
+            # 倒计时逻辑：每秒减1
+            if self.countdown_active and now - self.resume_countdown >= 1000:
+                self.resume_seconds -= 1
+                self.resume_countdown = now
+                # 倒计时结束，恢复游戏
+                if self.resume_seconds <= 0:
+                    self.countdown_active = False
+                    self.paused = False
+                    self.resume_seconds = 3  # 重置倒计时
+            return
+        if self.lives_exhausted:
+            return
+        self.play_steps += 1
+
+        player = self.player
+        spaceship = self.spaceship
 
-    bgm_playing = True
-    try:
-        # 播放背景音乐（新增）
-        BGM_SOUND.play(-1)  # -1表示循环播放
-    except:
-        bgm_playing = False
-
-    invulnerable = False
-    invulnerable_time = 2000
-    last_hurt_time = 0
-    lives_exhausted = False
-    max_lives = 3
-    current_lives = max_lives
-
-    auto_attack = True
-    weapon_interval = {'normal': 300, 'laser': 500, 'missile': 800, 'super_laser': 400}
-    last_attack_time = 0
-
-    # ========== 新增：暂停功能核心变量 ==========
-    paused = False  # 暂停状态
-    pause_menu_options = ["继续游戏", "退出游戏"]  # 暂停菜单选项
-    pause_selected = 0  # 当前选中的菜单项（0=继续，1=退出）
-    resume_countdown = 0  # 继续游戏倒计时计时器
-    resume_seconds = 3  # 继续游戏倒计时秒数
-    countdown_active = False  # 是否处于倒计时阶段
-
-    while running := True:
-        current_time = pygame.time.get_ticks()
-        clock.tick(FPS)
-
-        # ========== 新增：暂停/倒计时逻辑（优先级最高） ==========
-        if paused or countdown_active:
-            # 绘制半透明遮罩（暂停背景）
-            pause_mask = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-            pause_mask.fill((0, 0, 0, 180))  # 黑色半透明（透明度180）
-            SCREEN.blit(pause_mask, (0, 0))
-
-            if countdown_active:
-                # 倒计时逻辑：每秒减1
-                if current_time - resume_countdown >= 1000:
-                    resume_seconds -= 1
-                    resume_countdown = current_time
-                    # 倒计时结束，恢复游戏
-                    if resume_seconds <= 0:
-                        countdown_active = False
-                        paused = False
-                        resume_seconds = 3  # 重置倒计时
-
-                # 绘制倒计时文字
-                countdown_text = get_font(80).render(f"{resume_seconds}", True, YELLOW)
-                countdown_tip = get_font(40).render("即将继续游戏...", True, WHITE)
-                SCREEN.blit(countdown_text, (SCREEN_WIDTH//2 - countdown_text.get_width()//2, SCREEN_HEIGHT//2 - 60))
-                SCREEN.blit(countdown_tip, (SCREEN_WIDTH//2 - countdown_tip.get_width()//2, SCREEN_HEIGHT//2 + 40))
-            else:
-                # 绘制暂停菜单
-                pause_title = get_font(60).render("游戏暂停", True, RED)
-                SCREEN.blit(pause_title, (SCREEN_WIDTH//2 - pause_title.get_width()//2, SCREEN_HEIGHT//2 - 120))
-
-                # 绘制菜单选项（选中项黄色高亮）
-                for i, opt in enumerate(pause_menu_options):
-                    color = YELLOW if i == pause_selected else WHITE
-                    opt_text = get_font(48).render(opt, True, color)
-                    SCREEN.blit(opt_text, (SCREEN_WIDTH//2 - opt_text.get_width()//2, SCREEN_HEIGHT//2 + i*80))
-
-            # 暂停状态事件处理
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    player.save_current_progress()
-                    pygame.quit()
-                    sys.exit()
-                if event.type == pygame.KEYDOWN:
-                    if not countdown_active:  # 倒计时期间不响应菜单操作
-                        # ESC再次按下取消暂停
-                        if event.key == pygame.K_ESCAPE:
-                            paused = False
-                        # 上下键切换菜单
-                        elif event.key == pygame.K_UP:
-                            pause_selected = (pause_selected - 1) % len(pause_menu_options)
-                        elif event.key == pygame.K_DOWN:
-                            pause_selected = (pause_selected + 1) % len(pause_menu_options)
-                        # 回车键确认选择
-                        elif event.key == pygame.K_RETURN:
-                            if pause_selected == 0:
-                                # 选择继续游戏：启动3秒倒计时
-                                countdown_active = True
-                                resume_countdown = current_time
-                            elif pause_selected == 1:
-                                # 选择退出游戏：保存进度并返回主菜单
-                                player.save_current_progress()
-                                if bgm_playing:
-                                    BGM_SOUND.stop()
-                                shop_or_game(username)
-                                return  # 退出游戏循环
-
-            pygame.display.flip()
-            continue  # 暂停时跳过后续游戏逻辑
-
-        # ========== 原有游戏结束逻辑（无修改） ==========
-        if lives_exhausted:
-            player.save_failed_level()
-            update_user_data(username, best_score=player.best_score, current_weapon=player.current_weapon)
-
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        if bgm_playing:
-                            BGM_SOUND.stop()  # 停止背景音乐
-                        shop_or_game(username)
-                    elif event.key == pygame.K_r:
-                        if bgm_playing:
-                            BGM_SOUND.stop()  # 停止背景音乐
-                        main_game(username)
-
-            # ========== 游戏结束界面强制绘制背景 ==========
-            SCREEN.fill(BLACK)
-            SCREEN.blit(BACKGROUND_IMG, (0, 0))
-
-            game_over = get_font(72).render('游戏结束！', True, RED)
-            SCREEN.blit(game_over, (SCREEN_WIDTH // 2 - game_over.get_width() // 2, 150))
-
-            final_score = get_font(48).render(f'最终分数：{player.current_score}', True, YELLOW)
-            best_score = get_font(48).render(f'最佳分数：{player.best_score}', True, GREEN)
-            level = get_font(48).render(f'失败关卡：{player.level}', True, BLUE)
-            weapon = get_font(48).render(f'当前武器：{player.current_weapon}', True, WHITE)
-
-            SCREEN.blit(final_score, (SCREEN_WIDTH // 2 - final_score.get_width() // 2, 280))
-            SCREEN.blit(best_score, (SCREEN_WIDTH // 2 - best_score.get_width() // 2, 340))
-            SCREEN.blit(level, (SCREEN_WIDTH // 2 - level.get_width() // 2, 400))
-            SCREEN.blit(weapon, (SCREEN_WIDTH // 2 - weapon.get_width() // 2, 460))
-
-            tip = get_font(36).render('按ESC返回主菜单 | 按R重新开始（继续当前关卡）', True, WHITE)
-            SCREEN.blit(tip, (SCREEN_WIDTH // 2 - tip.get_width() // 2, 520))
-
-            pygame.display.flip()
-            continue
-
-        # ========== 原有事件处理（新增ESC暂停触发） ==========
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                player.save_current_progress()
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.KEYDOWN:
-                # 新增：ESC键触发暂停
-                if event.key == pygame.K_ESCAPE and not lives_exhausted:
-                    paused = True
-                elif event.key == pygame.K_SPACE:
-                    conn = sqlite3.connect(DB_FILE)
-                    c = conn.cursor()
-                    c.execute('SELECT bullet_type FROM weapons WHERE name=?', (player.current_weapon,))
-                    res = c.fetchone()
-                    bullet_type = res[0] if res else 'normal'
-                    conn.close()
-                    spaceship.shoot(bullet_type)
-                    last_attack_time = current_time
-                elif event.key == pygame.K_q:
-                    if len(player.owned_weapons) > 1:
-                        idx = player.owned_weapons.index(player.current_weapon)
-                        player.current_weapon = player.owned_weapons[(idx - 1) % len(player.owned_weapons)]
-                        player.save_current_progress()
-                elif event.key == pygame.K_e:
-                    if len(player.owned_weapons) > 1:
-                        idx = player.owned_weapons.index(player.current_weapon)
-                        player.current_weapon = player.owned_weapons[(idx + 1) % len(player.owned_weapons)]
-                        player.save_current_progress()
-                elif event.key == pygame.K_ESCAPE:
-                    player.save_current_progress()
-                    if bgm_playing:
-                        BGM_SOUND.stop()  # 停止背景音乐
-                    shop_or_game(username)
-
-        # ========== 原有游戏逻辑（无修改） ==========
         # 飞船移动
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_LEFT]:
-            spaceship.move('left')
-        if keys[pygame.K_RIGHT]:
-            spaceship.move('right')
+        self.steer(now)
 
         # 自动发射
-        if auto_attack:
-            conn = sqlite3.connect(DB_FILE)
-            c = conn.cursor()
-            c.execute('SELECT bullet_type FROM weapons WHERE name=?', (player.current_weapon,))
-            res = c.fetchone()
-            bullet_type = res[0] if res else 'normal'
-            conn.close()
-            interval = weapon_interval.get(bullet_type, 300)
-            if current_time - last_attack_time >= interval:
+        if self.auto_attack:
+            bullet_type = self.current_bullet_type()
+            interval = self.weapon_interval.get(bullet_type, 300)
+            if now - self.last_attack_time >= interval:
                 spaceship.shoot(bullet_type)
-                last_attack_time = current_time
+                self.last_attack_time = now
 
         # 无敌时间
-        if invulnerable and current_time - last_hurt_time >= invulnerable_time:
-            invulnerable = False
+        if self.invulnerable and now - self.last_hurt_time >= self.invulnerable_time:
+            self.invulnerable = False
 
         # 更新元素
-        background.update()
+        self.background.update()
         spaceship.update_bullets()
-
-        # 敌人逻辑
-        for alien in aliens[:]:
+        self.particles.set_limit(int(self.particles.capacity * QUALITY.settings['particles']))
+        self.particles.update()
+
+        # 敌人逻辑：先让到期的出生点出场
+        aliens = self.aliens
+        for x, y in self.spawns.pop_due(now):
+            aliens.append(Alien(player.level, x, y))
+        for alien in aliens:
             alien.move()
-            if alien.y > SCREEN_HEIGHT:
+        escaped = [alien for alien in aliens if alien.y > SCREEN_HEIGHT]
+        if escaped:
+            aliens = self.aliens = [alien for alien in aliens if alien.y <= SCREEN_HEIGHT]
+            for _ in escaped:
+                self.spawns.respawn(now)
+
+        # 飞船碰撞（一次查询；受伤后进入无敌，本帧只结算第一个撞上的外星人）
+        if not self.invulnerable:
+            ship_hits = self.collision.pairs([spaceship], aliens)
+            if ship_hits:
+                alien = ship_hits[0][1]
+                self.current_lives -= 1
+                self.invulnerable = True
+                self.last_hurt_time = now
+                self.events.publish(ShipHit(alien.x + alien.width / 2, alien.y + alien.height / 2, self.current_lives))
                 aliens.remove(alien)
-                aliens.append(Alien(player.level))
-
-            ship_rect = pygame.Rect(spaceship.x, spaceship.y, spaceship.width, spaceship.height)
-            alien_rect = pygame.Rect(alien.x, alien.y, alien.width, alien.height)
-            if not invulnerable and ship_rect.colliderect(alien_rect):
-                current_lives -= 1
-                hurt_sound.play()  # 播放受伤音效
-                invulnerable = True
-                last_hurt_time = current_time
-                aliens.remove(alien)
-                aliens.append(Alien(player.level))
-                if current_lives <= 0:
-                    lives_exhausted = True
-                    game_over_sound.play()  # 播放游戏结束音效
-                    if bgm_playing:
-                        BGM_SOUND.stop()  # 停止背景音乐
-                    player.save_failed_level()
+                self.spawns.respawn(now)
+                if self.current_lives <= 0:
+                    self.game_over()
+                    return
 
         # 子弹碰撞
-        for bullet in spaceship.bullets[:]:
-            bullet_rect = pygame.Rect(bullet.x, bullet.y, bullet.width, bullet.height)
-            for alien in aliens[:]:
-                alien_rect = pygame.Rect(alien.x, alien.y, alien.width, alien.height)
-                if bullet_rect.colliderect(alien_rect):
-                    hit_sound.play()  # 播放击中音效
-                    alien.health -= bullet.damage
-                    if bullet.type != 'super_laser':
-                        spaceship.bullets.remove(bullet)
-                    if alien.health <= 0:
-                        aliens.remove(alien)
-                        aliens.append(Alien(player.level))
-                        player.update_score(10 * player.level)
-                        player.update_points(5 * player.level)
-                        player.kill_count += 1
-                        if player.kill_count >= player.level_kill_target:
-                            player.level_up()
-                            aliens = [Alien(player.level) for _ in range(5 + player.level * 2)]
-                            background = Background(player.level)
-                            player.save_current_progress()
-                    break
+        dead_aliens = self.resolve_hits()
+        if not dead_aliens:
+            return
+        self.aliens = [alien for alien in self.aliens if alien not in dead_aliens]
+        wave = self.spawns.wave
+        for alien in dead_aliens:
+            self.spawns.respawn(now)
+            player.kill_count += 1  # 升级判定属于模拟本身，得分/积分存档由订阅者按帧合并处理
+            self.events.publish(AlienKilled(alien.x + alien.width / 2, alien.y + alien.height / 2, wave.score, wave.points))
+        if player.kill_count >= player.level_kill_target:
+            self.on_level_up()
+
+    def steer(self, now):
+        """飞船移动（按住的移动命令；批量模拟中由AI驾驶员覆盖）"""
+        if 'move_left' in self.held:
+            self.spaceship.move('left')
+        if 'move_right' in self.held:
+            self.spaceship.move('right')
+
+    def current_bullet_type(self):
+        return get_bullet_type(self.player.current_weapon)
+
+    def on_level_up(self):
+        self.player.level_up()
+        self.events.publish(LevelUp(self.player.level))
+        # 过场期间分帧预建下一关的星空和出生队列
+        self.manager.push(LevelTransitionScene(self))
+
+    def resolve_hits(self):
+        """结算子弹命中，返回本帧被消灭的外星人集合
+        一次空间查询取出全部(子弹, 外星人)相交对：每颗子弹对同一外星人只结算一次，
+        按穿透数依次命中多个目标；导弹命中后的爆炸范围再用一次查询统一结算"""
+        spaceship = self.spaceship
+        spent = set()
+        dead = set()
+        blasts = []
+        for bullet, alien in self.collision.pairs(spaceship.bullets, self.aliens):
+            if bullet in spent or alien in dead or alien in bullet.hits:
+                continue
+            bullet.hits.add(alien)
+            self.events.publish(AlienHit(bullet.x + bullet.width / 2, bullet.y, bool(bullet.splash_radius)))
+            alien.health -= bullet.damage
+            if alien.health <= 0:
+                dead.add(alien)
+            if bullet.splash_radius:
+                blasts.append(collision.Circle(bullet.x + bullet.width / 2, bullet.y, bullet.splash_radius, bullet))
+            if bullet.pierce is not None and len(bullet.hits) >= bullet.pierce:
+                spent.add(bullet)
+
+        # 范围伤害：直接命中的目标不重复受伤
+        if blasts:
+            for blast, alien in self.collision.pairs(blasts, self.aliens):
+                if alien in dead or alien in blast.source.hits or not blast.covers(alien):
+                    continue
+                alien.health -= blast.source.splash_damage
+                if alien.health <= 0:
+                    dead.add(alien)
+
+        if spent:
+            spaceship.bullets = [bullet for bullet in spaceship.bullets if bullet not in spent]
+        return dead
+
+    # ---------------------- 事件订阅者（每帧最多调用一次） ----------------------
+    def on_audio_events(self, events):
+        """同一帧的同类事件只播一次音效"""
+        for sound in {EVENT_SOUNDS[type(event)] for event in events}:
+            AUDIO.play(sound)
+
+    def on_effect_events(self, events):
+        for event in events:
+            if isinstance(event, AlienHit):
+                self.effect('spark', event.x, event.y, 6)
+                if event.splash:
+                    self.effect('blast', event.x, event.y, 16)
+            else:
+                self.effect('explosion', event.x, event.y, 24)
+
+    def on_score_events(self, events):
+        """得分/积分合并成一次更新（积分存档每帧最多追加一条日志）；升级保存进度，换武器保存当前武器"""
+        score = points = 0
+        level_up = weapon_switched = False
+        for event in events:
+            if isinstance(event, AlienKilled):
+                score += event.score
+                points += event.points
+            elif isinstance(event, LevelUp):
+                level_up = True
+            else:
+                weapon_switched = True
+        player = self.player
+        if score or points:
+            player.update_score(score)
+            player.update_points(points)
+        if level_up:
+            player.save_current_progress(background=True)  # 进度中已包含当前武器
+        elif weapon_switched:
+            player.save_weapon()
+
+    def on_hud_events(self, events):
+        """HUD文字只在分数/关卡/武器/生命变化后重新渲染"""
+        self.hud_texts = None
+
+    def on_analytics_events(self, events):
+        self.run_kills += len(events)
+
+    def effect(self, name, x, y, count):
+        """发射粒子特效，粒子数按画质档位缩减"""
+        self.particles.emit(name, x, y, max(1, int(count * QUALITY.settings['effects'])))
+
+    def entity_counts(self):
+        """当前实体数量（性能浮层显示）"""
+        return {'外星人': len(self.aliens), '子弹': len(self.spaceship.bullets), '星星': len(self.background.stars),
+                '粒子': self.particles.live}
+
+    def build_level(self, level):
+        """分帧预建下一关的生成器：每次yield让出一帧，结束后一次性替换"""
+        spawns = SpawnQueue(get_waves(), level)
+        yield
+        background = Background(level, lazy=True)
+        yield from background.generate_stars_iter(level)
+        self.aliens = []
+        self.spawns = spawns
+        self.background = background
+
+    def game_over(self):
+        """生命耗尽：播放音效、停止背景音乐并保存失败关卡/最佳成绩（只保存一次）"""
+        self.lives_exhausted = True
+        AUDIO.play('game_over')  # 播放游戏结束音效
+        self.stop_bgm()
+        self.end_run('died')
+        self.player.save_failed_level()
+        update_user_data(self.username, best_score=self.player.best_score,
+                         current_weapon=self.player.current_weapon)
+
+    # ---------------------- 绘制 ----------------------
+    def draw(self, surface):
+        if self.lives_exhausted:
+            self.draw_game_over(surface)
+            return
 
         # ========== 强制绘制所有元素（确保层级正确） ==========
-        background.draw()  # 1. 背景图（最底层）
-        spaceship.draw()  # 2. 飞船
-        for alien in aliens:  # 3. 外星人
+        self.background.draw()  # 1. 背景图（最底层）
+        self.spaceship.draw()  # 2. 飞船
+        for alien in self.aliens:  # 3. 外星人
             alien.draw()
-        for bullet in spaceship.bullets:  # 4. 子弹
+        for bullet in self.spaceship.bullets:  # 4. 子弹
             bullet.draw()
-
-        # 绘制信息面板（红圈生命值）
-        # 生命标题
-        life_title = get_font(30).render('生命：', True, RED)
-        SCREEN.blit(life_title, (20, 10))
+        self.particles.draw(surface)  # 5. 粒子特效（一次blits）
+        self.draw_hud(surface)
+
+        if self.paused or self.countdown_active:
+            self.draw_pause(surface)
+
+    def draw_hud(self, surface):
+        antialias = QUALITY.settings['antialias']  # 低画质档关闭文字抗锯齿
+        if self.hud_texts is None or self.hud_texts[0] != antialias:
+            self.hud_texts = (antialias, self.render_hud_texts(antialias))
+        texts = self.hud_texts[1]
+        # 信息面板文字（生命标题/武器/分数/关卡/击杀）
+        for text, pos in texts[:-1]:
+            surface.blit(text, pos)
         # 红圈绘制
         circle_radius = 8
         circle_spacing = 20
         start_x = 90
         start_y = 25
         # 实心红圈（当前生命）
-        for i in range(current_lives):
-            pygame.draw.circle(SCREEN, RED, (start_x + i * circle_spacing, start_y), circle_radius)
+        for i in range(self.current_lives):
+            pygame.draw.circle(surface, RED, (start_x + i * circle_spacing, start_y), circle_radius)
         # 空心灰圈（剩余生命）
-        for i in range(current_lives, max_lives):
-            pygame.draw.circle(SCREEN, GRAY, (start_x + i * circle_spacing, start_y), circle_radius, 2)
+        for i in range(self.current_lives, self.max_lives):
+            pygame.draw.circle(surface, GRAY, (start_x + i * circle_spacing, start_y), circle_radius, 2)
 
-        # 其他信息
-        weapon_text = get_font(30).render(f'武器：{player.current_weapon}', True, WHITE)
-        SCREEN.blit(weapon_text, (20, 50))
+        # 无敌提示
+        if self.invulnerable and (self.current_time // 100) % 2 == 0:
+            surface.blit(*texts[-1])
+
+    def render_hud_texts(self, antialias):
+        """渲染HUD文字 [(文字, 位置)...]，最后一项是无敌提示"""
+        player = self.player
+        font = get_font(30)
+        return [
+            (font.render('生命：', antialias, RED), (20, 10)),
+            (font.render(f'武器：{player.current_weapon}', antialias, WHITE), (20, 50)),
+            (font.render(f'分数：{player.current_score}', antialias, YELLOW), (200, 10)),
+            (font.render(f'关卡：{player.level}', antialias, BLUE), (380, 10)),
+            (font.render(f'击杀：{player.kill_count}/{player.level_kill_target}', antialias, GREEN), (550, 10)),
+            (font.render('无敌中...', antialias, WHITE), (20, 90)),
+        ]
 
-        score_text = get_font(30).render(f'分数：{player.current_score}', True, YELLOW)
-        SCREEN.blit(score_text, (200, 10))
+    def draw_pause(self, surface):
+        antialias = QUALITY.settings['antialias']
+        # 绘制半透明遮罩（暂停背景）
+        pause_mask = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+        pause_mask.fill((0, 0, 0, 180))  # 黑色半透明（透明度180）
+        surface.blit(pause_mask, (0, 0))
+
+        if self.countdown_active:
+            # 绘制倒计时文字
+            countdown_text = get_font(80).render(f"{self.resume_seconds}", antialias, YELLOW)
+            countdown_tip = get_font(40).render("即将继续游戏...", antialias, WHITE)
+            surface.blit(countdown_text, (SCREEN_WIDTH // 2 - countdown_text.get_width() // 2, SCREEN_HEIGHT // 2 - 60))
+            surface.blit(countdown_tip, (SCREEN_WIDTH // 2 - countdown_tip.get_width() // 2, SCREEN_HEIGHT // 2 + 40))
+        else:
+            # 绘制暂停菜单
+            pause_title = get_font(60).render("游戏暂停", antialias, RED)
+            surface.blit(pause_title, (SCREEN_WIDTH // 2 - pause_title.get_width() // 2, SCREEN_HEIGHT // 2 - 120))
+
+            # 绘制菜单选项（选中项黄色高亮）
+            for i, opt in enumerate(self.pause_menu_options):
+                color = YELLOW if i == self.pause_selected else WHITE
+                opt_text = get_font(48).render(opt, antialias, color)
+                surface.blit(opt_text, (SCREEN_WIDTH // 2 - opt_text.get_width() // 2, SCREEN_HEIGHT // 2 + i * 80))
+
+    def draw_game_over(self, surface):
+        player = self.player
+        # ========== 游戏结束界面强制绘制背景 ==========
+        surface.fill(BLACK)
+        surface.blit(BACKGROUND_IMG, (0, 0))
+
+        game_over = get_font(72).render('游戏结束！', True, RED)
+        surface.blit(game_over, (SCREEN_WIDTH // 2 - game_over.get_width() // 2, 150))
+
+        final_score = get_font(48).render(f'最终分数：{player.current_score}', True, YELLOW)
+        best_score = get_font(48).render(f'最佳分数：{player.best_score}', True, GREEN)
+        level = get_font(48).render(f'失败关卡：{player.level}', True, BLUE)
+        weapon = get_font(48).render(f'当前武器：{player.current_weapon}', True, WHITE)
+
+        surface.blit(final_score, (SCREEN_WIDTH // 2 - final_score.get_width() // 2, 280))
+        surface.blit(best_score, (SCREEN_WIDTH // 2 - best_score.get_width() // 2, 340))
+        surface.blit(level, (SCREEN_WIDTH // 2 - level.get_width() // 2, 400))
+        surface.blit(weapon, (SCREEN_WIDTH // 2 - weapon.get_width() // 2, 460))
+
+        tip = get_font(36).render('按ESC返回主菜单 | 按R重新开始（继续当前关卡）', True, WHITE)
+        surface.blit(tip, (SCREEN_WIDTH // 2 - tip.get_width() // 2, 520))
+
+
+class LevelTransitionScene(Scene):
+    """升级过场：显示提示的同时继续处理事件，并分帧预建下一关（替代pygame.time.wait阻塞）"""
+    DURATION = 2000  # 过场时长（毫秒）
+
+    def __init__(self, game):
+        super().__init__()
+        self.game = game
+        self.level = game.player.level
+        self.builder = game.build_level(self.level)
+        self.built = False
+        self.started_at = None
+
+    def on_enter(self):
+        self.started_at = pygame.time.get_ticks()
+
+    def update(self, now):
+        if not self.built:
+            try:
+                next(self.builder)
+            except StopIteration:
+                self.built = True
+        if self.built and now - self.started_at >= self.DURATION:
+            self.manager.pop()
+
+    def draw(self, surface):
+        # 旧关卡画面保持不动，叠加升级提示
+        self.game.draw(surface)
+        tip_text = get_font(48).render(f'恭喜！升级到第{self.level}关', True, YELLOW)
+        surface.blit(tip_text, (SCREEN_WIDTH // 2 - tip_text.get_width() // 2, SCREEN_HEIGHT // 2))
 
-        level_text = get_font(30).render(f'关卡：{player.level}', True, BLUE)
-        SCREEN.blit(level_text, (380, 10))
 
-        kill_text = get_font(30).render(f'击杀：{player.kill_count}/{player.level_kill_target}', True, GREEN)
-        SCREEN.blit(kill_text, (550, 10))
+# ===================== 压力测试（无尽模式） =====================
+class StressPlayer(Player):
+    """压力测试用玩家：不读写存档，不会升级"""
 
-        # 无敌提示
-        if invulnerable and (current_time // 100) % 2 == 0:
-            inv_text = get_font(30).render('无敌中...', True, WHITE)
-            SCREEN.blit(inv_text, (20, 90))
+    def __init__(self, level=1):
+        self.username = '压力测试'
+        self.best_score = self.points = 0
+        self.level = level
+        self.current_score = 0
+        self.kill_count = 0
+        self.level_kill_target = float('inf')
+        self.owned_weapons = ['普通子弹']
+        self.current_weapon = '普通子弹'
+        self.weapon_slot = 0
+        self.last_failed_level = level
 
-        pygame.display.flip()
+    def update_points(self, points):
+        self.points += points
+
+    def save_failed_level(self):
+        pass
+
+    def save_current_progress(self, background=False):
+        pass
+
+    def record_run(self, score, duration, kills, cause):
+        pass
+
+
+class StressScene(GameScene):
+    """无尽压力测试：外星人/子弹/星星数量在duration秒内线性增加到上限，飞船无敌，结束后显示性能汇总"""
+    BULLET_TYPES = ('normal', 'laser', 'missile', 'super_laser')
+    FPS_THRESHOLDS = (55, 30, 15)  # 记录最近FPS首次跌破这些值时的实体总数
+
+    def __init__(self, duration=60, max_aliens=2000, max_bullets=2000, max_stars=5000, level=1):
+        super().__init__('压力测试', player=StressPlayer(level))
+        self.duration = duration
+        self.max_aliens = max_aliens
+        self.max_bullets = max_bullets
+        self.max_stars = max_stars
+        self.stats = FrameStats(window=60, keep_all=True)
+        self.started_at = None
+        self.peak = {}
+        self.fps_drops = {}
+        self.memory_start = memory_usage_mb()
+
+    def on_enter(self):
+        super().on_enter()
+        self.started_at = pygame.time.get_ticks()
+
+    def command_handlers(self):
+        # 只响应ESC：提前结束并显示汇总
+        return {'back': self.finish}
+
+    def ramp(self, now):
+        """按已运行时间把各类实体补到当前目标数量"""
+        progress = min(1.0, (now - self.started_at) / 1000 / self.duration)
+        spaceship = self.spaceship
+        target_aliens = int(self.max_aliens * progress)
+        for _ in range(target_aliens - len(self.aliens) - len(self.spawns)):
+            self.spawns.respawn(now)
+        for _ in range(int(self.max_bullets * progress) - len(spaceship.bullets)):
+            spaceship.bullets.append(Bullet(random.randint(0, SCREEN_WIDTH - BULLET_WIDTH),
+                                            random.randint(SCREEN_HEIGHT // 2, SCREEN_HEIGHT),
+                                            random.choice(self.BULLET_TYPES)))
+        missing_stars = int(self.max_stars * progress) - len(self.background.stars)
+        if missing_stars > 0:
+            self.background.add_stars(missing_stars, self.player.level)
+        # 飞船左右巡航并保持无敌
+        spaceship.x = int((SCREEN_WIDTH - spaceship.width) / 2 * (1 + 0.8 * math.sin(now / 1000)))
+        self.invulnerable = True
+        self.last_hurt_time = now
+        return progress
+
+    def update(self, now):
+        self.stats.tick()
+        progress = self.ramp(now)
+        super().update(now)
+
+        counts = self.entity_counts()
+        for name, count in counts.items():
+            self.peak[name] = max(self.peak.get(name, 0), count)
+        if len(self.stats.recent) == self.stats.recent.maxlen:
+            fps = self.stats.recent_fps()
+            for threshold in self.FPS_THRESHOLDS:
+                if fps < threshold and threshold not in self.fps_drops:
+                    self.fps_drops[threshold] = sum(counts.values())
+        if progress >= 1.0:
+            self.finish()
+
+    def finish(self):
+        if not self.manager.switching:
+            self.manager.replace(StressSummaryScene(self.summary()))
+
+    def summary(self):
+        """汇总：持续FPS、帧耗时百分位、实体峰值、内存"""
+        frames = self.stats.summary()
+        memory_end = memory_usage_mb()
+        lines = [
+            f"时长 {(pygame.time.get_ticks() - self.started_at) / 1000:.1f}s | 帧数 {frames['frames']} | 平均FPS {frames['avg_fps']:.1f}",
+            f"帧耗时 p50 {frames['p50']:.1f}ms | p95 {frames['p95']:.1f}ms | p99 {frames['p99']:.1f}ms | 最大 {frames['max']:.1f}ms",
+            "峰值 " + " | ".join(f"{name} {count}" for name, count in self.peak.items()),
+        ]
+        for threshold in self.FPS_THRESHOLDS:
+            if threshold in self.fps_drops:
+                lines.append(f"FPS跌破{threshold}时实体总数：{self.fps_drops[threshold]}")
+        if memory_end is not None:
+            lines.append(f"内存峰值 {memory_end:.1f}MB（开始时 {self.memory_start:.1f}MB）")
+        return lines
+
+    def draw_hud(self, surface):
+        elapsed = (self.current_time - self.started_at) / 1000 if self.started_at else 0
+        info = get_font(30).render(f'压力测试 {elapsed:.0f}/{self.duration}s | FPS {self.stats.recent_fps():.0f}',
+                                   True, YELLOW)
+        surface.blit(info, (20, 10))
+        counts = get_font(24).render(' | '.join(f'{k} {v}' for k, v in self.entity_counts().items()), True, WHITE)
+        surface.blit(counts, (20, 45))
+        tip = get_font(24).render('按ESC提前结束', True, WHITE)
+        surface.blit(tip, (20, 75))
+
+
+class StressSummaryScene(Scene):
+    """压力测试结束汇总（同时打印到控制台，方便记录机台性能）"""
+
+    def __init__(self, lines):
+        super().__init__()
+        self.lines = lines
+
+    def on_enter(self):
+        print("===== 压力测试汇总 =====")
+        for line in self.lines:
+            print(line)
+
+    def command_handlers(self):
+        return {'back': self.manager.pop, 'confirm': self.manager.pop}
+
+    def draw(self, surface):
+        surface.fill(BLACK)
+        surface.blit(BACKGROUND_IMG, (0, 0))
+        title = get_font(48).render('压力测试汇总', True, YELLOW)
+        surface.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 60))
+        for i, line in enumerate(self.lines):
+            text = get_font(26).render(line, True, WHITE)
+            surface.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, 160 + i * 45))
+        tip = get_font(30).render('按ESC/回车返回', True, LIGHT_BLUE)
+        surface.blit(tip, (SCREEN_WIDTH // 2 - tip.get_width() // 2, 520))
 
 
 # ===================== 程序入口 =====================
-if __name__ == '__main__':
+def create_scene_manager(fps=FPS):
+    """创建场景管理器并挂上每帧钩子（音效合并播放等）"""
+    manager = SceneManager(SCREEN, fps)
+    manager.frame_hooks.append(AUDIO.flush)  # 每帧末合并播放音效
+    # 性能浮层（F3显示/隐藏）
+    QUALITY.attach(manager)  # 按实际帧耗时自动升降画质
+    profiler = ProfilerOverlay(manager, get_font, quality=QUALITY)
+    manager.frame_hooks.append(profiler.on_frame)
+    manager.overlays.append(profiler)
+    return manager
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="外星人大战")
+    parser.add_argument("--stress", action="store_true", help="跳过登录直接进入压力测试（无尽模式）")
+    parser.add_argument("--duration", type=int, default=60, help="压力测试加压时长（秒）")
+    parser.add_argument("--max-aliens", type=int, default=2000)
+    parser.add_argument("--max-bullets", type=int, default=2000)
+    parser.add_argument("--max-stars", type=int, default=5000)
+    parser.add_argument("--uncapped", action="store_true", help="不限帧率（测量机台最大帧率）")
+    parser.add_argument("--profiler", action="store_true", help="启动时显示性能浮层（游戏中按F3切换）")
+    parser.add_argument("--collision", choices=sorted(collision.BACKENDS), help="碰撞检测后端")
+    parser.add_argument("--pixel-collision", action=argparse.BooleanOptionalAction, default=None,
+                        help="逐像素碰撞（默认开启，--no-pixel-collision只用矩形）")
+    parser.add_argument("--leaderboard", metavar="HOST:PORT", help="联网排行榜服务地址（python leaderboard.py 启动）")
+    parser.add_argument("--quality", choices=["auto"] + QUALITY_NAMES,
+                        help="画质档位（默认auto按帧耗时自动调整；压力测试默认固定为高）")
+    return parser.parse_args(argv)
+
+
+def run(argv=None):
+    """启动游戏：初始化显示/音频/资源后进入登录界面（单一主循环，场景栈管理界面切换）"""
+    global COLLISION_BACKEND, PIXEL_COLLISION, LEADERBOARD
+    args = parse_args(argv)
+    if args.collision:
+        COLLISION_BACKEND = args.collision
+    if args.pixel_collision is not None:
+        PIXEL_COLLISION = args.pixel_collision
+    # 压力测试要测出机台的真实上限，默认不自动降画质
+    quality = args.quality or (QUALITY_NAMES[0] if args.stress else QUALITY_MODE)
+    if quality in QUALITY_NAMES:
+        QUALITY.set_tier(QUALITY_NAMES.index(quality))
+    address = args.leaderboard or LEADERBOARD_ADDRESS
+    if address:
+        LEADERBOARD = leaderboard.LeaderboardClient(address)
+        print(f"联网排行榜：{address}")
     # 调试：输出当前工作目录
     print(f"当前工作目录：{os.getcwd()}")
     print(f"桌面路径：{DESKTOP_PATH}")
 
     try:
+        init_display()
         init_weapon_db()
-        login_register_interface()
+        print(f"玩家数据恢复完成：{recover_users()} 名玩家")
+        manager = create_scene_manager(0 if args.uncapped else FPS)
+        if args.profiler:
+            for overlay in manager.overlays:
+                overlay.visible = True
+        if args.stress:
+            manager.run(StressScene(args.duration, args.max_aliens, args.max_bullets, args.max_stars))
+        else:
+            manager.run(LoginScene())
     except Exception as e:
         print(f"程序异常：{e}")
         traceback.print_exc()
-        pygame.quit()
-        sys.exit()
\ No newline at end of file
+    flush_writes()
+    try:
+        history.flush_runs()
+    except Exception as e:
+        print(f"对局历史保存失败：{e}")
+    checkpoint_users()
+    if LEADERBOARD is not None:
+        LEADERBOARD.close()
+    pygame.quit()
+    sys.exit()
+
+
+if __name__ == '__main__':
+    run()
\ No newline at end of file
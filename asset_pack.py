@@ -0,0 +1,213 @@
+import os
+import sys
+import mmap
+import struct
+
+import pygame
+
+# ===================== 资源包格式 =====================
+# 文件头：魔数 + 版本 + 条目数 + 像素格式 + 混音器参数（频率/位深/声道）
+# 索引：每个条目 = 名称长度 + 名称 + 类型 + 宽 + 高 + 偏移 + 长度 + 源文件大小 + 源文件修改时间(ns)
+# 数据区：预缩放的原始像素 / 混音器格式的原始PCM，按16字节对齐
+# 加载时源文件的大小/修改时间与打包时不一致，说明资源已更新：该条目改用散装文件并提示重新打包
+PACK_FILE = "alien_war_assets.pack"
+PACK_MAGIC = b"AWPK"
+PACK_VERSION = 2
+
+HEADER_STRUCT = struct.Struct("<4sHI4siiH")
+ENTRY_STRUCT = struct.Struct("<BIIQQQq")
+NAME_LEN_STRUCT = struct.Struct("<H")
+ALIGN = 16
+
+KIND_IMAGE = 0
+KIND_SOUND = 1
+
+# 打包清单（尺寸与alien_war.py中的加载尺寸一致）
+IMAGE_ASSETS = [
+    ("images/background/bg_star.png", 800, 600),
+    ("images/ship/ship_white.png", 50, 50),
+    ("images/alien/alien_red.png", 50, 50),
+    ("images/icon/game_icon.png", 64, 64),
+]
+# 背景音乐由pygame.mixer.music流式播放，不打包
+SOUND_ASSETS = [
+    "shoot.wav",
+    "hit.wav",
+    "hurt.wav",
+    "game_over.wav",
+    "level_up.wav",
+]
+
+
+def native_pixel_format():
+    """根据当前显示的带透明通道表面掩码推断原生像素字节序"""
+    masks = pygame.Surface((1, 1), pygame.SRCALPHA).convert_alpha().get_masks()
+    if masks == (0xff0000, 0xff00, 0xff, 0xff000000):
+        return "BGRA" if sys.byteorder == "little" else "ARGB"
+    if masks == (0xff, 0xff00, 0xff0000, 0xff000000):
+        return "RGBA" if sys.byteorder == "little" else "ABGR"
+    return "RGBA"
+
+
+# ===================== 构建 =====================
+def build_pack(pack_path=PACK_FILE, base_dir="."):
+    """解码所有图片/音效并写入单个资源包（需要pygame显示和混音器）"""
+    pygame.display.init()
+    if pygame.display.get_surface() is None:
+        pygame.display.set_mode((1, 1), pygame.HIDDEN)
+    if not pygame.mixer.get_init():
+        pygame.mixer.init()
+    pixel_format = native_pixel_format()
+    freq, size, channels = pygame.mixer.get_init()
+
+    entries = []  # (名称, 类型, 宽, 高, 源文件信息, 数据)
+    for path, width, height in IMAGE_ASSETS:
+        full_path = os.path.join(base_dir, path)
+        try:
+            source = os.stat(full_path)
+            img = pygame.image.load(full_path).convert_alpha()
+        except (FileNotFoundError, pygame.error) as e:
+            print(f"跳过图片：{full_path} | 错误：{e}")
+            continue
+        img = pygame.transform.scale(img, (width, height))
+        entries.append((path, KIND_IMAGE, width, height, source, pygame.image.tobytes(img, pixel_format)))
+
+    for filename in SOUND_ASSETS:
+        full_path = os.path.join(base_dir, "sounds", filename)
+        try:
+            source = os.stat(full_path)
+            raw = pygame.mixer.Sound(full_path).get_raw()
+        except (FileNotFoundError, pygame.error) as e:
+            print(f"跳过音效：{full_path} | 错误：{e}")
+            continue
+        entries.append((f"sounds/{filename}", KIND_SOUND, 0, 0, source, raw))
+
+    # 先计算索引大小，数据区从对齐后的位置开始
+    index_size = sum(NAME_LEN_STRUCT.size + len(name.encode("utf-8")) + ENTRY_STRUCT.size
+                     for name, *_ in entries)
+    offset = _align(HEADER_STRUCT.size + index_size)
+
+    tmp_path = pack_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER_STRUCT.pack(PACK_MAGIC, PACK_VERSION, len(entries),
+                                   pixel_format.encode("ascii"), freq, size, channels))
+        layout = []
+        for name, kind, width, height, source, data in entries:
+            name_bytes = name.encode("utf-8")
+            f.write(NAME_LEN_STRUCT.pack(len(name_bytes)))
+            f.write(name_bytes)
+            f.write(ENTRY_STRUCT.pack(kind, width, height, offset, len(data), source.st_size, source.st_mtime_ns))
+            layout.append((offset, data))
+            offset = _align(offset + len(data))
+        for data_offset, data in layout:
+            f.write(b"\0" * (data_offset - f.tell()))
+            f.write(data)
+    os.replace(tmp_path, pack_path)
+    print(f"资源包已生成：{pack_path}（{len(entries)}个条目，像素格式{pixel_format}）")
+    return pack_path
+
+
+def _align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+# ===================== 运行时加载 =====================
+class AssetPack:
+    """通过mmap只读映射资源包，按名称取出表面/音效，不做任何解码；源文件已修改的条目不使用"""
+
+    def __init__(self, pack_path=PACK_FILE, base_dir="."):
+        self.path = pack_path
+        self.base_dir = base_dir
+        self._stale = {}  # 名称 -> 源文件是否已修改（每个条目只检查一次）
+        self._file = open(pack_path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise
+        self._view = memoryview(self._mm)
+        magic, version, count, pixel_format, freq, size, channels = HEADER_STRUCT.unpack_from(self._mm, 0)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            self.close()
+            raise ValueError(f"资源包格式不匹配：{pack_path}")
+        self.pixel_format = pixel_format.decode("ascii")
+        self.mixer_format = (freq, size, channels)
+
+        self.entries = {}
+        pos = HEADER_STRUCT.size
+        for _ in range(count):
+            (name_len,) = NAME_LEN_STRUCT.unpack_from(self._mm, pos)
+            pos += NAME_LEN_STRUCT.size
+            name = bytes(self._mm[pos:pos + name_len]).decode("utf-8")
+            pos += name_len
+            self.entries[name] = ENTRY_STRUCT.unpack_from(self._mm, pos)
+            pos += ENTRY_STRUCT.size
+
+    def image(self, name, width=None, height=None):
+        """取出预缩放图片；条目缺失或尺寸不符时返回None（由调用方回退到散装文件）"""
+        entry = self.entries.get(name)
+        if not entry or entry[0] != KIND_IMAGE:
+            return None
+        kind, w, h, offset, length, _, _ = entry
+        if width and height and (w, h) != (width, height):
+            return None
+        if self.is_stale(name):
+            return None
+        img = pygame.image.frombuffer(self._view[offset:offset + length], (w, h), self.pixel_format)
+        # 像素格式与显示一致时convert_alpha只是一次内存拷贝，同时让表面脱离mmap
+        return img.convert_alpha()
+
+    def sound(self, name, volume=0.5):
+        """取出原始PCM音效；混音器参数与打包时不一致时返回None"""
+        entry = self.entries.get(name)
+        if not entry or entry[0] != KIND_SOUND:
+            return None
+        if pygame.mixer.get_init() != self.mixer_format:
+            return None
+        if self.is_stale(name):
+            return None
+        kind, w, h, offset, length, _, _ = entry
+        sound = pygame.mixer.Sound(buffer=self._view[offset:offset + length])
+        sound.set_volume(volume)
+        return sound
+
+    def is_stale(self, name):
+        """源文件的大小/修改时间与打包时不同则返回True（源文件不存在时仍使用包内数据）"""
+        stale = self._stale.get(name)
+        if stale is None:
+            size, mtime_ns = self.entries[name][5:]
+            try:
+                source = os.stat(os.path.join(self.base_dir, name))
+            except OSError:
+                stale = False
+            else:
+                stale = (source.st_size, source.st_mtime_ns) != (size, mtime_ns)
+            if stale:
+                print(f"资源已修改：{name}，改用散装文件（运行 python asset_pack.py 更新资源包）")
+            self._stale[name] = stale
+        return stale
+
+    def stale_entries(self):
+        return [name for name in self.entries if self.is_stale(name)]
+
+    def close(self):
+        self._view.release()
+        self._mm.close()
+        self._file.close()
+
+
+def open_pack(pack_path=PACK_FILE, base_dir="."):
+    """打开资源包；文件不存在、损坏或版本不符时返回None"""
+    if not pack_path or not os.path.exists(pack_path):
+        return None
+    try:
+        return AssetPack(pack_path, base_dir)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"资源包加载失败：{pack_path} | 错误：{e}，改用散装文件")
+        return None
+
+
+# ===================== 命令行入口 =====================
+if __name__ == '__main__':
+    # 用法：python asset_pack.py [输出路径]
+    build_pack(sys.argv[1] if len(sys.argv) > 1 else PACK_FILE)
\ No newline at end of file
@@ -0,0 +1,115 @@
+import os
+
+import pygame
+
+# ===================== 音频管理（通道分组 + 同帧合并 + 限频） =====================
+# 每个分类独占一组预留通道，互不抢占；背景音乐走 pygame.mixer.music 流式播放
+CHANNEL_GROUPS = {
+    'ui': 2,  # 界面提示音
+    'sfx': 10,  # 射击/击中/受伤等游戏音效
+}
+DEFAULT_MIN_INTERVAL = 40  # 同一音效两次播放的最小间隔（毫秒）
+
+
+class AudioManager:
+    def __init__(self, groups=None):
+        self.groups = dict(groups or CHANNEL_GROUPS)
+        self.enabled = False
+        self.sounds = {}  # 名称 -> (Sound, 分类, 最小间隔)
+        self.channels = {}  # 分类 -> [Channel]
+        self._next_channel = {}  # 分类 -> 轮询位置
+        self._pending = {}  # 本帧待播放：名称 -> 请求次数
+        self._last_played = {}  # 名称 -> 上次播放时间
+        self.music_playing = False
+        self.stats = {'requested': 0, 'played': 0, 'coalesced': 0, 'throttled': 0}
+
+    def init(self):
+        """按分组预留通道（混音器未初始化时静默禁用）"""
+        if not pygame.mixer.get_init():
+            self.enabled = False
+            return
+        total = sum(self.groups.values())
+        pygame.mixer.set_num_channels(total)
+        # 全部通道都预留，Sound.play()的自动分配不会抢占分组通道
+        pygame.mixer.set_reserved(total)
+        start = 0
+        for category, count in self.groups.items():
+            self.channels[category] = [pygame.mixer.Channel(i) for i in range(start, start + count)]
+            self._next_channel[category] = 0
+            start += count
+        self.enabled = True
+
+    def register(self, name, sound, category='sfx', min_interval=DEFAULT_MIN_INTERVAL):
+        """登记音效；load_sound返回的空音效（非pygame Sound）登记为静音"""
+        if not isinstance(sound, pygame.mixer.Sound):
+            sound = None
+        self.sounds[name] = (sound, category, min_interval)
+
+    def play(self, name):
+        """请求播放：只记录，真正播放在帧末flush时合并执行"""
+        self.stats['requested'] += 1
+        if name in self._pending:
+            self.stats['coalesced'] += 1
+        self._pending[name] = self._pending.get(name, 0) + 1
+
+    def flush(self, now=None):
+        """每帧调用一次：同名音效只播一次，且受最小间隔限制"""
+        if not self._pending:
+            return
+        if now is None:
+            now = pygame.time.get_ticks()
+        pending, self._pending = self._pending, {}
+        if not self.enabled:
+            return
+        for name in pending:
+            entry = self.sounds.get(name)
+            if not entry or entry[0] is None:
+                continue
+            sound, category, min_interval = entry
+            last = self._last_played.get(name)
+            if last is not None and now - last < min_interval:
+                self.stats['throttled'] += 1
+                continue
+            self._channel_for(category).play(sound)
+            self._last_played[name] = now
+            self.stats['played'] += 1
+
+    def _channel_for(self, category):
+        """优先选分组内空闲通道，全忙时轮询覆盖最早使用的通道"""
+        channels = self.channels.get(category) or self.channels['sfx']
+        for channel in channels:
+            if not channel.get_busy():
+                return channel
+        idx = self._next_channel.get(category, 0) % len(channels)
+        self._next_channel[category] = idx + 1
+        return channels[idx]
+
+    def stop_all(self):
+        self._pending.clear()
+        if self.enabled:
+            for channels in self.channels.values():
+                for channel in channels:
+                    channel.stop()
+
+    # ---------------------- 背景音乐（流式） ----------------------
+    def play_music(self, paths, volume=0.4, loops=-1):
+        """按顺序尝试路径，流式播放背景音乐；文件缺失时静默"""
+        if not pygame.mixer.get_init():
+            return False
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            try:
+                pygame.mixer.music.load(path)
+                pygame.mixer.music.set_volume(volume)
+                pygame.mixer.music.play(loops)
+                self.music_playing = True
+                return True
+            except pygame.error as e:
+                print(f"背景音乐加载失败：{path} | 错误：{e}")
+        return False
+
+    def stop_music(self):
+        if self.music_playing:
+            pygame.mixer.music.stop()
+            self.music_playing = False
\ No newline at end of file
@@ -0,0 +1,968 @@
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+# ===================== 基准测试工具 =====================
+# 用法：python bench.py <子命令> [参数]
+# 所有基准测试均使用SDL虚拟驱动，无需显示器/声卡
+
+HEADLESS_ENV = {"SDL_VIDEODRIVER": "dummy", "SDL_AUDIODRIVER": "dummy", "PYGAME_HIDE_SUPPORT_PROMPT": "1"}
+
+STARTUP_SNIPPET = (
+    "import time, io, contextlib\n"
+    "t = time.perf_counter()\n"
+    "with contextlib.redirect_stdout(io.StringIO()):\n"
+    "    import alien_war\n"
+    "    alien_war.init_display()\n"
+    "print(time.perf_counter() - t)\n"
+)
+
+
+def _run_snippet(snippet, extra_env):
+    env = dict(os.environ, **HEADLESS_ENV, **extra_env)
+    out = subprocess.run([sys.executable, "-c", snippet], env=env, capture_output=True,
+                         text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _report(title, samples):
+    samples = sorted(samples)
+    print(f"{title:<12} 最小 {samples[0] * 1000:8.1f} ms | 中位 {statistics.median(samples) * 1000:8.1f} ms"
+          f" | 最大 {samples[-1] * 1000:8.1f} ms")
+
+
+def bench_startup(args):
+    """冷启动对比：散装PNG/WAV解码 vs 资源包mmap映射"""
+    import asset_pack
+    pack = None if args.rebuild else asset_pack.open_pack(asset_pack.PACK_FILE)
+    stale = pack is None or bool(pack.stale_entries())  # 缺失、旧版本或源文件已修改时重新打包
+    if pack is not None:
+        pack.close()
+    if stale:
+        subprocess.run([sys.executable, "asset_pack.py"], env=dict(os.environ, **HEADLESS_ENV), check=True)
+
+    loose, packed = [], []
+    for _ in range(args.runs):
+        loose.append(_run_snippet(STARTUP_SNIPPET, {"ALIEN_WAR_ASSET_PACK": ""}))
+        packed.append(_run_snippet(STARTUP_SNIPPET, {"ALIEN_WAR_ASSET_PACK": asset_pack.PACK_FILE}))
+
+    print(f"启动耗时（{args.runs}次，含pygame初始化）")
+    _report("散装文件", loose)
+    _report("资源包", packed)
+    print(f"加速比：{statistics.median(loose) / statistics.median(packed):.2f}x")
+
+
+def _import_profile(module):
+    """用 python -X importtime 导入模块，返回 {模块名: 累计微秒}"""
+    env = dict(os.environ, **HEADLESS_ENV)
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], env=env,
+                         capture_output=True, text=True, check=True)
+    cumulative = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cum, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(cum)
+    return cumulative
+
+
+def bench_importtime(args):
+    """导入耗时：工具类模块必须不拉起pygame，且在预算内完成导入"""
+    failed = False
+    for module in args.modules:
+        samples = []
+        for _ in range(args.runs):
+            profile = _import_profile(module)
+            samples.append(profile.get(module, 0))
+        heavy = sorted(((us, name) for name, us in profile.items() if name != module), reverse=True)[:5]
+        median_ms = statistics.median(samples) / 1000
+        uses_pygame = "pygame" in profile
+        status = "OK"
+        if median_ms > args.budget_ms or (uses_pygame and module in args.no_pygame):
+            status = "超出预算" if median_ms > args.budget_ms else "导入了pygame"
+            failed = True
+        print(f"{module:<12} 中位 {median_ms:7.1f} ms | pygame: {'是' if uses_pygame else '否'} | {status}")
+        for us, name in heavy:
+            print(f"    {name:<30} {us / 1000:7.1f} ms")
+    if failed:
+        sys.exit(1)
+
+
+def bench_soak(args):
+    """场景栈浸泡测试：反复 开始游戏->游戏结束->重开/返回菜单，检查栈深度和内存保持平稳"""
+    import gc
+    import io
+    import tempfile
+    import tracemalloc
+    import contextlib
+
+    os.environ.update(HEADLESS_ENV)
+    import pygame
+    import storage
+    import history
+    import alien_war
+
+    tmp_dir = tempfile.mkdtemp(prefix="alien_war_soak_")
+    storage.USER_FILE = os.path.join(tmp_dir, "users.dat")
+    storage.DB_FILE = os.path.join(tmp_dir, "weapons.db")
+    history.HISTORY_FILE = os.path.join(tmp_dir, "history.db")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        alien_war.init_display()
+        storage.init_weapon_db()
+        storage.save_user("soak_user", "soak_pw")
+    manager = alien_war.create_scene_manager(fps=0)
+    manager.push(alien_war.LoginScene())
+    manager.push(alien_war.MenuScene("soak_user"))
+    manager._apply_pending()
+
+    def frames(n):
+        for _ in range(n):
+            manager.step()
+
+    def until_changed(scene, limit=1000):
+        # 游戏中的命令由下一个固定模拟步消费，不一定在当前帧生效：推进到栈顶场景变化为止
+        for _ in range(limit):
+            if manager.top is not scene:
+                return
+            manager.step()
+
+    max_depth = 0
+    baseline = None
+    tracemalloc.start()
+    sink = io.StringIO()
+    for round_no in range(1, args.rounds + 1):
+        with contextlib.redirect_stdout(sink):
+            if not isinstance(manager.top, alien_war.GameScene):
+                # 主菜单：选中“开始游戏”（命令直接注入，与按键走同一条分发路径）
+                manager.top.selected = 0
+                manager.input.inject('confirm')
+                until_changed(manager.top)
+            frames(args.frames)
+            game = manager.top
+            game.game_over()
+            frames(1)
+            # 偶数轮按R重开，奇数轮按ESC回到主菜单
+            manager.input.inject('restart' if round_no % 2 == 0 else 'back')
+            until_changed(game)
+            del game
+        sink.seek(0)
+        sink.truncate()
+        max_depth = max(max_depth, len(manager.stack))
+
+        if round_no == args.warmup:
+            gc.collect()
+            baseline = tracemalloc.get_traced_memory()[0]
+        if round_no % args.report_every == 0 or round_no == args.rounds:
+            gc.collect()
+            current = tracemalloc.get_traced_memory()[0]
+            games = sum(isinstance(o, alien_war.GameScene) for o in gc.get_objects())
+            print(f"第{round_no:6d}轮 | 栈深度 {len(manager.stack)} | 存活GameScene {games} | "
+                  f"内存 {current / 1024:8.1f} KB")
+
+    gc.collect()
+    growth = tracemalloc.get_traced_memory()[0] - (baseline or 0)
+    tracemalloc.stop()
+    ok = max_depth <= 3 and growth <= args.max_growth_kb * 1024
+    print(f"最大栈深度 {max_depth} | 预热后内存增长 {growth / 1024:.1f} KB（上限 {args.max_growth_kb} KB）"
+          f" | {'通过' if ok else '失败'}")
+    pygame.quit()
+    if not ok:
+        sys.exit(1)
+
+
+class _Box:
+    """碰撞基准用的最小实体（x/y/width/height，逐像素对比时带mask）"""
+    __slots__ = ("x", "y", "width", "height", "mask")
+
+    def __init__(self, x, y, width, height, mask=None):
+        self.x, self.y, self.width, self.height, self.mask = x, y, width, height, mask
+
+
+def bench_collision(args):
+    """碰撞后端对比：相同的随机子弹/外星人分布下，各后端查询耗时及结果与brute一致性"""
+    import time
+    import random
+    import collision
+
+    if "rect" in args.backends or args.pixel:
+        os.environ.update(HEADLESS_ENV)
+    alien_mask = bullet_masks = None
+    if args.pixel:
+        # 与游戏相同的遮罩：外星人图片缩放到50x50后按透明度生成，子弹为实心矩形
+        import pygame
+        alien_mask = pygame.mask.from_surface(
+            pygame.transform.scale(pygame.image.load("images/alien/alien_red.png"), (50, 50)))
+        bullet_masks = {w: pygame.mask.Mask((w, 15), fill=True) for w in (5, 8, 10)}
+    rng = random.Random(args.seed)
+    width, height = 800, 600
+    # 整数坐标：rect后端会把坐标截断为整数，用整数才能逐对比较结果
+    aliens = [_Box(rng.randint(0, width - 50), rng.randint(-100, height), 50, 50, alien_mask)
+              for _ in range(args.aliens)]
+    bullets = []
+    for _ in range(args.bullets):
+        w = rng.choice((5, 8, 10))
+        bullets.append(_Box(rng.randint(0, width - 10), rng.randint(0, height), w, 15,
+                            bullet_masks and bullet_masks[w]))
+
+    print(f"子弹 {args.bullets} x 外星人 {args.aliens}，每个后端 {args.runs} 次")
+    broad_times = {}
+    for pixel in (False, True) if args.pixel else (False,):
+        expected = None
+        for name in args.backends:
+            backend = collision.get_backend(name, pixel)
+            samples = []
+            for _ in range(args.runs):
+                t = time.perf_counter()
+                result = backend.pairs(bullets, aliens)
+                samples.append(time.perf_counter() - t)
+            ids = [(id(a), id(b)) for a, b in result]
+            if expected is None:
+                expected = ids
+            status = "一致" if ids == expected else "不一致！"
+            _report(backend.name, samples)
+            print(f"{'':<12} 相交对 {len(result)} | 与{collision.get_backend(args.backends[0], pixel).name}结果{status}")
+            if ids != expected:
+                sys.exit(1)
+            best = min(samples) * 1000  # 取最小值：受机器抖动影响最小
+            if not pixel:
+                broad_times[name] = best
+                broad_pairs = len(result)
+                continue
+            # 逐像素的额外开销 = 同一宽相位后端加遮罩前后的耗时差，相对宽相位本身的耗时计算预算
+            overhead = best - broad_times[name]
+            ok = overhead <= broad_times[name] * args.mask_budget
+            print(f"{'':<12} 遮罩额外开销 {overhead:.2f} ms（宽相位的{overhead / broad_times[name]:.0%}，"
+                  f"上限{args.mask_budget:.0%}）| 候选对 {len(result)}/{broad_pairs} 保留 | {'通过' if ok else '超出预算'}")
+            if not ok:
+                sys.exit(1)
+
+
+def bench_hash(args):
+    """密码哈希耗时（用于调整credentials.py中的强度参数，登录验证在后台线程执行）"""
+    import time
+    import credentials
+
+    if args.iterations:
+        credentials.PBKDF2_ITERATIONS = args.iterations
+    if args.scrypt_n:
+        credentials.SCRYPT_N = args.scrypt_n
+    print(f"pbkdf2迭代 {credentials.PBKDF2_ITERATIONS} | scrypt n={credentials.SCRYPT_N} "
+          f"r={credentials.SCRYPT_R} p={credentials.SCRYPT_P}")
+    for algorithm in ("pbkdf2_sha256", "scrypt"):
+        stored = credentials.hash_password("benchmark", algorithm)
+        samples = []
+        for _ in range(args.runs):
+            t = time.perf_counter()
+            credentials.verify_password("benchmark", stored)
+            samples.append(time.perf_counter() - t)
+        _report(algorithm, samples)
+
+
+def bench_purchase(args):
+    """武器购买：单事务提交 vs 原来的逐字段保存（扣分/已购/当前武器/进度共4次写入），比较耗时和日志写入量"""
+    import io
+    import time
+    import tempfile
+    import contextlib
+    import storage
+
+    tmp_dir = tempfile.mkdtemp(prefix="alien_war_purchase_")
+    storage.USER_FILE = os.path.join(tmp_dir, "users.dat")
+    storage.DB_FILE = os.path.join(tmp_dir, "weapons.db")
+    storage.COMPACT_EVERY = 10 ** 9  # 测量期间不压缩，日志大小即写入量
+    storage.JOURNAL_FSYNC = not args.no_fsync
+    with contextlib.redirect_stdout(io.StringIO()):
+        storage.init_weapon_db()
+    weapons = [name for name, (price, _, _) in storage.get_weapon_catalog().items() if price > 0]
+    players = [{"username": f"buyer{i}", "password": "x", "best_score": 0, "points": 10 ** 6,
+                "owned_weapons": ['普通子弹'], "current_weapon": '普通子弹', "last_level": 1}
+               for i in range(args.players)]
+
+    def per_field(username, weapon_name):
+        price = storage.get_weapon_info(weapon_name)[0]
+        storage.update_user_data(username, points=-price)
+        storage.save_owned_weapons(username, storage.get_owned_weapons(username) + [weapon_name])
+        storage.update_user_data(username, current_weapon=weapon_name)
+        storage.update_user_data(username, best_score=0, current_weapon=weapon_name, last_level=1)
+
+    journal = storage.USER_FILE + storage.JOURNAL_SUFFIX
+    print(f"{args.players} 名玩家 x {len(weapons)} 件武器 | fsync: {'否' if args.no_fsync else '是'}")
+    for title, buy in (("逐字段保存", per_field), ("单事务购买", storage.purchase_weapon)):
+        storage.write_users(dict(player) for player in players)
+        samples = []
+        for player in players:
+            for weapon_name in weapons:
+                t = time.perf_counter()
+                buy(player["username"], weapon_name)
+                samples.append(time.perf_counter() - t)
+        _report(title, samples)
+        print(f"{'':<12} 日志写入 {os.path.getsize(journal) / len(samples):.0f} 字节/次")
+
+
+def bench_events(args):
+    """事件总线：每帧多次击杀时逐条处理（原来的内联副作用）vs 按帧合并，比较主循环耗时和积分日志写入；
+    再加一个慢订阅者（如统计上报），比较在主线程处理与放到后台线程时的每帧耗时"""
+    import io
+    import time
+    import tempfile
+    import contextlib
+
+    os.environ.update(HEADLESS_ENV)
+    import pygame
+    import storage
+    import history
+    import alien_war
+    from events import AlienKilled, BackgroundSubscriber
+
+    tmp_dir = tempfile.mkdtemp(prefix="alien_war_events_")
+    storage.USER_FILE = os.path.join(tmp_dir, "users.dat")
+    storage.DB_FILE = os.path.join(tmp_dir, "weapons.db")
+    history.HISTORY_FILE = os.path.join(tmp_dir, "history.db")
+    storage.COMPACT_EVERY = 10 ** 9  # 测量期间不压缩，日志大小即写入量
+    storage.JOURNAL_FSYNC = not args.no_fsync
+    with contextlib.redirect_stdout(io.StringIO()):
+        alien_war.init_display()
+        storage.init_weapon_db()
+        storage.save_user("bench_events", "pw")
+    journal = storage.USER_FILE + storage.JOURNAL_SUFFIX
+    kill = AlienKilled(400, 300, 10, 5)
+
+    def run(per_event, slow=None):
+        with contextlib.redirect_stdout(io.StringIO()):
+            scene = alien_war.GameScene("bench_events")
+        start = scene.player.points
+        if slow is not None:
+            scene.events.subscribe(slow, AlienKilled)
+        storage.flush_writes()
+        before = os.path.getsize(journal) if os.path.exists(journal) else 0
+        samples = []
+        for _ in range(args.frames):
+            t = time.perf_counter()
+            for _ in range(args.kills):
+                scene.events.publish(kill)
+                if per_event:
+                    scene.events.dispatch()
+            scene.events.dispatch()
+            samples.append(time.perf_counter() - t)
+        t = time.perf_counter()
+        storage.flush_writes()
+        if slow is not None and hasattr(slow, "flush"):
+            slow.flush()
+        drain = time.perf_counter() - t
+        gained = storage.get_user_data("bench_events")[1] - start  # 以落盘结果为准
+        return samples, os.path.getsize(journal) - before, drain, gained
+
+    print(f"每帧击杀 {args.kills} 次 x {args.frames} 帧 | fsync: {'否' if args.no_fsync else '是'}")
+    points = []
+    for title, per_event in (("逐条处理", True), ("按帧合并", False)):
+        samples, written, drain, total = run(per_event)
+        points.append(total)
+        _report(title, samples)
+        print(f"{'':<12} 积分日志 {written / args.frames:.0f} 字节/帧 | 退出时等待后台写入 {drain * 1000:.0f} ms")
+
+    def slow_analytics(events):
+        time.sleep(args.slow_ms / 1000)  # 模拟耗时的统计上报
+
+    inline, _, _, _ = run(False, slow_analytics)
+    threaded, _, _, _ = run(False, BackgroundSubscriber(slow_analytics))
+    _report("慢订阅者", inline)
+    _report("后台线程", threaded)
+    pygame.quit()
+    expected = args.kills * kill.points * args.frames
+    ok = points[0] == points[1] == expected and statistics.median(threaded) < statistics.median(inline)
+    print(f"两种方式落盘积分一致：{'是' if points[0] == points[1] == expected else '否'} | "
+          f"慢订阅者放到后台后主循环不再等待：{'是' if statistics.median(threaded) < statistics.median(inline) else '否'}"
+          f" | {'通过' if ok else '失败'}")
+    if not ok:
+        sys.exit(1)
+
+
+def bench_migrate(args):
+    """武器库启动迁移：新库/旧版库（无版本表）迁移耗时，已是最新时的启动耗时且不写库；迁移重复执行结果不变"""
+    import io
+    import sqlite3
+    import tempfile
+    import contextlib
+    import storage
+
+    tmp_dir = tempfile.mkdtemp(prefix="alien_war_migrate_")
+    storage.DB_FILE = os.path.join(tmp_dir, "weapons.db")
+    sink = io.StringIO()
+
+    def fresh():
+        if os.path.exists(storage.DB_FILE):
+            os.remove(storage.DB_FILE)
+        with contextlib.redirect_stdout(sink):
+            storage.init_weapon_db()
+
+    custom = ('等离子炮', 3000, 40, 'laser')  # 管理员在旧版库中加的武器（不在种子表里）
+
+    def legacy():
+        # 最初版本的游戏留下的库：weapons表以名称为主键、没有id列，也没有版本表
+        os.remove(storage.DB_FILE)
+        conn = sqlite3.connect(storage.DB_FILE)
+        conn.execute('CREATE TABLE weapons (name TEXT PRIMARY KEY, price INTEGER, damage INTEGER, bullet_type TEXT)')
+        conn.execute('INSERT INTO weapons VALUES (?,?,?,?)', custom)
+        conn.executemany('INSERT INTO weapons VALUES (?,?,?,?)', [weapon[1:] for weapon in storage.DEFAULT_WEAPONS])
+        conn.commit()
+        conn.close()
+        with contextlib.redirect_stdout(sink):
+            storage.init_weapon_db()
+
+    def rows():
+        conn = sqlite3.connect(storage.DB_FILE)
+        try:
+            return conn.execute('SELECT * FROM weapons ORDER BY id').fetchall()
+        finally:
+            conn.close()
+
+    _report("新建库", _time_calls(fresh, args.runs))
+    expected = rows()
+    _report("旧版库", _time_calls(legacy, args.runs))
+    # 种子表中的武器沿用种子ID（旧玩家文件按名称记录的已购武器不变），自定义武器排在之后
+    same_legacy = rows() == expected + [(expected[-1][0] + 1,) + custom]
+    expected = rows()
+
+    # 已是最新：只读一次版本号，文件不应被改写
+    before = os.stat(storage.DB_FILE)
+    current = _time_calls(storage.init_weapon_db, args.runs * 10)
+    after = os.stat(storage.DB_FILE)
+    untouched = (before.st_mtime_ns, before.st_size) == (after.st_mtime_ns, after.st_size)
+    _report("已是最新", current)
+
+    # 幂等：清空版本表后全部迁移再执行一遍，目录不变
+    conn = sqlite3.connect(storage.DB_FILE, isolation_level=None)
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('DELETE FROM schema_version')
+        with contextlib.redirect_stdout(sink):
+            reapplied = storage.migrate(conn)
+        conn.execute('COMMIT')
+    finally:
+        conn.close()
+    idempotent = rows() == expected and reapplied == len(storage.WEAPON_MIGRATIONS)
+
+    # 删除ID最大的武器后再新增：ID不能复用（否则买过被删武器的玩家会直接拥有新武器）
+    storage.save_weapon("bench_deleted", 0, 1, "normal")
+    deleted_id = storage.get_weapon_ids()["bench_deleted"]
+    storage.delete_weapon("bench_deleted")
+    storage.save_weapon("bench_added", 0, 1, "normal")
+    ids_kept = storage.get_weapon_ids()["bench_added"] > deleted_id
+    storage.delete_weapon("bench_added")
+
+    ok = same_legacy and untouched and idempotent and ids_kept
+    print(f"武器 {len(expected)} 件 | 旧版库迁移后一致：{'是' if same_legacy else '否'}"
+          f" | 已是最新时未写库：{'是' if untouched else '否'} | 重复迁移结果不变：{'是' if idempotent else '否'}"
+          f" | 删除的武器ID不复用：{'是' if ids_kept else '否'}"
+          f" | {'通过' if ok else '失败'}")
+    if not ok:
+        sys.exit(1)
+
+
+def _contention_worker(task):
+    """多进程争用测试的工作进程：对少数几个玩家反复加积分/刷新最高分，并尝试注册同一个新用户"""
+    import random
+    import storage
+    import credentials
+
+    user_file, db_file, worker_id, ops, players, compact_every = task
+    storage.USER_FILE, storage.DB_FILE = user_file, db_file
+    storage.COMPACT_EVERY = compact_every
+    storage.JOURNAL_FSYNC = False
+    credentials.PBKDF2_ITERATIONS = 1000
+    rng = random.Random(worker_id)
+    added = {}
+    best = {}
+    for op in range(ops):
+        username = f"player{rng.randrange(players)}"
+        score = worker_id * ops + op
+        storage.update_user_data(username, best_score=score, points=1)
+        added[username] = added.get(username, 0) + 1
+        best[username] = max(best.get(username, 0), score)
+    registered = storage.save_user("newcomer", f"pw{worker_id}")
+    return added, best, registered
+
+
+def bench_contention(args):
+    """多进程争用：N个进程同时对同一份玩家文件做积分增量，检查没有丢失任何一次更新"""
+    import io
+    import time
+    import tempfile
+    import contextlib
+    from concurrent.futures import ProcessPoolExecutor
+    import storage
+
+    tmp_dir = tempfile.mkdtemp(prefix="alien_war_contention_")
+    storage.USER_FILE = os.path.join(tmp_dir, "users.dat")
+    storage.DB_FILE = os.path.join(tmp_dir, "weapons.db")
+    with contextlib.redirect_stdout(io.StringIO()):
+        storage.init_weapon_db()
+    storage.write_users({"username": f"player{i}", "password": "x", "best_score": 0, "points": 0,
+                         "owned_weapons": ['普通子弹'], "current_weapon": '普通子弹', "last_level": 1}
+                        for i in range(args.players))
+
+    tasks = [(storage.USER_FILE, storage.DB_FILE, worker_id, args.ops, args.players, args.compact_every)
+             for worker_id in range(args.workers)]
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(_contention_worker, tasks))
+    elapsed = time.perf_counter() - started
+
+    expected_points, expected_best = {}, {}
+    for added, best, _ in results:
+        for username, count in added.items():
+            expected_points[username] = expected_points.get(username, 0) + count
+        for username, score in best.items():
+            expected_best[username] = max(expected_best.get(username, 0), score)
+    storage.checkpoint_users()
+    users = {user["username"]: user for user in storage.iter_users()}
+    lost = sum(expected_points.get(name, 0) - users[name]["points"] for name in expected_points)
+    wrong_best = [name for name, score in expected_best.items() if users[name]["best_score"] != score]
+    registrations = sum(registered for _, _, registered in results)
+    total = args.workers * args.ops
+    print(f"{args.workers} 个进程 x {args.ops} 次更新（{args.players} 名玩家，每{args.compact_every}条日志压缩一次）"
+          f"：{elapsed:.2f}s，{total / elapsed:.0f} 次/秒")
+    print(f"丢失的积分增量 {lost} | 最高分错误 {len(wrong_best)} | 同名注册成功 {registrations} 次（应为1）")
+    ok = lost == 0 and not wrong_best and registrations == 1
+    print("通过" if ok else "失败")
+    if not ok:
+        sys.exit(1)
+
+
+def bench_leaderboard(args):
+    """联网排行榜：本进程内起服务端替身，比较逐条提交与批量提交的往返次数/耗时，
+    检查最终排名正确、主线程调用不阻塞、服务端断开后仍返回缓存"""
+    import time
+    import random
+    import leaderboard
+
+    rng = random.Random(args.seed)
+    scores = [(f"pilot{rng.randrange(args.players)}", rng.randrange(100000)) for _ in range(args.submits)]
+    expected = {}
+    for username, score in scores:
+        expected[username] = max(expected.get(username, 0), score)
+    expected_top = sorted(expected.items(), key=lambda item: (-item[1], item[0]))[:args.top_k]
+
+    ok = True
+    for title, batch_size in (("逐条提交", 1), (f"批量提交({args.batch_size})", args.batch_size)):
+        service = leaderboard.ServerThread()
+        client = leaderboard.LeaderboardClient(service.address, batch_size=batch_size, top_k=args.top_k,
+                                               flush_interval=0.05)
+        samples = []
+        started = time.perf_counter()
+        for username, score in scores:
+            t = time.perf_counter()
+            client.submit(username, score, points=score // 10, last_level=1)
+            samples.append(time.perf_counter() - t)
+            if batch_size == 1:
+                client.flush()
+        client.flush()
+        elapsed = time.perf_counter() - started
+        client.invalidate(wait=True)
+        total, entries = client.top()
+        got_top = [(entry["username"], entry["best_score"]) for entry in entries]
+        correct = total == len(expected) and got_top == expected_top
+        ok = ok and correct
+        _report(f"{title} submit", samples)
+        print(f"{'':<12} 全部送达 {elapsed * 1000:.0f} ms | 服务端请求 {service.server.requests} 次 | "
+              f"排名{'正确' if correct else '错误'}")
+
+        samples = []
+        for _ in range(1000):
+            t = time.perf_counter()
+            client.top()
+            samples.append(time.perf_counter() - t)
+        _report("top() 读缓存", samples)
+
+        service.stop()
+        client.submit("late", 1)
+        t = time.perf_counter()
+        cached = client.top()
+        delivered = client.flush(timeout=0.5)
+        print(f"{'':<12} 服务端停止后：top() {'返回缓存' if cached else '无数据'} "
+              f"{(time.perf_counter() - t) * 1000:.0f} ms（含flush等待）| 未送达成绩保留：{not delivered}")
+        ok = ok and cached is not None and not delivered
+        client.close(timeout=0)
+    print("通过" if ok else "失败")
+    if not ok:
+        sys.exit(1)
+
+
+def bench_history(args):
+    """对局历史：逐局提交 vs 批量提交的写入耗时，一年流水的文件大小，以及常用查询耗时"""
+    import io
+    import time
+    import random
+    import sqlite3
+    import tempfile
+    import contextlib
+    from datetime import datetime, timedelta
+    import storage
+    import history
+
+    tmp_dir = tempfile.mkdtemp(prefix="alien_war_history_")
+    storage.DB_FILE = os.path.join(tmp_dir, "weapons.db")
+    with contextlib.redirect_stdout(io.StringIO()):
+        storage.init_weapon_db()
+    weapons = list(storage.get_weapon_catalog())
+    rng = random.Random(args.seed)
+    start = datetime(2025, 1, 1, 10)
+
+    def runs(days, per_day):
+        for day in range(days):
+            for _ in range(per_day):
+                level = min(30, 1 + int(rng.expovariate(0.3)))
+                yield (f"player{rng.randrange(args.players)}", rng.randrange(level * 500), rng.uniform(20, 600),
+                       level, rng.randrange(level * 30), rng.choice(weapons), rng.choice(history.CAUSES),
+                       start + timedelta(days=day, seconds=rng.randrange(12 * 3600)))
+
+    def fill(path, batch_runs, days, per_day):
+        store = history.RunHistory(path, batch_runs=batch_runs, flush_interval=None)
+        samples = []
+        started = time.perf_counter()
+        for run in runs(days, per_day):
+            t = time.perf_counter()
+            store.record(*run)
+            samples.append(time.perf_counter() - t)
+        storage.flush_writes()
+        store.flush()
+        return store, samples, time.perf_counter() - started
+
+    sample_days = max(1, args.compare_runs // args.runs_per_day)
+    for title, batch_runs in (("逐局提交", 1), (f"批量提交({args.batch_runs})", args.batch_runs)):
+        path = os.path.join(tmp_dir, f"compare{batch_runs}.db")
+        _, samples, elapsed = fill(path, batch_runs, sample_days, args.runs_per_day)
+        _report(f"{title} record", samples)
+        print(f"{'':<12} {len(samples)} 局全部落盘 {elapsed * 1000:.0f} ms（{len(samples) / elapsed:.0f} 局/秒）")
+
+    path = os.path.join(tmp_dir, "year.db")
+    store, _, elapsed = fill(path, args.batch_runs, args.days, args.runs_per_day)
+    total = store.run_count()
+    size = os.path.getsize(path)
+    print(f"{args.days} 天 x {args.runs_per_day} 局 = {total} 局：写入 {elapsed:.1f}s | 文件 {size / 1024 / 1024:.1f} MB"
+          f"（{size / total:.0f} 字节/局，含索引）")
+    queries = {
+        "单个玩家最近20局": lambda: store.user_history(f"player{rng.randrange(args.players)}"),
+        "全年每日活跃玩家": lambda: store.daily_active_players(),
+        "最近30天活跃玩家": lambda: store.daily_active_players(start.date() + timedelta(days=args.days - 30)),
+        "各关卡得分分布": lambda: store.score_distribution(bucket=500),
+        "单关卡得分分布": lambda: store.score_distribution(level=3, bucket=100),
+    }
+    for title, query in queries.items():
+        _report(title, _time_calls(query, args.runs))
+
+    # 报表：汇总表 vs 每次扫描全部对局，结果必须一致
+    raw_sql = {
+        "rollup_level": "SELECT level, COUNT(*), SUM(score), MAX(score), SUM(kills), SUM(duration), SUM(cause=0) "
+                        "FROM runs GROUP BY level ORDER BY level",
+        "rollup_daily": "SELECT day, COUNT(*), COUNT(DISTINCT player), SUM(score), SUM(duration), SUM(kills) "
+                        "FROM runs GROUP BY day ORDER BY day",
+        "rollup_weapon": "SELECT day, weapon, COUNT(*) FROM runs GROUP BY day, weapon ORDER BY day, weapon",
+        "rollup_churn": "SELECT level, COUNT(*) FROM (SELECT level, MAX(day * 86400 + second) FROM runs "
+                        "GROUP BY player) GROUP BY level ORDER BY level",
+    }
+    conn = sqlite3.connect(path)
+
+    def dump():
+        return {table: conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2").fetchall() for table in raw_sql}
+
+    incremental = dump()
+    ok = True
+    for table, sql in raw_sql.items():
+        raw_rows = []
+        samples = _time_calls(lambda: raw_rows.append(conn.execute(sql).fetchall()), args.runs)
+        matched = incremental[table] == raw_rows[0]
+        ok = ok and matched
+        _report(f"扫描对局 {table}", samples)
+        print(f"{'':<12} 汇总表 {len(incremental[table])} 行，{'与扫描结果一致' if matched else '与扫描结果不一致'}")
+    reports = {
+        "汇总 各关卡报表": store.level_report,
+        "汇总 武器使用率": store.weapon_report,
+        "汇总 流失点": store.churn_report,
+        "汇总 每日概况": store.daily_report,
+    }
+    for title, report in reports.items():
+        _report(title, _time_calls(report, args.runs))
+
+    t = time.perf_counter()
+    count = store.rebuild_rollups()
+    rebuilt = dump()
+    print(f"回填 {count} 局：{time.perf_counter() - t:.1f}s，{'与增量结果一致' if rebuilt == incremental else '与增量结果不一致'}")
+    ok = ok and rebuilt == incremental
+    conn.close()
+    print("通过" if ok else "失败")
+    if not ok:
+        sys.exit(1)
+
+
+def bench_particles(args):
+    """粒子风暴：每帧多处导弹爆炸，缓冲始终写满，检查每帧更新+绘制耗时、容量上限和热循环无内存分配"""
+    import time
+    import random
+    import tracemalloc
+
+    os.environ.update(HEADLESS_ENV)
+    import pygame
+    import particles
+
+    pygame.init()
+    screen = pygame.display.set_mode((800, 600))
+    system = particles.ParticleSystem(args.capacity, seed=args.seed)
+    rng = random.Random(args.seed)
+    # 爆炸位置预先生成，计时和内存统计只包含粒子系统本身
+    bursts = [(rng.randrange(800), rng.randrange(600)) for _ in range(args.frames * args.bursts)]
+
+    update_samples = [0.0] * args.frames
+
+    def frame(i, timed=False):
+        for x, y in bursts[i * args.bursts:(i + 1) * args.bursts]:
+            system.emit('spark', x, y, 6)
+            system.emit('blast', x, y, 16)
+            system.emit('explosion', x, y, 24)
+        t = time.perf_counter()
+        system.update()
+        if timed:
+            update_samples[i] = time.perf_counter() - t
+        screen.fill((0, 0, 0))
+        system.draw(screen)
+
+    for i in range(args.warmup):
+        frame(i)
+    # 计时和内存统计分两遍跑（tracemalloc会显著拖慢计时）
+    samples = [0.0] * args.frames
+    max_live = 0
+    for i in range(args.frames):
+        t = time.perf_counter()
+        frame(i, timed=True)
+        samples[i] = time.perf_counter() - t
+        max_live = max(max_live, system.live)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(args.frames):
+        frame(i)
+    growth = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    pygame.quit()
+
+    samples.sort()
+    p99 = samples[int(len(samples) * 0.99)] * 1000
+    print(f"容量 {args.capacity} | 每帧爆炸 {args.bursts} 处（{args.bursts * 46} 个粒子）| {args.frames} 帧")
+    _report("更新+绘制", samples)
+    _report("其中批量更新", update_samples)
+    # 允许与帧数无关的常数级差异（tracemalloc自身的簿记），不允许随帧数增长
+    ok = max_live <= args.capacity and p99 <= args.budget_ms and growth <= args.max_growth_bytes
+    print(f"p99 {p99:.2f} ms（上限 {args.budget_ms} ms）| 最大存活 {max_live} | 覆盖最旧 {system.dropped}"
+          f" | 热循环内存增长 {growth} B（上限 {args.max_growth_bytes} B）| {'通过' if ok else '失败'}")
+    if not ok:
+        sys.exit(1)
+
+
+def bench_quality(args):
+    """自适应画质：先在高关卡实测各档位每帧耗时，再用实测耗时模拟弱机台+负载突增，检查降档/恢复且不来回跳档"""
+    import io
+    import time
+    import random
+    import tempfile
+    import contextlib
+
+    os.environ.update(HEADLESS_ENV)
+    import pygame
+    import storage
+    import history
+    import alien_war
+    from profiler import QualityGovernor, QUALITY_NAMES
+
+    tmp_dir = tempfile.mkdtemp(prefix="alien_war_quality_")
+    storage.USER_FILE = os.path.join(tmp_dir, "users.dat")
+    storage.DB_FILE = os.path.join(tmp_dir, "weapons.db")
+    history.HISTORY_FILE = os.path.join(tmp_dir, "history.db")
+    with contextlib.redirect_stdout(io.StringIO()):
+        alien_war.init_display()
+        storage.init_weapon_db()
+    rng = random.Random(args.seed)
+    costs = []
+    for tier, name in enumerate(QUALITY_NAMES):
+        alien_war.QUALITY.set_tier(tier)
+        random.seed(args.seed)
+        with contextlib.redirect_stdout(io.StringIO()):
+            scene = alien_war.GameScene("bench", alien_war.StressPlayer(args.level))
+        scene.invulnerable, scene.invulnerable_time = True, float('inf')  # 只测耗时，飞船不会被撞死
+        for _ in range(args.aliens):
+            scene.aliens.append(alien_war.Alien(args.level, rng.randrange(750), rng.randrange(-50, 400)))
+        samples = []
+        for frame in range(args.warmup + args.frames):
+            for _ in range(args.bursts):
+                scene.effect('explosion', rng.randrange(800), rng.randrange(600), 24)
+            t = time.perf_counter()
+            scene.update(frame * 1000 // 60)
+            scene.draw(alien_war.SCREEN)
+            if frame >= args.warmup:  # 预热帧（字体/精灵首次加载、粒子池填满）不计入
+                samples.append(time.perf_counter() - t)
+        costs.append(statistics.median(samples) * 1000)
+        print(f"{name:<4} 每帧 {costs[-1]:6.2f} ms | 星星 {len(scene.background.stars)}"
+              f"（绘制 {sum(1 for _ in scene.background.visible_stars())}）| 粒子上限 {scene.particles.limit}")
+    alien_war.QUALITY.set_tier(0, auto=True)
+    pygame.quit()
+
+    # 升降档模拟用固定的相对耗时模型（实测值受机器抖动影响太大，不适合做通过判定）：
+    # 弱机台上最高档的耗时为帧预算的 args.slowdown 倍，中段负载再乘 args.spike（如满屏爆炸）
+    governor = QualityGovernor(fps=60)
+    model = [float(c) for c in args.model]
+    scale = governor.budget_ms * args.slowdown
+    phases = [(1.0, args.seconds * 60), (args.spike, args.seconds * 60), (1.0, args.seconds * 60 * 2)]
+    tiers, over = [], []
+    for load, frames in phases:
+        for _ in range(frames):
+            frame_ms = model[governor.tier] * scale * load * rng.uniform(0.9, 1.1)
+            over.append(frame_ms > governor.budget_ms)
+            governor.add(frame_ms)
+            tiers.append(governor.tier)
+        print(f"负载 x{load:<4} {frames} 帧 | 结束档位 {governor.name} | 超预算帧 {sum(over[-frames:]) / frames:.0%}")
+    # 每个阶段的后半段应已稳定：不再换档；最低档扛得住该负载时不再超预算（允许抖动），扛不住时应停在最低档
+    settled = True
+    start = 0
+    for load, frames in phases:
+        tail = slice(start + frames // 2, start + frames)
+        if model[-1] * scale * load * 1.1 <= governor.budget_ms:
+            settled &= sum(over[tail]) <= frames // 2 * args.max_over
+        else:
+            settled &= tiers[tail][0] == len(QUALITY_NAMES) - 1
+        settled &= len(set(tiers[tail])) == 1
+        start += frames
+    # 负载回落后不应停在不必要的低档：再升一档的耗时应已超过升档阈值
+    tier = governor.tier
+    recovered = tier == 0 or model[tier - 1] * scale > governor.budget_ms * governor.upgrade_ratio
+    ok = settled and recovered and governor.changes <= args.max_changes
+    print(f"换档 {governor.changes} 次（上限 {args.max_changes}）| 各阶段后半段稳定：{'是' if settled else '否'}"
+          f" | 负载回落后已升回：{'是' if recovered else '否'} | {'通过' if ok else '失败'}")
+    if not ok:
+        sys.exit(1)
+
+
+def _time_calls(func, runs):
+    """重复调用func，返回每次耗时（秒）"""
+    import time
+    samples = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - t)
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="外星人大战基准测试")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("startup", help="资源包 vs 散装文件 启动耗时")
+    p.add_argument("--runs", type=int, default=10)
+    p.add_argument("--rebuild", action="store_true", help="先重新生成资源包")
+    p.set_defaults(func=bench_startup)
+
+    p = sub.add_parser("importtime", help="python -X importtime 导入耗时检查")
+    p.add_argument("modules", nargs="*", default=["storage"])
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--budget-ms", type=float, default=30.0, help="单个模块导入耗时上限")
+    p.add_argument("--no-pygame", nargs="*", default=["storage"], help="不允许导入pygame的模块")
+    p.set_defaults(func=bench_importtime)
+
+    p = sub.add_parser("soak", help="场景栈浸泡测试（内存/栈深度保持平稳）")
+    p.add_argument("--rounds", type=int, default=2000)
+    p.add_argument("--frames", type=int, default=5, help="每局游戏运行的帧数")
+    p.add_argument("--warmup", type=int, default=50)
+    p.add_argument("--report-every", type=int, default=500)
+    p.add_argument("--max-growth-kb", type=int, default=512)
+    p.set_defaults(func=bench_soak)
+
+    p = sub.add_parser("collision", help="碰撞检测后端对比")
+    p.add_argument("--bullets", type=int, default=2000)
+    p.add_argument("--aliens", type=int, default=2000)
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--backends", nargs="+", default=["brute", "rect", "sweep", "grid"],
+                   help="第一个后端作为正确性基准")
+    p.add_argument("--pixel", action="store_true", help="再测一遍加逐像素窄相位的开销")
+    p.add_argument("--mask-budget", type=float, default=0.5, help="逐像素窄相位额外耗时上限（占宽相位耗时的比例）")
+    p.set_defaults(func=bench_collision)
+
+    p = sub.add_parser("hash", help="密码哈希强度/耗时")
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--iterations", type=int, help="覆盖pbkdf2迭代次数")
+    p.add_argument("--scrypt-n", type=int, help="覆盖scrypt的n（2的幂）")
+    p.set_defaults(func=bench_hash)
+
+    p = sub.add_parser("purchase", help="武器购买单事务 vs 逐字段保存")
+    p.add_argument("--players", type=int, default=50)
+    p.add_argument("--no-fsync", action="store_true", help="日志不落盘（只比较CPU/写入量）")
+    p.set_defaults(func=bench_purchase)
+
+    p = sub.add_parser("events", help="事件总线：逐条处理 vs 按帧合并，慢订阅者放到后台线程")
+    p.add_argument("--kills", type=int, default=20, help="每帧击杀次数")
+    p.add_argument("--frames", type=int, default=120)
+    p.add_argument("--slow-ms", type=float, default=2.0, help="慢订阅者每帧耗时")
+    p.add_argument("--no-fsync", action="store_true", help="日志不落盘（只比较CPU/写入量）")
+    p.set_defaults(func=bench_events)
+
+    p = sub.add_parser("migrate", help="武器库结构迁移：新库/旧版库/已是最新时的启动耗时，校验幂等且不改写")
+    p.add_argument("--runs", type=int, default=20)
+    p.set_defaults(func=bench_migrate)
+
+    p = sub.add_parser("contention", help="多进程共享玩家文件争用测试（检查无丢失更新）")
+    p.add_argument("--workers", type=int, default=8)
+    p.add_argument("--ops", type=int, default=300, help="每个进程的更新次数")
+    p.add_argument("--players", type=int, default=3, help="被争用的玩家数（越少冲突越多）")
+    p.add_argument("--compact-every", type=int, default=100, help="压缩阈值（调小以测试压缩与追加并发）")
+    p.set_defaults(func=bench_contention)
+
+    p = sub.add_parser("leaderboard", help="联网排行榜批量提交/缓存（本机服务端替身）")
+    p.add_argument("--submits", type=int, default=2000, help="提交的成绩条数")
+    p.add_argument("--players", type=int, default=300)
+    p.add_argument("--batch-size", type=int, default=32)
+    p.add_argument("--top-k", type=int, default=100)
+    p.add_argument("--seed", type=int, default=1)
+    p.set_defaults(func=bench_leaderboard)
+
+    p = sub.add_parser("history", help="对局历史批量写入/文件大小/查询耗时")
+    p.add_argument("--days", type=int, default=365)
+    p.add_argument("--runs-per-day", type=int, default=300)
+    p.add_argument("--players", type=int, default=2000)
+    p.add_argument("--batch-runs", type=int, default=20, help="每批局数（游戏中为history.BATCH_RUNS）")
+    p.add_argument("--compare-runs", type=int, default=600, help="逐局/批量对比的局数")
+    p.add_argument("--runs", type=int, default=5, help="每个查询重复次数")
+    p.add_argument("--seed", type=int, default=1)
+    p.set_defaults(func=bench_history)
+
+    p = sub.add_parser("particles", help="粒子风暴：固定容量缓冲的每帧耗时/无内存增长")
+    p.add_argument("--capacity", type=int, default=1024)
+    p.add_argument("--bursts", type=int, default=8, help="每帧爆炸处数")
+    p.add_argument("--frames", type=int, default=600)
+    p.add_argument("--warmup", type=int, default=30)
+    p.add_argument("--budget-ms", type=float, default=5.0, help="每帧更新+绘制p99耗时上限（一帧16.7 ms）")
+    p.add_argument("--max-growth-bytes", type=int, default=1024, help="计时循环内允许的内存增长")
+    p.add_argument("--seed", type=int, default=1)
+    p.set_defaults(func=bench_particles)
+
+    p = sub.add_parser("quality", help="自适应画质：各档位实测耗时 + 弱机台负载突增下的升降档")
+    p.add_argument("--level", type=int, default=40, help="实测用的关卡（星星数随关卡增加）")
+    p.add_argument("--aliens", type=int, default=200)
+    p.add_argument("--bursts", type=int, default=4, help="每帧爆炸次数")
+    p.add_argument("--frames", type=int, default=240, help="每个档位实测的帧数")
+    p.add_argument("--warmup", type=int, default=60)
+    p.add_argument("--slowdown", type=float, default=1.15, help="弱机台：最高档耗时为帧预算的倍数")
+    p.add_argument("--spike", type=float, default=1.2, help="中段负载突增倍数")
+    p.add_argument("--model", nargs="+", default=["1.0", "0.85", "0.72", "0.62"], help="各档位相对最高档的耗时")
+    p.add_argument("--seconds", type=int, default=20, help="每个阶段的时长（模拟帧，60帧/秒）")
+    p.add_argument("--max-over", type=float, default=0.05, help="稳定后允许的超预算帧比例")
+    p.add_argument("--max-changes", type=int, default=10)
+    p.add_argument("--seed", type=int, default=1)
+    p.set_defaults(func=bench_quality)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
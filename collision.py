@@ -0,0 +1,146 @@
+from collections import defaultdict
+
+# ===================== 碰撞检测（可替换后端，不依赖pygame） =====================
+# 所有后端回答同一个问题："A组与B组之间所有相交的(a, b)对"，一次调用完成
+# 实体只需有 x/y/width/height 属性（飞船/外星人/子弹均满足）
+# 返回结果按 (a在A中的顺序, b在B中的顺序) 排序，与原来的双重循环遍历顺序一致
+# 逐像素模式（PixelPerfect）：矩形宽相位筛出的候选对再比较实体的mask属性（pygame.mask.Mask，由资源层预先生成）
+
+
+def overlaps(a, b):
+    """AABB相交（与pygame.Rect.colliderect一致：仅边缘接触不算相交）"""
+    return a.x < b.x + b.width and b.x < a.x + a.width and a.y < b.y + b.height and b.y < a.y + a.height
+
+
+class Circle:
+    """圆形区域（如爆炸范围）：以外接正方形参与宽相位查询，再用covers()做精确判断"""
+    __slots__ = ('x', 'y', 'width', 'height', 'cx', 'cy', 'radius', 'source')
+
+    def __init__(self, cx, cy, radius, source=None):
+        self.cx, self.cy, self.radius = cx, cy, radius
+        self.x, self.y = cx - radius, cy - radius
+        self.width = self.height = radius * 2
+        self.source = source
+
+    def covers(self, obj):
+        """圆与矩形相交：矩形上离圆心最近的点在半径内"""
+        dx = self.cx - max(obj.x, min(self.cx, obj.x + obj.width))
+        dy = self.cy - max(obj.y, min(self.cy, obj.y + obj.height))
+        return dx * dx + dy * dy <= self.radius * self.radius
+
+
+class BruteForce:
+    """双重循环，O(|A|*|B|)；作为其他后端的正确性基准"""
+    name = 'brute'
+
+    def pairs(self, group_a, group_b):
+        return [(a, b) for a in group_a for b in group_b if overlaps(a, b)]
+
+
+class RectList:
+    """pygame.Rect.collidelistall：B组的Rect每次调用只构建一次，逐个A在C层扫描（坐标截断为整数）"""
+    name = 'rect'
+
+    def pairs(self, group_a, group_b):
+        import pygame
+        rects = [pygame.Rect(b.x, b.y, b.width, b.height) for b in group_b]
+        result = []
+        for a in group_a:
+            for idx in pygame.Rect(a.x, a.y, a.width, a.height).collidelistall(rects):
+                result.append((a, group_b[idx]))
+        return result
+
+
+class SweepAndPrune:
+    """扫掠裁剪：两组按左边界合并排序后沿x轴扫描，只对x区间重叠的活动对象检查y"""
+    name = 'sweep'
+
+    def pairs(self, group_a, group_b):
+        events = [(a.x, 0, i, a) for i, a in enumerate(group_a)]
+        events += [(b.x, 1, j, b) for j, b in enumerate(group_b)]
+        events.sort(key=lambda e: e[0])
+        active = ([], [])  # 每组当前x区间仍可能重叠的对象 [(右边界, 下标, 对象)]
+        found = []
+        for left, side, idx, obj in events:
+            other = active[1 - side]
+            # 清理右边界已在当前左边界左侧的对象（接触不算相交）
+            if other:
+                other[:] = [entry for entry in other if entry[0] > left]
+            top, bottom = obj.y, obj.y + obj.height
+            for _, other_idx, other_obj in other:
+                if other_obj.y < bottom and top < other_obj.y + other_obj.height:
+                    found.append((idx, other_idx, obj, other_obj) if side == 0 else
+                                 (other_idx, idx, other_obj, obj))
+            active[side].append((left + obj.width, idx, obj))
+        found.sort(key=lambda p: (p[0], p[1]))
+        return [(a, b) for _, _, a, b in found]
+
+
+class UniformGrid:
+    """均匀网格：B组按格子分桶，A组只检查自身覆盖格子里的候选（格子边长默认约等于外星人尺寸）"""
+    name = 'grid'
+
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+
+    def _cells(self, obj):
+        size = self.cell_size
+        x0, y0 = int(obj.x // size), int(obj.y // size)
+        x1, y1 = int((obj.x + obj.width) // size), int((obj.y + obj.height) // size)
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                yield cx, cy
+
+    def pairs(self, group_a, group_b):
+        buckets = defaultdict(list)
+        for j, b in enumerate(group_b):
+            for cell in self._cells(b):
+                buckets[cell].append(j)
+        found = []
+        for a in group_a:
+            candidates = set()
+            for cell in self._cells(a):
+                bucket = buckets.get(cell)
+                if bucket:
+                    candidates.update(bucket)
+            for j in sorted(candidates):
+                if overlaps(a, group_b[j]):
+                    found.append((a, group_b[j]))
+        return found
+
+
+class PixelPerfect:
+    """逐像素碰撞：先由宽相位后端按矩形筛出候选对，只对候选对比较遮罩（透明像素不算碰撞）"""
+
+    def __init__(self, broad_phase):
+        self.broad_phase = broad_phase
+        self.name = f'{broad_phase.name}+mask'
+
+    def pairs(self, group_a, group_b):
+        """双方都有遮罩（mask属性）时比较重叠像素，任一方没有遮罩（如爆炸范围）时按矩形结果处理"""
+        found = []
+        last = None
+        for a, b in self.broad_phase.pairs(group_a, group_b):
+            # 候选对按a的顺序排列：同一个a的遮罩和坐标只取一次
+            if a is not last:
+                last = a
+                mask_a = getattr(a, 'mask', None)
+                ax, ay = int(a.x), int(a.y)
+            mask_b = getattr(b, 'mask', None)
+            # 与绘制一致：blit按整数坐标放置图片
+            if mask_a is None or mask_b is None or mask_a.overlap(mask_b, (int(b.x) - ax, int(b.y) - ay)):
+                found.append((a, b))
+        return found
+
+
+BACKENDS = {cls.name: cls for cls in (BruteForce, RectList, SweepAndPrune, UniformGrid)}
+DEFAULT_BACKEND = 'grid'
+
+
+def get_backend(name=None, pixel_perfect=False):
+    """按名称创建后端（None用默认后端），pixel_perfect=True时外加逐像素窄相位；未知名称抛出ValueError"""
+    name = name or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"未知碰撞后端：{name}（可选：{', '.join(BACKENDS)}）")
+    backend = BACKENDS[name]()
+    return PixelPerfect(backend) if pixel_perfect else backend
\ No newline at end of file
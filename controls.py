@@ -0,0 +1,89 @@
+import csv
+from collections import deque
+
+import pygame
+
+# ===================== 输入子系统（按键 -> 命令） =====================
+# 按键事件在SceneManager中只翻译一次为命令（字符串），场景按自己的命令处理表分发，不再各写一串if/elif
+# 绑定从 alien_war_keys.txt 读取（每行：命令,按键名1|按键名2，按键名同pygame.key.name），缺省用DEFAULT_BINDINGS
+# 无头运行/回放可直接inject()/hold()命令，不需要构造pygame事件
+KEY_FILE = "alien_war_keys.txt"
+
+DEFAULT_BINDINGS = {
+    # 菜单/通用
+    'up': ['up'],
+    'down': ['down'],
+    'confirm': ['return', 'enter'],
+    'back': ['escape'],
+    'page_up': ['page up'],
+    'page_down': ['page down'],
+    # 游戏中
+    'fire': ['space'],
+    'prev_weapon': ['q'],
+    'next_weapon': ['e'],
+    'restart': ['r'],
+    'move_left': ['left'],
+    'move_right': ['right'],
+}
+HELD_COMMANDS = ('move_left', 'move_right')  # 按住期间每个模拟步都生效，不进入命令队列
+
+
+def load_bindings(path=KEY_FILE):
+    """读取按键配置，返回 {命令: [按键名]}；文件中出现的命令覆盖默认绑定"""
+    bindings = {command: list(keys) for command, keys in DEFAULT_BINDINGS.items()}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line_no, row in enumerate(csv.DictReader(f), 2):
+                command, keys = (row.get("command") or "").strip(), row.get("keys") or ""
+                if command not in DEFAULT_BINDINGS:
+                    print(f"按键配置第{line_no}行：未知命令 {command!r}")
+                    continue
+                bindings[command] = [key.strip() for key in keys.split("|") if key.strip()]
+    except FileNotFoundError:
+        pass
+    return bindings
+
+
+class InputMapper:
+    """按键 -> 命令的分发表，外加注入队列（无头/回放）和按住状态"""
+
+    def __init__(self, bindings=None):
+        self.bindings = bindings if bindings is not None else load_bindings()
+        self.keymap = {}  # 键码 -> 命令（按下时触发一次）
+        self.held_keys = {}  # 命令 -> [键码]（按住期间持续生效）
+        for command, names in self.bindings.items():
+            for name in names:
+                try:
+                    key = pygame.key.key_code(name)
+                except ValueError:
+                    print(f"按键配置：未知按键名 {name!r}（命令 {command}）")
+                    continue
+                if command in HELD_COMMANDS:
+                    self.held_keys.setdefault(command, []).append(key)
+                else:
+                    self.keymap.setdefault(key, command)
+        self.injected = deque()
+        self.injected_held = set()
+
+    def translate(self, event):
+        """键盘事件 -> 命令，未绑定的按键/其他事件返回None"""
+        if event.type != pygame.KEYDOWN:
+            return None
+        return self.keymap.get(event.key)
+
+    def inject(self, command):
+        """注入一条命令（下一帧与键盘命令一样分发给栈顶场景）"""
+        self.injected.append(command)
+
+    def hold(self, command, pressed=True):
+        """注入按住/松开状态（如无头运行中让飞船持续左移）"""
+        if pressed:
+            self.injected_held.add(command)
+        else:
+            self.injected_held.discard(command)
+
+    def held(self):
+        """当前按住的持续命令集合"""
+        pressed = pygame.key.get_pressed()
+        held = {command for command, keys in self.held_keys.items() if any(pressed[key] for key in keys)}
+        return frozenset(held | self.injected_held)
\ No newline at end of file
@@ -0,0 +1,115 @@
+import os
+import hmac
+import time
+import hashlib
+import threading
+
+# ===================== 密码哈希 + 登录会话缓存（不依赖pygame） =====================
+# 存储格式（不含逗号，可直接写入玩家文件的密码列）：
+#   pbkdf2_sha256$迭代次数$盐$哈希
+#   scrypt$n$r$p$盐$哈希
+# 旧数据中的明文密码在第一次登录成功后自动升级为哈希
+
+# 哈希算法与强度（调大更安全但登录更慢；可用 python bench.py hash 测量耗时）
+HASH_ALGORITHM = os.environ.get("ALIEN_WAR_HASH", "pbkdf2_sha256")
+PBKDF2_ITERATIONS = 200_000
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2 ** 14, 8, 1
+SALT_BYTES = 16
+SESSION_TTL = 600  # 登录成功后免验证的时长（秒）
+
+
+def hash_password(password, algorithm=None):
+    """生成带随机盐的密码哈希字符串"""
+    algorithm = algorithm or HASH_ALGORITHM
+    salt = os.urandom(SALT_BYTES)
+    if algorithm == "pbkdf2_sha256":
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, PBKDF2_ITERATIONS)
+        return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${salt.hex()}${digest.hex()}"
+    if algorithm == "scrypt":
+        digest = hashlib.scrypt(password.encode("utf-8"), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P)
+        return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${digest.hex()}"
+    raise ValueError(f"未知哈希算法：{algorithm}")
+
+
+def is_hashed(stored):
+    return stored.startswith(("pbkdf2_sha256$", "scrypt$"))
+
+
+def verify_password(password, stored):
+    """校验密码，返回 (是否正确, 是否需要重新哈希)
+    明文记录、算法不同或强度低于当前配置时需要升级"""
+    if not is_hashed(stored):
+        ok = hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+        return ok, ok
+    try:
+        algorithm, *params, salt, expected = stored.split("$")
+        salt, expected = bytes.fromhex(salt), bytes.fromhex(expected)
+        if algorithm == "pbkdf2_sha256":
+            iterations = int(params[0])
+            digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+            outdated = iterations < PBKDF2_ITERATIONS
+        else:
+            n, r, p = (int(v) for v in params)
+            digest = hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p, dklen=len(expected))
+            outdated = n < SCRYPT_N
+    except (ValueError, IndexError):
+        return False, False
+    ok = hmac.compare_digest(digest, expected)
+    return ok, ok and (outdated or algorithm != HASH_ALGORITHM)
+
+
+# ===================== 会话缓存 =====================
+class SessionCache:
+    """登录成功后在进程内短时间记住凭据摘要（HMAC+进程随机密钥，不保存明文），
+    有效期内重复登录（例如退出到登录界面再进入主菜单）不再执行慢哈希"""
+
+    def __init__(self, ttl=SESSION_TTL):
+        self.ttl = ttl
+        self._key = os.urandom(32)
+        self._entries = {}  # 用户名 -> (摘要, 过期时间)
+        self._lock = threading.Lock()
+
+    def _digest(self, username, password):
+        return hmac.new(self._key, f"{username}\0{password}".encode("utf-8"), hashlib.sha256).digest()
+
+    def remember(self, username, password):
+        with self._lock:
+            self._entries[username] = (self._digest(username, password), time.monotonic() + self.ttl)
+
+    def check(self, username, password):
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                return False
+            if time.monotonic() >= entry[1]:
+                del self._entries[username]
+                return False
+        return hmac.compare_digest(entry[0], self._digest(username, password))
+
+    def forget(self, username=None):
+        """username为None时清空全部（重置数据时调用）"""
+        with self._lock:
+            if username is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(username, None)
+
+
+SESSIONS = SessionCache()
+
+
+# ===================== 验证线程 =====================
+# hashlib的pbkdf2/scrypt计算时释放GIL，放到单独线程后登录界面可以继续刷新动画
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def run_in_background(func, *args, **kwargs):
+    """在验证线程上执行func，返回Future"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # 首次登录时才导入（concurrent.futures会拉起logging，放在模块顶部会拖慢storage的导入）
+            from concurrent.futures import ThreadPoolExecutor
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="alien_war_auth")
+    return _executor.submit(func, *args, **kwargs)
\ No newline at end of file
@@ -0,0 +1,62 @@
+from collections import namedtuple
+
+from storage import AsyncWriter
+
+# ===================== 游戏事件总线（按帧批量分发） =====================
+# 模拟步只发布事件（追加到本帧列表），不直接播放音效、写存档或刷新界面；
+# 每帧结束时dispatch()一次，每个订阅者只被调用一次，拿到本帧中它关心的全部事件。
+# 耗时的订阅者用BackgroundSubscriber包一层即可放到后台线程，发布方代码不变
+
+AlienHit = namedtuple('AlienHit', ['x', 'y', 'splash'])  # 子弹直接命中（splash：是否带范围爆炸）
+AlienKilled = namedtuple('AlienKilled', ['x', 'y', 'score', 'points'])
+ShipHit = namedtuple('ShipHit', ['x', 'y', 'lives'])  # lives：受伤后剩余生命
+LevelUp = namedtuple('LevelUp', ['level'])
+WeaponSwitched = namedtuple('WeaponSwitched', ['weapon'])
+
+
+class EventBus:
+    """进程内事件总线：publish()只追加，dispatch()按订阅顺序把本帧事件整批交给各订阅者"""
+
+    def __init__(self):
+        self.pending = []
+        self._subscribers = []
+        self.dispatched = 0  # 累计分发的事件数
+
+    def subscribe(self, handler, *event_types):
+        """handler(events)：每次分发最多调用一次，传入属于event_types的事件（按发布顺序；不指定类型则接收全部）"""
+        self._subscribers.append((handler, event_types))
+        return handler
+
+    def unsubscribe(self, handler):
+        self._subscribers = [(h, types) for h, types in self._subscribers if h != handler]
+
+    def publish(self, event):
+        self.pending.append(event)
+
+    def dispatch(self):
+        """分发并清空本帧事件，返回事件数；订阅者处理期间发布的事件留到下一次分发"""
+        events = self.pending
+        if not events:
+            return 0
+        self.pending = []
+        for handler, event_types in self._subscribers:
+            batch = [event for event in events if isinstance(event, event_types)] if event_types else events
+            if batch:
+                handler(batch)
+        self.dispatched += len(events)
+        return len(events)
+
+
+class BackgroundSubscriber:
+    """把订阅者放到独立的后台线程：分发时只入队，handler在线程中按帧顺序执行（异常只打印，不影响游戏）"""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self._writer = AsyncWriter()
+
+    def __call__(self, events):
+        self._writer.submit(self.handler, events)
+
+    def flush(self):
+        """等待已入队的事件全部处理完"""
+        self._writer.flush()
\ No newline at end of file
@@ -0,0 +1,324 @@
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+
+import storage
+
+# ===================== 对局历史（每局一条，只追加，不依赖pygame） =====================
+# 每局结束（生命耗尽/中途退出/关闭窗口）记录：得分、时长、击杀数、使用的武器、结束原因
+# 记录先放在内存缓冲中，攒够BATCH_RUNS局或最早一局已等待FLUSH_INTERVAL秒时用一个事务批量写入
+# 全部字段存为小整数（SQLite按值大小变长存储）：玩家名换成players表的ID，日期存为天数，
+# 时刻存为当天第几秒，武器存为武器库ID，结束原因存为编号 —— 一年的机台流水也只有几MB
+HISTORY_FILE = os.path.join(storage.DESKTOP_PATH, "alien_war_history.db")
+BATCH_RUNS = 20
+FLUSH_INTERVAL = 60.0
+EPOCH = date(2020, 1, 1)  # 天数的起点
+CAUSES = ('died', 'quit', 'closed')  # 结束原因编号 = 下标：被撞毁 / 暂停菜单退出 / 关闭窗口
+CAUSE_NAMES = {'died': '被撞毁', 'quit': '中途退出', 'closed': '关闭窗口'}
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS players (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS runs (player INTEGER NOT NULL, day INTEGER NOT NULL, second INTEGER NOT NULL, '
+    'duration INTEGER NOT NULL, level INTEGER NOT NULL, score INTEGER NOT NULL, kills INTEGER NOT NULL, '
+    'weapon INTEGER NOT NULL, cause INTEGER NOT NULL)',
+    # 单个玩家的历史 / 每日活跃玩家（覆盖索引，不回表）/ 各关卡得分分布（覆盖索引）
+    'CREATE INDEX IF NOT EXISTS runs_player ON runs (player, day, second)',
+    'CREATE INDEX IF NOT EXISTS runs_day ON runs (day, player)',
+    'CREATE INDEX IF NOT EXISTS runs_level ON runs (level, score)',
+]
+
+# ===================== 汇总表（随对局写入增量维护，报表只读汇总表） =====================
+# 与对局写入在同一个事务中更新，不会出现对局已写入而汇总未更新的情况；
+# 旧库（没有汇总表）第一次打开时按对局顺序流式回填一遍
+ROLLUP_VERSION = 1  # PRAGMA user_version：汇总表结构版本
+ROLLUP_CHUNK = 5000  # 回填时每次读取的对局数
+ROLLUP_SCHEMA = [
+    # 每日：局数/人数/得分/时长/击杀合计；人数靠 rollup_daily_players 去重
+    'CREATE TABLE IF NOT EXISTS rollup_daily (day INTEGER PRIMARY KEY, runs INTEGER NOT NULL, '
+    'players INTEGER NOT NULL, score_sum INTEGER NOT NULL, duration_sum INTEGER NOT NULL, kills_sum INTEGER NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS rollup_daily_players (day INTEGER NOT NULL, player INTEGER NOT NULL, '
+    'PRIMARY KEY (day, player)) WITHOUT ROWID',
+    # 每关：局数/得分合计与最高/击杀/时长/被撞毁次数（按结束时所在关卡）
+    'CREATE TABLE IF NOT EXISTS rollup_level (level INTEGER PRIMARY KEY, runs INTEGER NOT NULL, '
+    'score_sum INTEGER NOT NULL, score_max INTEGER NOT NULL, kills_sum INTEGER NOT NULL, '
+    'duration_sum INTEGER NOT NULL, deaths INTEGER NOT NULL)',
+    # 每日每种武器的使用局数（结束时装备的武器）
+    'CREATE TABLE IF NOT EXISTS rollup_weapon (day INTEGER NOT NULL, weapon INTEGER NOT NULL, '
+    'runs INTEGER NOT NULL, PRIMARY KEY (day, weapon)) WITHOUT ROWID',
+    # 每个玩家最近一局结束时的关卡，以及停在各关卡的玩家数（流失点）
+    'CREATE TABLE IF NOT EXISTS rollup_player (player INTEGER PRIMARY KEY, day INTEGER NOT NULL, '
+    'second INTEGER NOT NULL, level INTEGER NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS rollup_churn (level INTEGER PRIMARY KEY, players INTEGER NOT NULL)',
+]
+ROLLUP_TABLES = ('rollup_daily', 'rollup_daily_players', 'rollup_level', 'rollup_weapon', 'rollup_player',
+                 'rollup_churn')
+
+
+def apply_rollups(conn, rows):
+    """把一批对局（runs表的行）累加到汇总表，调用方负责事务"""
+    daily, day_players, levels, weapons, latest = {}, {}, {}, {}, {}
+    for player, day, second, duration, level, score, kills, weapon, cause in rows:
+        day_players.setdefault(day, set()).add(player)
+        d = daily.setdefault(day, [0, 0, 0, 0])
+        d[0] += 1
+        d[1] += score
+        d[2] += duration
+        d[3] += kills
+        lv = levels.setdefault(level, [0, 0, 0, 0, 0, 0])
+        lv[0] += 1
+        lv[1] += score
+        lv[2] = max(lv[2], score)
+        lv[3] += kills
+        lv[4] += duration
+        lv[5] += cause == 0
+        weapons[day, weapon] = weapons.get((day, weapon), 0) + 1
+        if player not in latest or (day, second) >= latest[player][:2]:
+            latest[player] = (day, second, level)
+
+    for day, (runs, score_sum, duration_sum, kills_sum) in daily.items():
+        new_players = 0
+        for player in day_players[day]:
+            new_players += conn.execute('INSERT OR IGNORE INTO rollup_daily_players VALUES (?,?)',
+                                        (day, player)).rowcount
+        conn.execute('INSERT INTO rollup_daily VALUES (?,?,?,?,?,?) ON CONFLICT(day) DO UPDATE SET '
+                     'runs=runs+excluded.runs, players=players+excluded.players, '
+                     'score_sum=score_sum+excluded.score_sum, duration_sum=duration_sum+excluded.duration_sum, '
+                     'kills_sum=kills_sum+excluded.kills_sum',
+                     (day, runs, new_players, score_sum, duration_sum, kills_sum))
+    conn.executemany('INSERT INTO rollup_level VALUES (?,?,?,?,?,?,?) ON CONFLICT(level) DO UPDATE SET '
+                     'runs=runs+excluded.runs, score_sum=score_sum+excluded.score_sum, '
+                     'score_max=max(score_max, excluded.score_max), kills_sum=kills_sum+excluded.kills_sum, '
+                     'duration_sum=duration_sum+excluded.duration_sum, deaths=deaths+excluded.deaths',
+                     [(level,) + tuple(values) for level, values in levels.items()])
+    conn.executemany('INSERT INTO rollup_weapon VALUES (?,?,?) ON CONFLICT(day, weapon) DO UPDATE SET '
+                     'runs=runs+excluded.runs', [key + (runs,) for key, runs in weapons.items()])
+
+    churn = {}
+    for player, (day, second, level) in latest.items():
+        old = conn.execute('SELECT day, second, level FROM rollup_player WHERE player=?', (player,)).fetchone()
+        if old is not None and (day, second) < old[:2]:
+            continue  # 补录的旧对局不改变玩家最近停留的关卡
+        conn.execute('INSERT OR REPLACE INTO rollup_player VALUES (?,?,?,?)', (player, day, second, level))
+        if old is not None:
+            churn[old[2]] = churn.get(old[2], 0) - 1
+        churn[level] = churn.get(level, 0) + 1
+    conn.executemany('INSERT INTO rollup_churn VALUES (?,?) ON CONFLICT(level) DO UPDATE SET '
+                     'players=players+excluded.players', [item for item in churn.items() if item[1]])
+    conn.execute('DELETE FROM rollup_churn WHERE players=0')
+
+
+def day_number(when):
+    """日期/时间 -> 天数"""
+    if isinstance(when, datetime):
+        when = when.date()
+    return (when - EPOCH).days
+
+
+def day_date(number):
+    return EPOCH + timedelta(days=number)
+
+
+class RunHistory:
+    """对局历史库：record()只进内存缓冲，flush()一次事务写入；查询前先把缓冲写入"""
+
+    def __init__(self, path=None, batch_runs=BATCH_RUNS, flush_interval=FLUSH_INTERVAL):
+        self.path = path or HISTORY_FILE
+        self.batch_runs = batch_runs
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._lock = threading.Lock()  # 保护缓冲
+        self._write_lock = threading.Lock()  # 同一进程内的写事务串行
+        self._timer = None
+        self._player_ids = {}  # 玩家名 -> ID（进程内缓存）
+        self._schema_ready = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=storage.DB_BUSY_TIMEOUT)
+        if not self._schema_ready:
+            with conn:
+                conn.execute('PRAGMA journal_mode=WAL')  # 追加时不阻塞读（报表查询）
+                for statement in SCHEMA + ROLLUP_SCHEMA:
+                    conn.execute(statement)
+            if conn.execute('PRAGMA user_version').fetchone()[0] < ROLLUP_VERSION:
+                self._rebuild_rollups(conn)
+            self._schema_ready = True
+        return conn
+
+    def _rebuild_rollups(self, conn):
+        """清空汇总表后按对局顺序流式回填（一次遍历，每次只读ROLLUP_CHUNK局），同一个事务内完成"""
+        with conn:
+            for table in ROLLUP_TABLES:
+                conn.execute(f'DELETE FROM {table}')
+            cursor = conn.execute('SELECT * FROM runs ORDER BY rowid')
+            count = 0
+            while rows := cursor.fetchmany(ROLLUP_CHUNK):
+                apply_rollups(conn, rows)
+                count += len(rows)
+            conn.execute(f'PRAGMA user_version={ROLLUP_VERSION}')
+        return count
+
+    def rebuild_rollups(self):
+        """从对局历史重新生成全部汇总表，返回回填的局数"""
+        self.flush()
+        conn = self._connect()
+        try:
+            return self._rebuild_rollups(conn)
+        finally:
+            conn.close()
+
+    # ---------------------- 写入 ----------------------
+    def record(self, username, score, duration, level, kills, weapon, cause, when=None):
+        """记录一局（duration为秒，weapon为武器名，cause见CAUSES）；只进缓冲，不做磁盘IO"""
+        when = when or datetime.now()
+        run = (username, day_number(when), when.hour * 3600 + when.minute * 60 + when.second,
+               round(duration), level, score, kills, storage.get_weapon_ids().get(weapon, 0), CAUSES.index(cause))
+        with self._lock:
+            self._buffer.append(run)
+            if len(self._buffer) >= self.batch_runs:
+                due = True
+            else:
+                due = False
+                if self._timer is None and self.flush_interval is not None:
+                    # 不足一批：最多等flush_interval秒就写入（定时器线程执行）
+                    self._timer = threading.Timer(self.flush_interval, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+        if due:
+            storage.submit_write(self.flush)
+
+    def flush(self):
+        """把缓冲中的对局一次性写入（一个事务），返回写入的局数"""
+        with self._write_lock:
+            with self._lock:
+                runs, self._buffer = self._buffer, []
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not runs:
+                return 0
+            try:
+                conn = self._connect()
+                try:
+                    with conn:
+                        rows = [(self._player_id(conn, run[0]),) + run[1:] for run in runs]
+                        conn.executemany('INSERT INTO runs VALUES (?,?,?,?,?,?,?,?,?)', rows)
+                        apply_rollups(conn, rows)
+                finally:
+                    conn.close()
+            except BaseException:
+                self._player_ids.clear()  # 事务已回滚，本次新分配的玩家ID作废
+                with self._lock:  # 写入失败放回缓冲，下次再试
+                    self._buffer[:0] = runs
+                raise
+            return len(runs)
+
+    def _player_id(self, conn, username):
+        player_id = self._player_ids.get(username)
+        if player_id is None:
+            conn.execute('INSERT OR IGNORE INTO players (name) VALUES (?)', (username,))
+            player_id = conn.execute('SELECT id FROM players WHERE name=?', (username,)).fetchone()[0]
+            self._player_ids[username] = player_id
+        return player_id
+
+    def _query(self, sql, params=()):
+        self.flush()
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    # ---------------------- 查询 ----------------------
+    def user_history(self, username, limit=20):
+        """玩家最近的对局（新的在前），每局一个字典"""
+        weapon_names = {weapon_id: name for name, weapon_id in storage.get_weapon_ids().items()}
+        rows = self._query('SELECT day, second, duration, level, score, kills, weapon, cause FROM runs '
+                           'WHERE player=(SELECT id FROM players WHERE name=?) '
+                           'ORDER BY day DESC, second DESC LIMIT ?', (username, limit))
+        return [{
+            "time": datetime.combine(day_date(day), datetime.min.time()) + timedelta(seconds=second),
+            "duration": duration,
+            "level": level,
+            "score": score,
+            "kills": kills,
+            "weapon": weapon_names.get(weapon, "未知武器"),
+            "cause": CAUSES[cause],
+        } for day, second, duration, level, score, kills, weapon, cause in rows]
+
+    def daily_active_players(self, first=None, last=None):
+        """每天玩过至少一局的玩家数 [(日期, 人数)]，first/last为日期（含），默认全部"""
+        return [(day, players) for day, _, players, _ in self.daily_report(first, last)]
+
+    def score_distribution(self, level=None, bucket=100):
+        """各关卡的得分分布 {关卡: [(分段起点, 局数)]}，level指定时只统计该关卡"""
+        if level is None:
+            rows = self._query('SELECT level, score / ? AS b, COUNT(*) FROM runs '
+                               'GROUP BY level, b ORDER BY level, b', (bucket,))
+        else:
+            rows = self._query('SELECT level, score / ? AS b, COUNT(*) FROM runs WHERE level=? '
+                               'GROUP BY b ORDER BY b', (bucket, level))
+        distribution = {}
+        for run_level, b, count in rows:
+            distribution.setdefault(run_level, []).append((b * bucket, count))
+        return distribution
+
+    def run_count(self):
+        return self._query('SELECT COUNT(*) FROM runs')[0][0]
+
+    # ---------------------- 报表（只读汇总表，与对局总数无关） ----------------------
+    def daily_report(self, first=None, last=None):
+        """每日概况 [(日期, 局数, 玩家数, 平均得分)]"""
+        first = day_number(first) if first else 0
+        last = day_number(last) if last else 1 << 31
+        rows = self._query('SELECT day, runs, players, score_sum FROM rollup_daily WHERE day BETWEEN ? AND ? '
+                           'ORDER BY day', (first, last))
+        return [(day_date(day), runs, players, score_sum / runs) for day, runs, players, score_sum in rows]
+
+    def level_report(self):
+        """各关卡 [(关卡, 局数, 平均得分, 最高分, 平均击杀, 平均时长, 被撞毁比例)]（按结束时所在关卡）"""
+        rows = self._query('SELECT level, runs, score_sum, score_max, kills_sum, duration_sum, deaths '
+                           'FROM rollup_level ORDER BY level')
+        return [(level, runs, score_sum / runs, score_max, kills_sum / runs, duration_sum / runs, deaths / runs)
+                for level, runs, score_sum, score_max, kills_sum, duration_sum, deaths in rows]
+
+    def weapon_report(self, first=None, last=None):
+        """武器使用率 [(武器名, 局数, 占比)]，按局数降序；first/last为日期（含）"""
+        weapon_names = {weapon_id: name for name, weapon_id in storage.get_weapon_ids().items()}
+        first = day_number(first) if first else 0
+        last = day_number(last) if last else 1 << 31
+        rows = self._query('SELECT weapon, SUM(runs) FROM rollup_weapon WHERE day BETWEEN ? AND ? '
+                           'GROUP BY weapon ORDER BY SUM(runs) DESC', (first, last))
+        total = sum(runs for _, runs in rows)
+        return [(weapon_names.get(weapon, "未知武器"), runs, runs / total) for weapon, runs in rows]
+
+    def churn_report(self):
+        """流失点 [(关卡, 停在该关的玩家数, 到达该关的玩家数, 停留比例)]：按每个玩家最近一局结束时的关卡"""
+        rows = self._query('SELECT level, players FROM rollup_churn ORDER BY level')
+        reached = sum(players for _, players in rows)
+        report = []
+        for level, players in rows:
+            report.append((level, players, reached, players / reached))
+            reached -= players
+        return report
+
+
+_history = None
+
+
+def get_history():
+    """进程内共享的对局历史库（首次使用时创建）"""
+    global _history
+    if _history is None:
+        _history = RunHistory()
+    return _history
+
+
+def record_run(username, score, duration, level, kills, weapon, cause):
+    get_history().record(username, score, duration, level, kills, weapon, cause)
+
+
+def flush_runs():
+    """退出前把缓冲中的对局写入"""
+    if _history is not None:
+        _history.flush()
\ No newline at end of file
@@ -0,0 +1,393 @@
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+
+# ===================== 联网排行榜（可选，asyncio，不依赖pygame） =====================
+# 协议：TCP长连接，每行一个JSON请求，每行一个JSON响应（按请求顺序）
+#   {"op": "submit", "scores": [{"username", "best_score", "points", "last_level"}, ...]} -> {"ok": true, "accepted": n, "rejected": m}
+#     （校验失败的条目单独丢弃并计入rejected，不影响同一批的其他成绩）
+#   请求无法处理时返回 {"ok": false, "error": ...}：属于永久错误，客户端丢弃该请求而不是重发
+#   {"op": "top", "offset": 0, "limit": 100} -> {"ok": true, "total": N, "entries": [...]}
+# 服务端：python leaderboard.py --host 0.0.0.0 --port 8765 --data leaderboard.json
+# 游戏端：python alien_war.py --leaderboard 主机:端口（或环境变量 ALIEN_WAR_LEADERBOARD），
+#   成绩在后台线程合并批量提交，排行榜界面只读本地缓存（过期后在后台刷新），网络慢/断开不会卡住主循环
+DEFAULT_PORT = 8765
+TOP_K = 100  # 客户端缓存的排行榜条数
+BATCH_SIZE = 32  # 攒够这么多条成绩立即提交
+FLUSH_INTERVAL = 1.0  # 不足一批时最多等待的秒数
+CACHE_TTL = 5.0  # 排行榜缓存有效期（秒）
+REQUEST_TIMEOUT = 3.0
+RECONNECT_BACKOFF = (0.5, 30.0)  # 断线重连的初始/最大等待（秒）
+MAX_LINE = 1 << 20  # 单条请求上限（字节）
+
+
+def _encode(message):
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def _clean_entry(entry):
+    """校验并规整一条成绩，非法时抛ValueError"""
+    username = entry["username"]
+    if not isinstance(username, str) or not username:
+        raise ValueError("用户名无效")
+    return {"username": username, "best_score": int(entry.get("best_score", 0)),
+            "points": int(entry.get("points", 0)), "last_level": int(entry.get("last_level", 1))}
+
+
+class RequestRejected(ValueError):
+    """服务器明确拒绝了请求（ok为false）：原样重发也不会成功"""
+
+
+# ===================== 服务端 =====================
+class LeaderboardServer:
+    """排行榜服务：内存中按用户名保存最好成绩，排序结果缓存到下一次提交；可选定期落盘到JSON文件"""
+
+    def __init__(self, data_path=None, save_interval=5.0):
+        self.data_path = data_path
+        self.save_interval = save_interval
+        self.entries = {}  # 用户名 -> 成绩字典
+        self._sorted = None
+        self._dirty = False
+        self._server = None
+        self._saver = None
+        self._writers = set()
+        self.requests = 0  # 已处理的请求数（bench统计往返次数）
+        if data_path and os.path.exists(data_path):
+            with open(data_path, "r", encoding="utf-8") as f:
+                for entry in json.load(f):
+                    self.merge(_clean_entry(entry))
+            self._dirty = False
+
+    def merge(self, entry):
+        """合并一条成绩：最佳分数/最高关卡取较大值，积分以最新为准"""
+        old = self.entries.get(entry["username"])
+        if old is not None:
+            entry["best_score"] = max(entry["best_score"], old["best_score"])
+            entry["last_level"] = max(entry["last_level"], old["last_level"])
+            if entry == old:
+                return
+        self.entries[entry["username"]] = entry
+        self._sorted = None
+        self._dirty = True
+
+    def ranking(self):
+        if self._sorted is None:
+            self._sorted = sorted(self.entries.values(), key=lambda e: (-e["best_score"], e["username"]))
+        return self._sorted
+
+    def handle(self, request):
+        """处理一条请求，返回响应字典"""
+        self.requests += 1
+        op = request.get("op")
+        if op == "submit":
+            accepted = rejected = 0
+            for entry in request.get("scores", ()):
+                try:
+                    entry = _clean_entry(entry)
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    rejected += 1
+                    continue
+                self.merge(entry)
+                accepted += 1
+            return {"ok": True, "accepted": accepted, "rejected": rejected}
+        if op == "top":
+            ranking = self.ranking()
+            offset = max(0, int(request.get("offset", 0)))
+            limit = max(0, min(int(request.get("limit", TOP_K)), 1000))
+            return {"ok": True, "total": len(ranking), "entries": ranking[offset:offset + limit]}
+        return {"ok": False, "error": f"未知请求：{op}"}
+
+    async def _serve_client(self, reader, writer):
+        self._writers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = self.handle(json.loads(line))
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    response = {"ok": False, "error": f"请求格式错误：{e}"}
+                writer.write(_encode(response))
+                await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _save_loop(self):
+        while True:
+            await asyncio.sleep(self.save_interval)
+            self.save()
+
+    def save(self):
+        """有改动时原子写入数据文件"""
+        if not self.data_path or not self._dirty:
+            return
+        tmp_path = self.data_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.ranking(), f, ensure_ascii=False)
+        os.replace(tmp_path, self.data_path)
+        self._dirty = False
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        """开始监听，返回实际端口（port=0时由系统分配）"""
+        self._server = await asyncio.start_server(self._serve_client, host, port, limit=MAX_LINE)
+        if self.data_path:
+            self._saver = asyncio.ensure_future(self._save_loop())
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._saver is not None:
+            self._saver.cancel()
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._writers):  # wait_closed会等所有连接断开，先关掉客户端的长连接
+                writer.close()
+            await self._server.wait_closed()
+        self.save()
+
+
+class ServerThread:
+    """在后台线程的事件循环中运行LeaderboardServer（测试/基准测试用的本机替身）"""
+
+    def __init__(self, server=None, host="127.0.0.1", port=0):
+        self.server = server or LeaderboardServer()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="leaderboard_server", daemon=True)
+        self.thread.start()
+        self.host = host
+        self.port = asyncio.run_coroutine_threadsafe(self.server.start(host, port), self.loop).result()
+
+    @property
+    def address(self):
+        return f"{self.host}:{self.port}"
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.server.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+# ===================== 客户端 =====================
+def parse_address(address):
+    """'主机:端口' 或 '主机' -> (主机, 端口)"""
+    host, _, port = address.rpartition(":")
+    if not host:
+        return port, DEFAULT_PORT
+    return host, int(port)
+
+
+class LeaderboardClient:
+    """游戏端排行榜客户端：后台线程跑事件循环，维持一条长连接
+    submit() 只把成绩放进待发表（同一玩家合并为一条），攒够一批或到时间后一次提交；
+    top() 立即返回缓存的前TOP_K名（可能为None=还没拉取到），缓存过期时在后台刷新"""
+
+    def __init__(self, address, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 cache_ttl=CACHE_TTL, top_k=TOP_K):
+        self.host, self.port = parse_address(address)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.cache_ttl = cache_ttl
+        self.top_k = top_k
+        self.online = False
+        self.last_error = ""
+        self.requests = 0  # 已发出的请求数
+        self.rejected = 0  # 被服务器拒绝而丢弃的成绩条数
+        self._pending = {}  # 用户名 -> 待提交成绩
+        self._in_flight = 0  # 已取出但还没得到确认的成绩条数
+        self._lock = threading.Lock()
+        self._cache = None  # (拉取时间, 总人数, 条目列表)
+        self._refresh_wanted = True
+        self._connection = None
+        self._closed = False
+        self._loop = asyncio.new_event_loop()
+        self._wake = None
+        self._task = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="leaderboard_client", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        self._notify()  # 立即连接并拉取一次排行榜
+
+    # ---------------------- 主线程接口（不阻塞） ----------------------
+    def submit(self, username, best_score, points=0, last_level=1):
+        entry = {"username": username, "best_score": best_score, "points": points, "last_level": last_level}
+        with self._lock:
+            old = self._pending.get(username)
+            if old is not None:
+                entry["best_score"] = max(best_score, old["best_score"])
+                entry["last_level"] = max(last_level, old["last_level"])
+            self._pending[username] = entry
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._notify()
+
+    def top(self):
+        """缓存的排行榜 (总人数, 条目列表)；从未拉取成功时返回None。过期时顺带请求后台刷新"""
+        cache = self._cache
+        if cache is None or time.monotonic() - cache[0] >= self.cache_ttl:
+            self.invalidate(wait=False)
+        return None if cache is None else cache[1:]
+
+    def invalidate(self, wait=False):
+        """要求后台尽快重新拉取排行榜；wait=True时等待拉取完成（测试用）"""
+        if not self._refresh_wanted:
+            self._refresh_wanted = True
+            self._notify()
+        if wait:
+            self._wait_until(lambda: not self._refresh_wanted)
+
+    def flush(self, timeout=REQUEST_TIMEOUT):
+        """等待待提交成绩发送完毕（退出游戏时调用），超时返回False"""
+        self._notify()
+        return self._wait_until(lambda: not self._pending and not self._in_flight, timeout)
+
+    def close(self, timeout=REQUEST_TIMEOUT):
+        """尽量送出待提交成绩（最多等timeout秒）后停止后台线程"""
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._closed = True
+        if self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._task.cancel)
+            self._thread.join(REQUEST_TIMEOUT)
+
+    def _notify(self):
+        if not self._closed:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def _wait_until(self, condition, timeout=REQUEST_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() >= deadline or not self._thread.is_alive():
+                return False
+            time.sleep(0.001)
+        return True
+
+    # ---------------------- 后台线程 ----------------------
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._wake = asyncio.Event()
+        self._task = self._loop.create_task(self._main())
+        self._ready.set()
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._disconnect()
+            self._loop.run_until_complete(asyncio.sleep(0))  # 让连接的关闭回调执行完
+            self._loop.close()
+
+    async def _main(self):
+        delay = RECONNECT_BACKOFF[0]
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self._send_pending()
+                if self._refresh_wanted:
+                    await self._fetch_top()
+                delay = RECONNECT_BACKOFF[0]
+            except (OSError, asyncio.TimeoutError, ValueError) as e:
+                self._disconnect(e)
+                # 断线：退避后重连（期间成绩留在待发表里，排行榜继续显示旧缓存）
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+                delay = min(delay * 2, RECONNECT_BACKOFF[1])
+
+    async def _send_pending(self):
+        with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            self._in_flight = len(batch)
+        try:
+            response = await self._request({"op": "submit", "scores": list(batch.values())})
+        except RequestRejected as e:
+            # 服务器校验失败是永久错误：放回待发表只会无限重试并堵住之后的所有成绩，记录后丢弃这一批
+            self.rejected += len(batch)
+            print(f"排行榜服务器拒绝了{len(batch)}条成绩（已丢弃）：{e}")
+            return
+        except BaseException:
+            with self._lock:  # 发送失败放回待发表（期间的新成绩优先）
+                for username, entry in batch.items():
+                    newer = self._pending.get(username)
+                    if newer is not None:
+                        newer["best_score"] = max(newer["best_score"], entry["best_score"])
+                        newer["last_level"] = max(newer["last_level"], entry["last_level"])
+                    else:
+                        self._pending[username] = entry
+            raise
+        finally:
+            self._in_flight = 0
+        if response.get("rejected"):
+            self.rejected += response["rejected"]
+            print(f"排行榜服务器拒绝了{response['rejected']}条无效成绩（已丢弃）")
+        self._refresh_wanted = True  # 提交后排名可能变化
+
+    async def _fetch_top(self):
+        response = await self._request({"op": "top", "offset": 0, "limit": self.top_k})
+        self._cache = (time.monotonic(), response["total"], response["entries"])
+        self._refresh_wanted = False
+
+    async def _request(self, message):
+        if self._connection is None:
+            self._connection = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port, limit=MAX_LINE), REQUEST_TIMEOUT)
+        reader, writer = self._connection
+        writer.write(_encode(message))
+        await asyncio.wait_for(writer.drain(), REQUEST_TIMEOUT)
+        line = await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)
+        self.requests += 1
+        if not line:
+            raise ConnectionError("服务器关闭了连接")
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise RequestRejected(response.get("error", "服务器返回错误"))
+        self.online = True
+        self.last_error = ""
+        return response
+
+    def _disconnect(self, error=None):
+        if self._connection is not None:
+            self._connection[1].close()
+            self._connection = None
+        if error is not None:
+            self.online = False
+            self.last_error = str(error) or type(error).__name__
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="外星人大战排行榜服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址（局域网共享用0.0.0.0）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--data", help="排行榜数据文件（JSON，定期保存，重启后恢复）")
+    args = parser.parse_args(argv)
+
+    async def serve():
+        server = LeaderboardServer(args.data)
+        port = await server.start(args.host, args.port)
+        print(f"排行榜服务已启动：{args.host}:{port}（{len(server.entries)} 名玩家）")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,160 @@
+import math
+import random
+from array import array
+from itertools import islice
+from operator import add, sub
+
+import pygame
+
+# ===================== 粒子特效（固定容量环形缓冲） =====================
+# 粒子的位置/速度/剩余寿命/种类分别存放在预先分配的array中，容量固定：
+# 写满后覆盖最旧的粒子，满屏导弹爆炸也不会超出帧预算；每个模拟步对整个缓冲批量更新一次
+# （map + operator 整段运算，逐元素的加减在C层完成，没有逐粒子的Python循环；本机没有numpy，不依赖它），
+# 绘制时按剩余寿命挑选预渲染的精灵（逐级变淡），复用同一组 [精灵, [x, y]] 条目一次blits提交
+# 热循环中不创建列表/元组（blits条目在构造时一次分配；批量更新的临时array在同一步内释放）
+PARTICLE_CAPACITY = 1024
+DIRECTIONS = 32  # 预计算的发射方向数（发射时不算三角函数）
+FADE_STEPS = 4  # 每种粒子预渲染的淡出级数
+
+# 特效参数：颜色、半径、初速度范围、寿命范围（模拟步）、每步竖直加速度
+EFFECTS = {
+    'spark': dict(color=(255, 230, 120), radius=2, speed=(1.5, 4.0), life=(6, 14), gravity=0.0),
+    'explosion': dict(color=(255, 140, 40), radius=3, speed=(0.5, 3.5), life=(18, 36), gravity=0.05),
+    'blast': dict(color=(140, 255, 140), radius=3, speed=(3.0, 5.0), life=(10, 18), gravity=0.0),
+}
+EFFECT_NAMES = list(EFFECTS)
+
+
+def _build_sprites():
+    """每种特效 FADE_STEPS 张由淡到浓的圆点精灵；显示已初始化时转换为显示格式（blit更快）"""
+    converted = pygame.display.get_init() and pygame.display.get_surface() is not None
+    sprites = []
+    for name in EFFECT_NAMES:
+        effect = EFFECTS[name]
+        radius = effect['radius']
+        stages = []
+        for stage in range(FADE_STEPS):
+            sprite = pygame.Surface((radius * 2 + 1, radius * 2 + 1), pygame.SRCALPHA)
+            alpha = 255 * (stage + 1) // FADE_STEPS
+            pygame.draw.circle(sprite, effect['color'] + (alpha,), (radius, radius), radius)
+            stages.append(sprite.convert_alpha() if converted else sprite)
+        sprites.append(stages)
+    return sprites
+
+
+class ParticleSystem:
+    """固定容量的粒子池：emit()写入环形缓冲，update()每个模拟步推进一次，draw()一次blits"""
+
+    def __init__(self, capacity=PARTICLE_CAPACITY, seed=None):
+        self.capacity = capacity
+        self.limit = capacity  # 当前可用的槽位数（画质降档时调小，不重新分配缓冲）
+        self.xs = array('f', [0.0]) * capacity
+        self.ys = array('f', [0.0]) * capacity
+        self.vxs = array('f', [0.0]) * capacity
+        self.vys = array('f', [0.0]) * capacity
+        self.gravity = array('f', [0.0]) * capacity  # 每个槽位的竖直加速度（发射时按种类写入，更新时整段相加）
+        self.life = array('H', [0]) * capacity  # 剩余寿命（0=空位）
+        self.max_life = array('H', [1]) * capacity
+        self.kind = array('B', [0]) * capacity
+        self.head = 0  # 下一个写入位置
+        self.live = 0
+        self.dropped = 0  # 因缓冲写满被提前覆盖的粒子数
+        # 粒子自带随机数发生器：不消耗全局random，批量模拟的种子结果不受特效影响
+        self.rng = random.Random(seed)
+        self._directions = [(math.cos(2 * math.pi * i / DIRECTIONS), math.sin(2 * math.pi * i / DIRECTIONS))
+                            for i in range(DIRECTIONS)]
+        self._gravity = [EFFECTS[name]['gravity'] for name in EFFECT_NAMES]
+        self._radius = [EFFECTS[name]['radius'] for name in EFFECT_NAMES]
+        self._sprites = None
+        self._entries = [[None, [0.0, 0.0]] for _ in range(capacity)]  # blits条目，原地改写
+
+    def emit(self, effect, x, y, count):
+        """在(x, y)处向随机方向发射count个粒子；超过容量时覆盖最旧的粒子"""
+        params = EFFECTS[effect]
+        kind = EFFECT_NAMES.index(effect)
+        speed_lo, speed_hi = params['speed']
+        speed_span = speed_hi - speed_lo
+        life_lo, life_hi = params['life']
+        life_span = life_hi - life_lo + 1
+        rand = self.rng.random  # 只用random()一个调用：randrange/randint每次都要走较慢的Python层逻辑
+        directions = self._directions
+        xs, ys, vxs, vys = self.xs, self.ys, self.vxs, self.vys
+        life, max_life = self.life, self.max_life
+        gravity = self._gravity[kind]
+        limit = self.limit
+        i = self.head
+        for _ in range(min(count, limit)):
+            if life[i]:
+                self.dropped += 1
+            else:
+                self.live += 1
+            dx, dy = directions[int(rand() * DIRECTIONS)]
+            speed = speed_lo + speed_span * rand()
+            xs[i] = x
+            ys[i] = y
+            vxs[i] = dx * speed
+            vys[i] = dy * speed
+            life[i] = max_life[i] = life_lo + int(rand() * life_span)
+            self.kind[i] = kind
+            self.gravity[i] = gravity
+            i += 1
+            if i >= limit:
+                i = 0
+        self.head = i
+
+    def update(self):
+        """推进一个模拟步：整段缓冲一起寿命减一（已为0的不变）、速度加重力、位置加速度
+        空槽位也一起计算（不会被绘制，下次发射时整体覆盖），省掉逐个判断"""
+        if not self.live:
+            return
+        n = self.limit
+        life, xs, ys, vxs, vys, gravity = self.life, self.xs, self.ys, self.vxs, self.vys, self.gravity
+        if n < self.capacity:  # 画质降档时只算可用槽位
+            life, xs, ys, vxs, vys, gravity = life[:n], xs[:n], ys[:n], vxs[:n], vys[:n], gravity[:n]
+        life = array('H', map(sub, life, map(bool, life)))
+        vys = array('f', map(add, vys, gravity))
+        self.ys[:n] = array('f', map(add, ys, vys))
+        self.xs[:n] = array('f', map(add, xs, vxs))
+        self.vys[:n] = vys
+        self.life[:n] = life
+        self.live = n - life.count(0)
+
+    def draw(self, surface):
+        if not self.live:
+            return
+        if self._sprites is None:
+            self._sprites = _build_sprites()
+        sprites, radius, entries = self._sprites, self._radius, self._entries
+        xs, ys, life, max_life, kind = self.xs, self.ys, self.life, self.max_life, self.kind
+        n = 0
+        for i in range(self.limit):
+            remaining = life[i]
+            if not remaining:
+                continue
+            k = kind[i]
+            r = radius[k]
+            entry = entries[n]
+            entry[0] = sprites[k][remaining * FADE_STEPS // (max_life[i] + 1)]
+            dest = entry[1]
+            dest[0] = xs[i] - r
+            dest[1] = ys[i] - r
+            n += 1
+        surface.blits(islice(entries, n), doreturn=False)
+
+    def set_limit(self, limit):
+        """调整可用槽位数（不超过容量）；缩小时丢弃超出部分的粒子"""
+        limit = max(1, min(self.capacity, limit))
+        if limit == self.limit:
+            return
+        for i in range(limit, self.limit):
+            if self.life[i]:
+                self.life[i] = 0
+                self.live -= 1
+        self.limit = limit
+        if self.head >= limit:
+            self.head = 0
+
+    def clear(self):
+        for i in range(self.capacity):
+            self.life[i] = 0
+        self.live = 0
\ No newline at end of file
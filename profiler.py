@@ -0,0 +1,223 @@
+import time
+from collections import deque
+
+import pygame
+
+# ===================== 帧耗时统计 + 性能浮层（F3切换） =====================
+
+
+def percentile(sorted_values, p):
+    """已排序序列的百分位数（最近秩法），空序列返回0"""
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[idx]
+
+
+def memory_usage_mb():
+    """进程内存峰值（MB）：POSIX用ru_maxrss；不可用时用tracemalloc（需已启动），都不可用返回None"""
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux单位为KB，macOS为字节
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        import tracemalloc
+        if tracemalloc.is_tracing():
+            return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    return None
+
+
+class FrameStats:
+    """记录每帧耗时（毫秒）：最近window帧用于实时显示，全部样本用于结束时的百分位汇总"""
+
+    def __init__(self, window=120, keep_all=False):
+        self.recent = deque(maxlen=window)
+        self.samples = [] if keep_all else None
+        self._last = None
+
+    def tick(self):
+        """每帧调用一次，记录与上一帧的间隔"""
+        now = time.perf_counter()
+        if self._last is not None:
+            self.add((now - self._last) * 1000)
+        self._last = now
+
+    def add(self, frame_ms):
+        self.recent.append(frame_ms)
+        if self.samples is not None:
+            self.samples.append(frame_ms)
+
+    def recent_mean(self):
+        return sum(self.recent) / len(self.recent) if self.recent else 0.0
+
+    def recent_fps(self):
+        mean = self.recent_mean()
+        return 1000 / mean if mean else 0.0
+
+    def summary(self):
+        values = sorted(self.samples if self.samples is not None else self.recent)
+        total_ms = sum(values)
+        return {
+            'frames': len(values),
+            'avg_fps': len(values) * 1000 / total_ms if total_ms else 0.0,
+            'p50': percentile(values, 50),
+            'p95': percentile(values, 95),
+            'p99': percentile(values, 99),
+            'max': values[-1] if values else 0.0,
+        }
+
+
+class ProfilerOverlay:
+    """性能浮层：FPS、帧耗时、画质档位、当前场景的实体数量（场景实现entity_counts()时显示）"""
+    TOGGLE_KEY = pygame.K_F3
+
+    def __init__(self, manager, font_func, visible=False, quality=None):
+        self.manager = manager
+        self.font_func = font_func
+        self.visible = visible
+        self.quality = quality
+        self.stats = FrameStats()
+
+    def on_frame(self, now):
+        self.stats.tick()
+
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN and event.key == self.TOGGLE_KEY:
+            self.visible = not self.visible
+            return True
+        return False
+
+    def lines(self):
+        recent = sorted(self.stats.recent)
+        lines = [
+            f"FPS {self.stats.recent_fps():5.1f}",
+            f"帧耗时 均值 {self.stats.recent_mean():5.1f}ms | p95 {percentile(recent, 95):5.1f}ms",
+        ]
+        if self.quality is not None:
+            lines.append(f"画质 {self.quality.name}（{'自动' if self.quality.auto else '固定'}）")
+        scene = self.manager.top
+        if scene is not None and hasattr(scene, 'entity_counts'):
+            lines.append(" | ".join(f"{k} {v}" for k, v in scene.entity_counts().items()))
+        return lines
+
+    def draw(self, surface):
+        if not self.visible:
+            return
+        font = self.font_func(20)
+        antialias = self.quality is None or self.quality.settings['antialias']
+        texts = [font.render(line, antialias, (0, 255, 0)) for line in self.lines()]
+        width = max(t.get_width() for t in texts) + 12
+        height = sum(t.get_height() for t in texts) + 8
+        panel = pygame.Surface((width, height), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 160))
+        x = surface.get_width() - width - 5
+        surface.blit(panel, (x, 5))
+        y = 9
+        for text in texts:
+            surface.blit(text, (x + 6, y))
+            y += text.get_height()
+
+# ===================== 自适应画质（按帧耗时升降档） =====================
+# 画质档位从高到低：星星绘制比例、粒子池上限比例、特效粒子数比例、文字抗锯齿
+QUALITY_TIERS = [
+    ('高', dict(stars=1.0, particles=1.0, effects=1.0, antialias=True)),
+    ('中', dict(stars=0.6, particles=0.5, effects=0.6, antialias=True)),
+    ('低', dict(stars=0.3, particles=0.25, effects=0.3, antialias=False)),
+    ('最低', dict(stars=0.1, particles=0.1, effects=0.15, antialias=False)),
+]
+QUALITY_NAMES = [name for name, _ in QUALITY_TIERS]
+
+
+class QualityGovernor:
+    """根据clock.tick测得的帧耗时（不含限帧等待）自动升降画质档位，保持在帧预算以内
+    滞回：最近window帧均值超过预算的degrade_ratio才降一档；估算的上一档耗时低于upgrade_ratio、
+    且持续upgrade_frames帧才升一档。上一档的耗时按降档前后实测的比例估算（没测过时按default_step）。
+    每次切换后等满一个窗口再判断；升档后很快又被降回时，下次升档的等待时间翻倍（避免在两档之间来回跳）"""
+
+    def __init__(self, fps=60, tier=0, auto=True, window=30, degrade_ratio=0.9, upgrade_ratio=0.85,
+                 default_step=0.7, upgrade_frames=180, max_backoff=8):
+        self.budget_ms = 1000 / (fps or 60)  # 不限帧率时仍按60FPS的预算
+        self.tier = tier
+        self.auto = auto
+        self.window = window
+        self.degrade_ratio = degrade_ratio
+        self.upgrade_ratio = upgrade_ratio
+        self.default_step = default_step
+        self.upgrade_frames = upgrade_frames
+        self.max_backoff = max_backoff
+        self.recent = deque(maxlen=window)
+        self.clock = None
+        self.steps = {}  # 档位 -> 本档耗时/上一档耗时（降档时实测）
+        self.backoff = 1  # 升档等待倍数
+        self.since_change = 0  # 上次切换后经过的帧数
+        self.calm_frames = 0  # 连续满足升档条件的帧数
+        self.last_change = None  # 'up' / 'down'
+        self.left_mean = None  # 降档前一个窗口的平均耗时（用于测本档的耗时比例）
+        self.changes = 0
+
+    @property
+    def name(self):
+        return QUALITY_NAMES[self.tier]
+
+    @property
+    def settings(self):
+        return QUALITY_TIERS[self.tier][1]
+
+    def attach(self, manager):
+        """挂到场景管理器上：每帧读取clock的实际耗时"""
+        self.clock = manager.clock
+        self.budget_ms = 1000 / (manager.fps or 60)
+        manager.frame_hooks.append(self.on_frame)
+
+    def set_tier(self, tier, auto=False):
+        self.tier = max(0, min(len(QUALITY_TIERS) - 1, tier))
+        self.auto = auto
+        self.recent.clear()
+        self.since_change = self.calm_frames = 0
+        self.left_mean = None
+
+    def on_frame(self, now):
+        if self.clock is not None:
+            # get_rawtime：上一帧实际用掉的时间（不含tick为限帧而等待的部分）
+            self.add(self.clock.get_rawtime())
+
+    def add(self, frame_ms):
+        """记录一帧耗时，必要时切换档位；返回是否切换"""
+        if not self.auto:
+            return False
+        self.recent.append(frame_ms)
+        self.since_change += 1
+        if self.last_change == 'up' and self.since_change == self.upgrade_frames:
+            self.backoff = 1  # 升档后稳住了：恢复正常的升档等待
+        if self.since_change < self.window:
+            return False
+        mean = sum(self.recent) / len(self.recent)
+        if self.left_mean is not None:
+            # 降档后的第一个完整窗口：记下本档相对上一档的耗时比例
+            self.steps[self.tier] = min(1.0, max(0.1, mean / self.left_mean))
+            self.left_mean = None
+        if mean > self.budget_ms * self.degrade_ratio:
+            self.calm_frames = 0
+            if self.tier == len(QUALITY_TIERS) - 1:
+                return False
+            if self.last_change == 'up' and self.since_change < self.upgrade_frames:
+                self.backoff = min(self.backoff * 2, self.max_backoff)
+            self.left_mean = mean
+            return self._change(1, 'down')
+        if self.tier and mean / self.steps.get(self.tier, self.default_step) < self.budget_ms * self.upgrade_ratio:
+            self.calm_frames += 1
+            if self.calm_frames >= self.upgrade_frames * self.backoff:
+                return self._change(-1, 'up')
+        else:
+            self.calm_frames = 0
+        return False
+
+    def _change(self, step, direction):
+        self.tier += step
+        self.last_change = direction
+        self.changes += 1
+        self.recent.clear()
+        self.since_change = self.calm_frames = 0
+        return True
\ No newline at end of file
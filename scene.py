@@ -0,0 +1,162 @@
+import pygame
+
+from controls import InputMapper
+
+
+# ===================== 场景栈（替代界面函数之间的递归调用） =====================
+class Scene:
+    """场景基类：每个界面实现命令处理/逻辑更新/绘制，通过self.manager切换场景"""
+
+    def __init__(self):
+        self.manager = None
+        self.held = frozenset()  # 本帧按住的持续命令（如move_left），由管理器每帧设置
+
+    def on_enter(self):
+        """场景第一次入栈时调用"""
+
+    def on_resume(self):
+        """上层场景出栈、本场景重新回到栈顶时调用"""
+
+    def on_exit(self):
+        """场景出栈（pop/replace/reset）时调用，用于释放资源、停止音乐等"""
+
+    def on_quit(self):
+        """关闭窗口时对栈中每个场景调用（从栈顶到栈底），用于保存进度"""
+
+    def command_handlers(self):
+        """当前状态下的命令处理表 {命令: 无参方法}；随状态变化的场景（如暂停）返回不同的表"""
+        return {}
+
+    def handle_command(self, command):
+        """分发一条命令，返回是否已处理（未处理时管理器把原始事件交给handle_event）"""
+        handler = self.command_handlers().get(command)
+        if handler is None:
+            return False
+        handler()
+        return True
+
+    def handle_event(self, event):
+        """未绑定为命令的原始事件（文字输入、鼠标等）"""
+
+    def update(self, now):
+        pass
+
+    def draw(self, surface):
+        pass
+
+
+class SceneManager:
+    """显式场景栈 + 唯一主循环；场景切换在当前帧结束后统一执行"""
+
+    def __init__(self, screen, fps=60):
+        self.screen = screen
+        self.fps = fps
+        self.clock = pygame.time.Clock()
+        self.stack = []
+        self._pending = []
+        self.frame_hooks = []  # 每帧逻辑更新后调用 hook(now)，如音频合并播放
+        self.overlays = []  # 叠加在所有场景之上的浮层（如性能浮层），先于场景处理事件
+        self.input = InputMapper()  # 按键 -> 命令（绑定可配置，见controls.py）
+        self.running = False
+
+    @property
+    def top(self):
+        return self.stack[-1] if self.stack else None
+
+    @property
+    def switching(self):
+        """本帧是否已请求切换场景（请求后当前场景不再处理事件/推进模拟）"""
+        return bool(self._pending)
+
+    # ---------------------- 场景切换（延迟到帧末执行） ----------------------
+    def push(self, scene):
+        self._pending.append(("push", scene))
+
+    def pop(self):
+        self._pending.append(("pop", None))
+
+    def replace(self, scene):
+        self._pending.append(("replace", scene))
+
+    def reset(self, scene):
+        """清空整个栈并以scene作为唯一场景（例如回到登录界面）"""
+        self._pending.append(("reset", scene))
+
+    def quit(self):
+        self._pending.append(("quit", None))
+
+    def _apply_pending(self):
+        while self._pending:
+            op, scene = self._pending.pop(0)
+            if op == "push":
+                self._enter(scene)
+            elif op == "pop":
+                self._leave()
+                if self.top:
+                    self.top.on_resume()
+            elif op == "replace":
+                self._leave()
+                self._enter(scene)
+            elif op == "reset":
+                while self.stack:
+                    self._leave()
+                self._enter(scene)
+            elif op == "quit":
+                for s in reversed(self.stack):
+                    s.on_quit()
+                while self.stack:
+                    self._leave()
+                self._pending.clear()
+
+    def _enter(self, scene):
+        scene.manager = self
+        self.stack.append(scene)
+        scene.on_enter()
+
+    def _leave(self):
+        if not self.stack:
+            return
+        scene = self.stack.pop()
+        scene.on_exit()
+        scene.manager = None
+
+    # ---------------------- 主循环 ----------------------
+    def step(self):
+        """执行一帧：事件 -> 逻辑 -> 绘制 -> 应用场景切换"""
+        self.clock.tick(self.fps)
+        now = pygame.time.get_ticks()
+        scene = self.top
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.quit()
+                break
+            if any(overlay.handle_event(event) for overlay in self.overlays):
+                continue
+            # 已经请求切换的场景不再处理本帧剩余事件
+            if not self._pending:
+                command = self.input.translate(event)
+                if command is None or not scene.handle_command(command):
+                    scene.handle_event(event)
+        # 注入的命令（无头运行/回放）与键盘命令走同一条分发路径
+        while self.input.injected and not self._pending:
+            scene.handle_command(self.input.injected.popleft())
+        if not self._pending:
+            scene.held = self.input.held()
+            scene.update(now)
+        for hook in self.frame_hooks:
+            hook(now)
+        if not self._pending:
+            scene.draw(self.screen)
+            for overlay in self.overlays:
+                overlay.draw(self.screen)
+            pygame.display.flip()
+        self._apply_pending()
+
+    def run(self, scene):
+        """以scene为初始场景运行，直到栈空（关闭窗口/退出）"""
+        self._enter(scene)
+        self._apply_pending()
+        self.running = True
+        while self.stack:
+            self.step()
+        self.running = False
\ No newline at end of file
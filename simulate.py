@@ -0,0 +1,217 @@
+import os
+import io
+import csv
+import time
+import random
+import argparse
+import itertools
+import contextlib
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import alien_war
+from waves import WaveTable, SpawnQueue
+
+# ===================== 批量平衡模拟（无界面，多进程） =====================
+# 用法：python simulate.py --level 1 3 5 --weapon normal laser --interval-scale 0.8 1 1.2 --seeds 50
+# 每个参数组合（格子）跑N个种子，每局用虚拟时钟驱动GameScene.update直到通关/死亡/超时，
+# 不初始化显示和音频、不读写存档；结果按格子汇总成表格（可另存CSV）
+
+SIM_FPS = alien_war.FPS
+GRID_PARAMS = ('level', 'weapon', 'pilot', 'interval_scale', 'damage_scale', 'health_scale', 'speed_scale')
+RESULT_COLUMNS = ['clear_rate', 'time_to_clear', 'deaths', 'points', 'kills']
+
+
+# ===================== AI驾驶员 =====================
+# 每帧返回移动方向 'left' / 'right' / None
+def pilot_idle(scene):
+    """原地不动，只靠自动射击"""
+    return None
+
+
+def pilot_tracker(scene):
+    """追踪最低（最危险）的外星人，对准其中心"""
+    if not scene.aliens:
+        return None
+    target = max(scene.aliens, key=lambda alien: alien.y)
+    return _toward(scene.spaceship, target.x + target.width / 2)
+
+
+def pilot_dodger(scene):
+    """有外星人逼近飞船所在列时躲开，否则追踪最低的外星人"""
+    ship = scene.spaceship
+    danger_y = ship.y - ship.height * 2
+    threats = [alien for alien in scene.aliens
+               if alien.y + alien.height > danger_y and alien.x < ship.x + ship.width and ship.x < alien.x + alien.width]
+    if threats:
+        threat = threats[0]
+        ship_center = ship.x + ship.width / 2
+        go_left = threat.x + threat.width / 2 > ship_center and ship.x > 0
+        return 'left' if go_left or ship.x + ship.width >= alien_war.SCREEN_WIDTH else 'right'
+    return pilot_tracker(scene)
+
+
+def _toward(ship, target_x):
+    center = ship.x + ship.width / 2
+    if target_x < center - alien_war.SHIP_SPEED:
+        return 'left'
+    if target_x > center + alien_war.SHIP_SPEED:
+        return 'right'
+    return None
+
+
+PILOTS = {'idle': pilot_idle, 'tracker': pilot_tracker, 'dodger': pilot_dodger}
+
+
+# ===================== 单局模拟 =====================
+class SimGameScene(alien_war.GameScene):
+    """由AI驾驶员操控的GameScene：武器固定、通关（首次升级）即结束、游戏结束不写存档"""
+
+    def __init__(self, level, bullet_type, pilot, seed, interval_scale=1.0):
+        player = alien_war.StressPlayer(level)
+        player.username = f'sim{seed}'
+        player.level_kill_target = alien_war.get_waves().wave(level).kill_target
+        super().__init__(player.username, player=player)
+        self.spawns = SpawnQueue(alien_war.get_waves(), level, seed=seed)
+        self.bullet_type = bullet_type
+        self.pilot = pilot
+        self.weapon_interval = {k: max(1, round(v * interval_scale)) for k, v in self.weapon_interval.items()}
+        self.cleared = False
+
+    def steer(self, now):
+        direction = self.pilot(self)
+        if direction:
+            self.spaceship.move(direction)
+
+    def current_bullet_type(self):
+        return self.bullet_type
+
+    def on_level_up(self):
+        self.cleared = True
+
+    def game_over(self):
+        self.lives_exhausted = True
+
+
+def _scaled_waves(level, seed, health_scale, speed_scale):
+    """按种子生成关卡表，并缩放被模拟关卡的外星人血量/速度（表外关卡先按公式生成再缩放）"""
+    table = WaveTable(screen_width=alien_war.SCREEN_WIDTH, alien_width=alien_war.ALIEN_WIDTH, seed=seed)
+    wave = table.wave(level)
+    table.waves[level] = wave._replace(alien_health=max(1, round(wave.alien_health * health_scale)),
+                                       alien_speed=wave.alien_speed * speed_scale)
+    return table
+
+
+def run_game(task):
+    """在当前进程中模拟一局，返回 (格子参数, 结果字典)"""
+    params, seed, max_seconds = task
+    random.seed(seed)
+    saved_waves, saved_stats = alien_war.WAVES, alien_war.BULLET_STATS
+    try:
+        # 参数通过模块级表注入（每个进程串行执行任务，结束后恢复）
+        alien_war.WAVES = _scaled_waves(params['level'], seed, params['health_scale'], params['speed_scale'])
+        alien_war.BULLET_STATS = {
+            name: dict(stats, damage=max(1, round(stats['damage'] * params['damage_scale'])),
+                       splash_damage=round(stats['splash_damage'] * params['damage_scale']))
+            for name, stats in saved_stats.items()}
+        with contextlib.redirect_stdout(io.StringIO()):
+            scene = SimGameScene(params['level'], params['weapon'], PILOTS[params['pilot']], seed,
+                                 params['interval_scale'])
+            frame = 0
+            max_frames = max_seconds * SIM_FPS
+            while frame < max_frames and not scene.cleared and not scene.lives_exhausted:
+                frame += 1
+                scene.update(frame * 1000 // SIM_FPS)
+    finally:
+        alien_war.WAVES, alien_war.BULLET_STATS = saved_waves, saved_stats
+    return params, {
+        'cleared': scene.cleared,
+        'seconds': frame / SIM_FPS,
+        'deaths': scene.max_lives - scene.current_lives,
+        'points': scene.player.points,
+        'kills': scene.player.kill_count,
+    }
+
+
+# ===================== 汇总 =====================
+def aggregate(results):
+    """按格子汇总：通关率、通关用时中位数、平均死亡次数/积分/击杀"""
+    cells = {}
+    for params, result in results:
+        cells.setdefault(tuple(params[k] for k in GRID_PARAMS), []).append(result)
+    rows = []
+    for key, games in cells.items():
+        clear_times = [g['seconds'] for g in games if g['cleared']]
+        row = dict(zip(GRID_PARAMS, key))
+        row.update(
+            games=len(games),
+            clear_rate=len(clear_times) / len(games),
+            time_to_clear=statistics.median(clear_times) if clear_times else None,
+            deaths=statistics.mean(g['deaths'] for g in games),
+            points=statistics.mean(g['points'] for g in games),
+            kills=statistics.mean(g['kills'] for g in games),
+        )
+        rows.append(row)
+    rows.sort(key=lambda r: tuple(r[k] for k in GRID_PARAMS))
+    return rows
+
+
+def print_table(rows):
+    headers = list(GRID_PARAMS) + ['games'] + RESULT_COLUMNS
+    cells = [[_fmt(row[h]) for h in headers] for row in rows]
+    widths = [max(len(h), *(len(c[i]) for c in cells)) if cells else len(h) for i, h in enumerate(headers)]
+    print("  ".join(h.ljust(w) for h, w in zip(headers, widths)))
+    for c in cells:
+        print("  ".join(v.ljust(w) for v, w in zip(c, widths)))
+
+
+def _fmt(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="外星人大战批量平衡模拟")
+    parser.add_argument("--level", type=int, nargs="+", default=[1])
+    parser.add_argument("--weapon", nargs="+", default=["normal"], choices=sorted(alien_war.BULLET_STATS),
+                        help="子弹类型")
+    parser.add_argument("--pilot", nargs="+", default=["dodger"], choices=sorted(PILOTS))
+    parser.add_argument("--interval-scale", type=float, nargs="+", default=[1.0], help="射击间隔缩放")
+    parser.add_argument("--damage-scale", type=float, nargs="+", default=[1.0], help="子弹伤害缩放")
+    parser.add_argument("--health-scale", type=float, nargs="+", default=[1.0], help="外星人血量缩放")
+    parser.add_argument("--speed-scale", type=float, nargs="+", default=[1.0], help="外星人速度缩放")
+    parser.add_argument("--seeds", type=int, default=20, help="每个格子的局数")
+    parser.add_argument("--max-seconds", type=int, default=180, help="单局模拟时长上限（游戏内秒）")
+    parser.add_argument("--workers", type=int, default=None, help="进程数（默认CPU核数）")
+    parser.add_argument("--output", help="汇总结果另存为CSV")
+    args = parser.parse_args(argv)
+
+    grid = [dict(zip(GRID_PARAMS, combo)) for combo in itertools.product(
+        args.level, args.weapon, args.pilot, args.interval_scale, args.damage_scale,
+        args.health_scale, args.speed_scale)]
+    tasks = [(params, seed, args.max_seconds) for params in grid for seed in range(args.seeds)]
+    print(f"{len(grid)} 个格子 x {args.seeds} 个种子 = {len(tasks)} 局")
+
+    workers = args.workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(run_game, tasks, chunksize=max(1, len(tasks) // (workers * 8))))
+    print(f"耗时 {time.perf_counter() - started:.1f}s")
+
+    rows = aggregate(results)
+    print_table(rows)
+    if args.output:
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(GRID_PARAMS) + ['games'] + RESULT_COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"已保存：{args.output}")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,1093 @@
+import os
+import mmap
+import time
+import zlib
+import queue
+import random
+import struct
+import sqlite3
+import threading
+import functools
+import contextlib
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import credentials
+
+# ===================== 存储层（不依赖pygame，可供命令行/工具直接导入） =====================
+# 路径配置（账号/数据存桌面，易查找）
+DESKTOP_PATH = os.path.join(os.path.expanduser("~"), "Desktop")
+USER_FILE = os.path.join(DESKTOP_PATH, "alien_war_users.dat")  # 玩家数据文件（二进制记录）
+DB_FILE = os.path.join(DESKTOP_PATH, "alien_war_weapons.db")  # 武器数据库
+USER_FILE_HEADER = "username,password,best_score,points,owned_weapons,current_weapon,last_level\n"  # 旧版表头
+
+# 玩家文件读写锁：后台写线程和主线程不会交错读改写同一个文件
+_user_file_lock = threading.RLock()
+
+
+def _with_user_lock(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _user_file_lock:
+            return func(*args, **kwargs)
+    return wrapper
+
+
+# ===================== 后台写入 =====================
+class AsyncWriter:
+    """单线程后台写队列：按提交顺序执行存档操作，主循环不等待磁盘IO"""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name="alien_war_writer", daemon=True)
+                self._thread.start()
+        self._queue.put((func, args, kwargs))
+
+    def flush(self):
+        """等待所有已提交的写入完成（退出/重新读档前调用）"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def _worker(self):
+        while True:
+            func, args, kwargs = self._queue.get()
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                print(f"后台保存失败：{e}")
+            finally:
+                self._queue.task_done()
+
+
+_writer = AsyncWriter()
+
+
+def submit_write(func, *args, **kwargs):
+    """把存档操作放到后台线程执行"""
+    _writer.submit(func, *args, **kwargs)
+
+
+def flush_writes():
+    """等待后台存档全部落盘"""
+    _writer.flush()
+
+
+# ===================== 玩家记录编码（二进制，长度前缀） =====================
+# 快照和日志使用同一种记录：<长度 u32><CRC32 u32><载荷>
+# 载荷 = 定长头 + 用户名UTF-8 + 密码UTF-8 + 已购武器位图（小端，第ID-1位表示拥有该ID的武器）
+# 用户名/密码/武器名中出现逗号、换行都不影响解析；解码只需一次struct.unpack_from加切片
+# 解码时本进程的武器目录里没有的ID（其他进程刚新增的武器，或目录暂时不可读）先重新读一次目录，仍不认识的
+# 原样记在玩家字典的 unknown_weapons / unknown_current 中，编码时写回，不会因为本进程的目录旧了而丢掉已购武器
+USER_FILE_MAGIC = b"AWU1"  # 快照文件头（旧版文本快照没有，据此区分格式）
+OP_PUT, OP_RESET = 1, 2
+_FRAME = struct.Struct("<II")  # 载荷长度, CRC32
+# 操作, 最佳分数, 积分, 当前武器ID（0=普通子弹）, 关卡, 用户名字节数, 密码字节数, 位图字节数
+_RECORD = struct.Struct("<BqqIIHHH")
+
+
+def encode_user_record(op, user=None, weapon_ids=None):
+    """编码一条记录；weapon_ids为 {武器名称: ID}，默认读取武器目录（目录不可读时抛出，不用默认武器的ID写回）"""
+    if user is None:
+        payload = _RECORD.pack(op, 0, 0, 0, 0, 0, 0, 0)
+    else:
+        weapon_ids = weapon_ids if weapon_ids is not None else get_weapon_ids(fallback=False)
+        name = user["username"].encode("utf-8")
+        password = user["password"].encode("utf-8")
+        mask = weapons_to_mask(user["owned_weapons"], weapon_ids) | _kept_unknown_mask(user, weapon_ids)
+        mask_bytes = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+        current_id = weapon_ids.get(user["current_weapon"], 0)
+        unknown_current = user.get("unknown_current")
+        if unknown_current and user["current_weapon"] == '普通子弹' and _weapon_id_alive(unknown_current, weapon_ids):
+            current_id = unknown_current  # 解码时不认识的当前武器（之后没有换过武器）
+        payload = _RECORD.pack(op, user["best_score"], user["points"], current_id,
+                               user["last_level"], len(name), len(password), len(mask_bytes))
+        payload += name + password + mask_bytes
+    return _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def iter_raw_user_records(data, offset=0):
+    """逐条解码 (结束偏移, 操作, 用户名, 密码, 最佳分数, 积分, 武器位图, 当前武器ID, 关卡)；
+    遇到截断或校验失败的记录即停止，调用方比较最后的结束偏移与len(data)判断是否有损坏"""
+    view = memoryview(data)
+    total = len(data)
+    while offset + _FRAME.size <= total:
+        length, crc = _FRAME.unpack_from(data, offset)
+        start = offset + _FRAME.size
+        end = start + length
+        if length < _RECORD.size or end > total or zlib.crc32(view[start:end]) != crc:
+            return
+        op, best_score, points, current_id, last_level, name_len, pw_len, mask_len = _RECORD.unpack_from(data, start)
+        pos = start + _RECORD.size
+        if pos + name_len + pw_len + mask_len != end:
+            return
+        username = bytes(view[pos:pos + name_len]).decode("utf-8")
+        pos += name_len
+        password = bytes(view[pos:pos + pw_len]).decode("utf-8")
+        mask = int.from_bytes(view[pos + pw_len:end], "little")
+        yield end, op, username, password, best_score, points, mask, current_id, last_level
+        offset = end
+
+
+def iter_user_records(data, offset=0):
+    """逐条解码为 (结束偏移, 操作, 玩家字典)；重置记录的玩家字典为None"""
+    weapon_names = {weapon_id: name for name, weapon_id in get_weapon_ids().items()}
+    known = _ids_mask(weapon_names)
+    reloaded = False
+    for end, op, username, password, best_score, points, mask, current_id, last_level in \
+            iter_raw_user_records(data, offset):
+        user = None
+        if op == OP_PUT:
+            if not reloaded and (mask & ~known or current_id and current_id not in weapon_names):
+                # 本进程缓存目录之后其他进程/管理工具新增了武器：重新读取一次
+                reloaded = True
+                reload_weapon_catalog()
+                weapon_names = {weapon_id: name for name, weapon_id in get_weapon_ids().items()}
+                known = _ids_mask(weapon_names)
+            user = {"username": username, "password": password, "best_score": best_score, "points": points,
+                    "owned_weapons": mask_to_weapons(mask, weapon_names) or ['普通子弹'],
+                    "current_weapon": weapon_names.get(current_id, '普通子弹'), "last_level": last_level}
+            if mask & ~known:
+                user["unknown_weapons"] = mask & ~known
+            if current_id and current_id not in weapon_names:
+                user["unknown_current"] = current_id
+        yield end, op, user
+
+
+def _ids_mask(weapon_ids):
+    """一组武器ID对应的位图（参数为 {ID: ...} 或ID的可迭代对象）"""
+    mask = 0
+    for weapon_id in weapon_ids:
+        mask |= 1 << (weapon_id - 1)
+    return mask
+
+
+def _weapon_id_alive(weapon_id, weapon_ids):
+    """编码时目录中有该ID，或ID大于目录中的最大ID（编码用的目录也比它旧）；否则是已删除的武器（ID不复用）"""
+    return weapon_id in weapon_ids.values() or weapon_id > max(weapon_ids.values(), default=0)
+
+
+def _kept_unknown_mask(user, weapon_ids):
+    """解码时不认识、编码时仍然有效的已购武器位（已删除武器的位丢弃）"""
+    unknown = user.get("unknown_weapons", 0)
+    if not unknown:
+        return 0
+    return unknown & (_ids_mask(weapon_ids.values()) | -1 << max(weapon_ids.values(), default=0))
+
+
+def weapons_to_mask(owned_weapons, weapon_ids):
+    """武器名称列表 -> 位图（目录中不存在的武器无法编码，丢弃并提示）"""
+    mask = 0
+    for name in owned_weapons:
+        weapon_id = weapon_ids.get(name)
+        if weapon_id is None:
+            print(f"未知武器（未保存）：{name}")
+            continue
+        mask |= 1 << (weapon_id - 1)
+    return mask
+
+
+def mask_to_weapons(mask, weapon_names):
+    """位图 -> 武器名称列表（按武器ID顺序，目录中已删除的武器跳过）"""
+    owned = []
+    weapon_id = 1
+    while mask:
+        if mask & 1 and weapon_id in weapon_names:
+            owned.append(weapon_names[weapon_id])
+        mask >>= 1
+        weapon_id += 1
+    return owned
+
+
+# ===================== 跨进程锁与退避（多台机器共享网络盘上的存档） =====================
+# 写玩家文件前先拿 USER_FILE.lock 上的咨询锁（fcntl.lockf / msvcrt.locking，网络盘上由锁服务仲裁）；
+# 锁被占用时非阻塞重试，间隔按指数增长并加随机抖动，超过LOCK_TIMEOUT抛出TimeoutError
+LOCK_SUFFIX = ".lock"
+LOCK_TIMEOUT = 10.0  # 等待其他进程释放锁/数据库写锁的最长时间（秒）
+LOCK_BACKOFF = (0.002, 0.2)  # 重试间隔的初始值和上限（秒）
+DB_BUSY_TIMEOUT = 5.0  # SQLite内部等待写锁的时间（秒），超时后再按退避策略重试
+
+
+def _backoff(timeout=None):
+    """退避迭代器：第一次立即返回，之后每次先睡眠（指数增长+抖动）再返回，直到超时"""
+    deadline = time.monotonic() + (LOCK_TIMEOUT if timeout is None else timeout)
+    delay = LOCK_BACKOFF[0]
+    yield
+    while time.monotonic() < deadline:
+        time.sleep(min(delay * random.uniform(0.5, 1.5), max(0.0, deadline - time.monotonic())))
+        delay = min(delay * 2, LOCK_BACKOFF[1])
+        yield
+
+
+class FileLock:
+    """跨进程互斥锁（同一进程内可重入；进程内的线程互斥由_user_file_lock负责）"""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._depth = 0
+
+    def acquire(self, timeout=None):
+        if self._depth:
+            self._depth += 1
+            return
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        for _ in _backoff(timeout):
+            try:
+                if fcntl is not None:
+                    fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            except OSError:
+                continue
+            self._fd, self._depth = fd, 1
+            return
+        os.close(fd)
+        raise TimeoutError(f"等待文件锁超时：{self.path}")
+
+    def release(self):
+        self._depth -= 1
+        if self._depth:
+            return
+        fd, self._fd = self._fd, None
+        try:
+            if fcntl is not None:
+                fcntl.lockf(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+# ===================== 玩家数据持久化（预写日志 + 快照） =====================
+# USER_FILE 是快照，USER_FILE.journal 是预写日志，两者都是上面的二进制记录：
+# 每次修改只追加一条记录（该玩家修改后的完整数据，重放幂等），不再整体重写文件；
+# 日志达到COMPACT_EVERY条时压缩：写临时文件 -> fsync -> os.replace 替换快照 -> 清空日志
+# 启动时 recover_users() 读取快照并重放日志，截掉崩溃时写了一半的尾部记录
+# 快照不存在时从同名.txt的旧版逗号分隔文件读取，第一次压缩即完成迁移（旧文件保留）
+# 多进程共享：所有写入（追加/压缩/截断）都持有文件锁，持锁后先追上其他进程追加的记录再写；
+# 读取不加文件锁，只增量读取日志新增的完整记录（其他进程正在写的半条记录留到下次再读）
+JOURNAL_SUFFIX = ".journal"
+COMPACT_EVERY = 500  # 日志记录数达到该值时压缩为快照
+JOURNAL_FSYNC = True  # 每条日志记录落盘（断电也不丢）；关闭后只保证进程崩溃不丢
+UPDATE_RETRIES = 8  # 乐观更新时记录被其他进程抢先修改的最大重试次数
+
+
+def _fsync_dir(path):
+    """替换文件后同步目录项（Windows不支持，忽略）"""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_snapshot(users, path):
+    """把玩家数据流式写入临时文件并落盘，再原子替换正式文件；返回写入条数"""
+    tmp_path = path + ".tmp"
+    weapon_ids = get_weapon_ids(fallback=False)
+    count = 0
+    with open(tmp_path, "wb") as f:
+        f.write(USER_FILE_MAGIC)
+        for user in users:
+            f.write(encode_user_record(OP_PUT, user, weapon_ids))
+            count += 1
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(path)
+    return count
+
+
+class UserStore:
+    """内存中的玩家表：快照 + 重放日志得到，读取不再扫描文件；其他进程的修改通过增量读取日志同步"""
+
+    def __init__(self, path):
+        self.path = path
+        self.legacy_path = os.path.splitext(path)[0] + ".txt" if path.endswith(".dat") else None
+        self.journal_path = path + JOURNAL_SUFFIX
+        self.lock = FileLock(path + LOCK_SUFFIX)
+        self.users = {}  # 用户名 -> 玩家字典（保持文件顺序）
+        self.versions = {}  # 用户名 -> 本次载入后该玩家被写入的次数（行版本）
+        self.generation = 0  # 每次完整重新载入加1，与行版本一起构成乐观更新的比较对象
+        self.journal_records = 0
+        self.journal_offset = 0  # 已应用到内存的日志字节数
+        self._snapshot_stat = None
+        self._loaded = False
+
+    def _stat_snapshot(self):
+        """快照的(inode, 修改时间, 大小)：被其他进程压缩替换后会变化"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _journal_size(self):
+        try:
+            return os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            return 0
+
+    def refresh(self):
+        """追上其他进程的修改（不加文件锁）：快照被替换或日志变短时完整重载，否则只读取日志新增部分"""
+        if not self._loaded or self._stat_snapshot() != self._snapshot_stat:
+            self.load()
+            return
+        size = self._journal_size()
+        if size < self.journal_offset:
+            self.load()
+        elif size > self.journal_offset:
+            with open(self.journal_path, "rb") as f:
+                f.seek(self.journal_offset)
+                data = f.read()
+            self._replay(data)
+
+    def load(self):
+        """读取快照并重放日志（只应用完整记录，损坏的尾部由持锁写入时截断）"""
+        self.users = {}
+        self.versions = {}
+        self.generation += 1
+        self._snapshot_stat = self._stat_snapshot()
+        source = self.path
+        if self._snapshot_stat is None and self.legacy_path and os.path.exists(self.legacy_path):
+            source = self.legacy_path
+            print(f"从旧版玩家文件迁移：{source}（原文件保留）")
+        for user in _iter_user_file(source):
+            # 重复用户名以第一条为准（与原来登录时按文件顺序匹配一致）
+            self.users.setdefault(user["username"], user)
+        self.journal_records = 0
+        self.journal_offset = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "rb") as f:
+                data = f.read()
+            self._replay(data)
+        self._loaded = True
+
+    def _replay(self, data):
+        """应用从journal_offset开始的一段日志，遇到不完整/损坏的记录停止"""
+        base = self.journal_offset
+        for end, op, user in iter_user_records(data):
+            self._apply(op, user)
+            self.journal_records += 1
+            self.journal_offset = base + end
+
+    def _apply(self, op, user):
+        if op == OP_PUT:
+            self.users[user["username"]] = user
+            self.versions[user["username"]] = self.versions.get(user["username"], 0) + 1
+        elif op == OP_RESET:
+            self.users.clear()
+            self.versions.clear()
+            self.generation += 1
+
+    def version(self, username):
+        return self.generation, self.versions.get(username, 0)
+
+    @contextlib.contextmanager
+    def locked(self):
+        """持有文件锁并追上其他进程的修改；持锁期间日志末尾的半条记录只能是崩溃残留，直接截断"""
+        with self.lock:
+            self.refresh()
+            if self._journal_size() > self.journal_offset:
+                print(f"玩家日志第{self.journal_records + 1}条记录损坏，已丢弃之后的内容")
+                with open(self.journal_path, "r+b") as f:
+                    f.truncate(self.journal_offset)
+            yield self
+
+    def _append(self, op, user=None):
+        """追加一条日志记录并应用到内存，必要时压缩（调用方需持有文件锁）"""
+        self._append_many([(op, user)])
+
+    def _append_many(self, entries):
+        """把多条 (操作, 玩家) 记录一次写入、一次落盘，再应用到内存，必要时压缩（调用方需持有文件锁）"""
+        weapon_ids = get_weapon_ids(fallback=False)
+        data = b"".join(encode_user_record(op, user, weapon_ids) for op, user in entries)
+        with open(self.journal_path, "ab") as f:
+            f.write(data)
+            f.flush()
+            if JOURNAL_FSYNC:
+                os.fsync(f.fileno())
+        for op, user in entries:
+            self._apply(op, user)
+        self.journal_records += len(entries)
+        self.journal_offset += len(data)
+        if self.journal_records >= COMPACT_EVERY:
+            self.compact()
+
+    def insert(self, user):
+        """仅当用户名不存在时写入（持锁检查：多台机器同时注册同名只有一个成功），返回是否写入"""
+        with self.locked():
+            if user["username"] in self.users:
+                return False
+            self._append(OP_PUT, user)
+            return True
+
+    def put_many(self, users, keep_existing=False):
+        """批量写入玩家（整批一次追加日志）：已存在的覆盖，keep_existing时跳过；返回 (新增, 覆盖, 跳过)"""
+        added = updated = skipped = 0
+        with self.locked():
+            batch = {}
+            for user in users:
+                name = user["username"]
+                if name in self.users or name in batch:
+                    if keep_existing:
+                        skipped += 1
+                        continue
+                    updated += 1
+                else:
+                    added += 1
+                batch[name] = user
+            if batch:
+                self._append_many([(OP_PUT, user) for user in batch.values()])
+        return added, updated, skipped
+
+    def update(self, username, mutate):
+        """乐观更新：锁外基于当前版本计算新记录，持锁后版本未变才提交，否则退避后重新计算；
+        连续冲突UPDATE_RETRIES次后改为持锁计算（保证一定能提交，不会饿死）
+        mutate(玩家字典副本) 返回新的玩家字典，返回None表示放弃修改；返回提交的字典（玩家不存在/放弃时为None）"""
+        for attempt, _ in enumerate(_backoff()):
+            pessimistic = attempt + 1 >= UPDATE_RETRIES
+            if not pessimistic:
+                self.refresh()
+                user = self.users.get(username)
+                if user is None:
+                    return None
+                expected = self.version(username)
+                new_user = mutate(dict(user))
+                if new_user is None:
+                    return None
+            with self.locked():
+                if pessimistic:
+                    user = self.users.get(username)
+                    new_user = mutate(dict(user)) if user is not None else None
+                    if new_user is None:
+                        return None
+                elif self.version(username) != expected:
+                    continue
+                self._append(OP_PUT, new_user)
+                return new_user
+        raise TimeoutError(f"玩家 {username} 的记录持续被其他进程修改，更新失败")
+
+    def reset(self):
+        """重置也是一条日志记录，随后立即压缩为空快照"""
+        with self.locked():
+            self._append(OP_RESET)
+            self.compact()
+
+    def replace_all(self, users):
+        """用users整体替换玩家表：持锁并追上其他进程的修改之后才读取users（users应在迭代时才读取数据，
+        不能是锁外准备好的旧列表，否则会覆盖其他机器刚写入的记录）；先完整构建新表再替换"""
+        with self.locked():
+            new_users = {}
+            for user in users:
+                new_users.setdefault(user["username"], user)
+            self.users = new_users
+            self.versions = dict.fromkeys(new_users, 1)
+            self.generation += 1
+            self.compact()
+
+    def compact(self):
+        """内存状态写成新快照后清空日志（快照替换成功前崩溃：旧快照+日志仍完整；调用方需持有文件锁）"""
+        count = _write_snapshot(self.users.values(), self.path)
+        with open(self.journal_path, "wb") as f:
+            f.flush()
+            os.fsync(f.fileno())
+        self.journal_records = 0
+        self.journal_offset = 0
+        self._snapshot_stat = self._stat_snapshot()
+        return count
+
+
+_stores = {}
+
+
+def _store():
+    """当前USER_FILE对应的玩家表（USER_FILE可被管理工具/测试改写，按路径分别缓存）"""
+    store = _stores.get(USER_FILE)
+    if store is None:
+        store = _stores[USER_FILE] = UserStore(USER_FILE)
+    store.refresh()
+    return store
+
+
+def _new_user(username, password):
+    return {"username": username, "password": password, "best_score": 0, "points": 0,
+            "owned_weapons": ['普通子弹'], "current_weapon": '普通子弹', "last_level": 1}
+
+
+@_with_user_lock
+def recover_users():
+    """启动时调用：读取快照、重放日志（截掉损坏的尾部）并压缩，返回玩家数量"""
+    store = _store()
+    with store.locked():
+        if store.journal_records or not os.path.exists(store.path):
+            store.compact()
+        if os.path.exists(store.path + ".tmp"):
+            os.remove(store.path + ".tmp")  # 上次压缩中途崩溃留下的临时文件
+        return len(store.users)
+
+
+@_with_user_lock
+def checkpoint_users(force=False):
+    """把日志压缩进快照（退出时/管理工具直接读取快照文件前调用）；force时即使没有日志也重写快照
+    （内存表按用户名去重、跳过损坏记录，重写即去掉快照中的重复/损坏记录），返回玩家数量"""
+    store = _store()
+    with store.locked():
+        if force or store.journal_records or not os.path.exists(store.path):
+            store.compact()
+        return len(store.users)
+
+
+# ===================== 玩家数据 =====================
+def save_user(username, password):
+    """注册新用户（初始化所有字段，密码加盐哈希后保存；哈希在文件锁外计算）"""
+    return _append_user(username, credentials.hash_password(password))
+
+
+@_with_user_lock
+def _append_user(username, password):
+    return _store().insert(_new_user(username, password))
+
+
+def check_user(username, password):
+    """验证登录：玩家仍存在且会话缓存命中时直接通过；否则校验哈希（锁外计算），明文/旧强度记录顺便升级"""
+    stored = _get_password(username)  # 内存查表：其他机器/管理工具删除或重置的玩家不能凭缓存登录
+    if stored is None:
+        credentials.SESSIONS.forget(username)
+        return False
+    if credentials.SESSIONS.check(username, password):
+        return True
+    ok, needs_upgrade = credentials.verify_password(password, stored)
+    if not ok:
+        return False
+    if needs_upgrade:
+        _set_password(username, stored, credentials.hash_password(password))
+    credentials.SESSIONS.remember(username, password)
+    return True
+
+
+def check_user_async(username, password):
+    """在验证线程上执行check_user，返回Future（登录界面轮询结果，哈希期间界面不卡顿）"""
+    return credentials.run_in_background(check_user, username, password)
+
+
+def save_user_async(username, password):
+    """在验证线程上执行save_user，返回Future"""
+    return credentials.run_in_background(save_user, username, password)
+
+
+@_with_user_lock
+def _get_password(username):
+    """读取用户的密码列（哈希或旧明文），用户不存在返回None"""
+    user = _store().users.get(username)
+    return user["password"] if user else None
+
+
+@_with_user_lock
+def _set_password(username, old_password, new_password):
+    """替换密码列（仅当仍为old_password时，避免覆盖期间被修改过的记录）"""
+    def upgrade(user):
+        return dict(user, password=new_password) if user["password"] == old_password else None
+    return _store().update(username, upgrade) is not None
+
+
+@_with_user_lock
+def reset_users():
+    """删除全部玩家数据（日志中记一条重置并压缩为空快照），并清空登录会话缓存"""
+    _store().reset()
+    credentials.SESSIONS.forget()
+
+
+@_with_user_lock
+def get_user_data(username):
+    """获取玩家核心数据"""
+    user = _store().users.get(username)
+    if user is None:
+        return 0, 0, 1
+    return user["best_score"], user["points"], user["last_level"]
+
+
+@_with_user_lock
+def get_owned_weapons(username):
+    """获取已购武器列表"""
+    user = _store().users.get(username)
+    return list(user["owned_weapons"]) if user else ['普通子弹']
+
+
+@_with_user_lock
+def get_current_weapon(username):
+    """获取上次使用的武器"""
+    user = _store().users.get(username)
+    return user["current_weapon"] if user else '普通子弹'
+
+
+@_with_user_lock
+def update_user_data(username, best_score=0, points=0, current_weapon="", last_level=0):
+    """更新玩家数据（追加一条日志记录；积分是增量，其他机器并发修改时基于最新记录重新计算）"""
+    def apply(user):
+        new_user = dict(
+            user,
+            best_score=max(user["best_score"], best_score) if best_score != 0 else user["best_score"],
+            points=user["points"] + points,
+            current_weapon=current_weapon or user["current_weapon"],
+            last_level=last_level if last_level != 0 else user["last_level"],
+        )
+        if current_weapon:
+            new_user.pop("unknown_current", None)  # 明确换了武器，不再沿用解码时不认识的当前武器
+        return new_user
+    _store().update(username, apply)
+
+
+@_with_user_lock
+def save_owned_weapons(username, owned_weapons):
+    """保存已购武器列表"""
+    _store().update(username, lambda user: dict(user, owned_weapons=list(owned_weapons)))
+
+
+@_with_user_lock
+def purchase_weapon(username, weapon_name):
+    """购买并装备武器：扣积分、加入已购、设为当前武器合并为一条日志记录（一次落盘，要么全部生效要么都不生效）
+    积分以存档中的值为准（提交时比较行版本，其他机器同时修改会基于最新记录重新判断，不会透支）；
+    已拥有的武器直接装备不扣分。返回 (是否成功, 提示信息)"""
+    weapon_info = get_weapon_info(weapon_name)
+    if weapon_info is None:
+        return False, f'武器不存在：{weapon_name}'
+    price = weapon_info[0]
+    result = [False, f'玩家不存在：{username}']
+
+    def buy(user):
+        user.pop("unknown_current", None)  # 装备的武器已明确
+        if weapon_name in user["owned_weapons"]:
+            result[:] = True, f'已拥有{weapon_name}，已装备'
+            return dict(user, current_weapon=weapon_name)
+        if user["points"] < price:
+            result[:] = False, '积分不足，无法购买！'
+            return None
+        result[:] = True, f'购买{weapon_name}成功！'
+        return dict(user, points=user["points"] - price, owned_weapons=user["owned_weapons"] + [weapon_name],
+                    current_weapon=weapon_name)
+    _store().update(username, buy)
+    return tuple(result)
+
+
+# ===================== 批量读写（管理工具使用） =====================
+def parse_user_line(line):
+    """解析旧版逗号分隔文件的一行（仅迁移时使用）；已购武器可能占多列，按首尾固定列定位，无效行返回None"""
+    parts = line.strip().split(",")
+    if len(parts) < 2 or not parts[0]:
+        return None
+    user = {
+        "username": parts[0],
+        "password": parts[1],
+        "best_score": int(parts[2]) if (len(parts) >= 3 and parts[2].isdigit()) else 0,
+        "points": int(parts[3]) if (len(parts) >= 4 and parts[3].isdigit()) else 0,
+        "owned_weapons": ['普通子弹'],
+        "current_weapon": '普通子弹',
+        "last_level": 1,
+    }
+    if len(parts) >= 7:
+        user["owned_weapons"] = [w for w in parts[4:-2] if w] or ['普通子弹']
+        user["current_weapon"] = parts[-2] or '普通子弹'
+        user["last_level"] = int(parts[-1]) if parts[-1].isdigit() else 1
+    return user
+
+
+def _iter_user_file(path):
+    """流式读取快照文件（二进制快照用mmap映射，不整体载入；无文件头的按旧版文本逐行读取）"""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        magic = f.read(len(USER_FILE_MAGIC))
+        if magic == USER_FILE_MAGIC:
+            if os.fstat(f.fileno()).st_size == len(USER_FILE_MAGIC):
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                end = len(USER_FILE_MAGIC)
+                for end, op, user in iter_user_records(data, end):
+                    if op == OP_PUT:
+                        yield user
+                if end != len(data):
+                    print(f"玩家文件在偏移{end}处损坏，之后的记录已忽略：{path}")
+            return
+    with open(path, "r", encoding="utf-8") as f:
+        next(f, None)  # 跳过表头
+        for line in f:
+            if not line.strip():
+                continue
+            user = parse_user_line(line)
+            if user is not None:
+                yield user
+
+
+def iter_users(path=None):
+    """逐个读取玩家数据；默认玩家文件包含日志中尚未压缩的修改"""
+    if path is None or path == USER_FILE:
+        with _user_file_lock:
+            users = [dict(user) for user in _store().users.values()]
+        yield from users
+    else:
+        yield from _iter_user_file(path)
+
+
+@_with_user_lock
+def write_users(users, path=None):
+    """整体写入玩家数据：临时文件+原子替换；写默认玩家文件时同时清空日志"""
+    if path is None or path == USER_FILE:
+        store = _stores.get(USER_FILE) or _stores.setdefault(USER_FILE, UserStore(USER_FILE))
+        store.replace_all(users)
+        return len(store.users)
+    return _write_snapshot(users, path)
+
+
+@_with_user_lock
+def put_users(users, keep_existing=False):
+    """批量新增/覆盖玩家，整批一次追加日志（导入工具按批调用，中途中断时已提交的批次保留）"""
+    return _store().put_many(users, keep_existing)
+
+
+# ===================== 排行榜 =====================
+@_with_user_lock
+def get_all_users_ranking():
+    """获取所有用户排行榜数据（按最佳分数降序）"""
+    ranking = [{
+        "username": user["username"],
+        "best_score": user["best_score"],
+        "points": user["points"],
+        "last_level": user["last_level"]
+    } for user in _store().users.values()]
+
+    # 按最佳分数降序排序
+    ranking.sort(key=lambda x: x["best_score"], reverse=True)
+    return ranking
+
+
+def export_full_ranking_data(ranking=None, export_path=None):
+    """导出完整排行榜数据到桌面（可传入已排好序的排行榜和导出路径）"""
+    if ranking is None:
+        ranking = get_all_users_ranking()
+    if not ranking:
+        return False, "暂无用户数据可导出"
+
+    # 生成导出文件名（带时间戳）
+    to_desktop = export_path is None
+    if to_desktop:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        export_filename = f"alien_war_full_ranking_{timestamp}.txt"
+        export_path = os.path.join(DESKTOP_PATH, export_filename)
+
+    try:
+        with open(export_path, "w", encoding="utf-8") as f:
+            f.write("===== 外星人大战完整排行榜数据 =====\n")
+            f.write(f"导出时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write("排名\t用户名\t最佳分数\t当前积分\t最高关卡\n")
+            f.write("-" * 60 + "\n")
+
+            for idx, user in enumerate(ranking, 1):
+                f.write(f"{idx}\t{user['username']}\t{user['best_score']}\t{user['points']}\t{user['last_level']}\n")
+
+            f.write("=" * 60 + "\n")
+        return True, "完整排行榜已导出到桌面" if to_desktop else f"完整排行榜已导出到 {export_path}"
+    except Exception as e:
+        return False, f"导出失败：{str(e)}"
+
+
+# ===================== 武器目录 =====================
+# 武器ID（id INTEGER PRIMARY KEY AUTOINCREMENT，即rowid别名，VACUUM不会重排，删除后也不会再分配）用于玩家记录中的已购武器位图
+# 目录的种子数据在 alien_war_weapons.txt（ID固定写在表里）；文件缺失时使用下面的内置默认武器
+WEAPON_FILE = "alien_war_weapons.txt"
+DEFAULT_WEAPONS = [
+    # (ID, 名称, 价格, 伤害, 子弹类型)
+    (1, '普通子弹', 0, 10, 'normal'),
+    (2, '激光', 500, 20, 'laser'),
+    (3, '导弹', 1000, 30, 'missile'),
+    (4, '超级激光', 2000, 25, 'super_laser'),
+]
+_weapon_catalog = None
+_weapon_ids = None
+
+
+def _is_busy(error):
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in str(error) or "busy" in str(error))
+
+
+@contextlib.contextmanager
+def _db_write():
+    """武器库写事务：BEGIN IMMEDIATE 先拿写锁再读改写（多台机器共享同一个数据库时不会互相覆盖）；
+    SQLite内部等待DB_BUSY_TIMEOUT后仍被占用时按退避策略重试，超过LOCK_TIMEOUT抛出TimeoutError"""
+    conn = sqlite3.connect(DB_FILE, timeout=DB_BUSY_TIMEOUT, isolation_level=None)
+    try:
+        for _ in _backoff():
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                break
+            except sqlite3.OperationalError as e:
+                if not _is_busy(e):
+                    raise
+        else:
+            raise TimeoutError(f"等待武器库写锁超时：{DB_FILE}")
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+    finally:
+        conn.close()
+
+
+def load_weapon_file(path=WEAPON_FILE):
+    """读取武器种子表 [(ID, 名称, 价格, 伤害, 子弹类型), ...]；无效/重复的行跳过，文件不存在时返回内置默认武器"""
+    import csv  # 只有迁移/重置时才用到，不计入存储层的导入耗时
+    try:
+        f = open(path, "r", encoding="utf-8")
+    except FileNotFoundError:
+        print(f"未找到武器表 {path}，使用内置默认武器")
+        return list(DEFAULT_WEAPONS)
+    weapons = []
+    ids, names = set(), set()
+    with f:
+        for line_no, row in enumerate(csv.DictReader(f), 2):
+            try:
+                weapon = (int(row['id']), row['name'].strip(), int(row['price']), int(row['damage']),
+                          row['bullet_type'].strip())
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                print(f"武器表第{line_no}行无效：{e}")
+                continue
+            if weapon[0] < 1 or not weapon[1] or weapon[0] in ids or weapon[1] in names:
+                print(f"武器表第{line_no}行：ID或名称无效/重复，已跳过")
+                continue
+            ids.add(weapon[0])
+            names.add(weapon[1])
+            weapons.append(weapon)
+    return weapons
+
+
+def _seed_weapons(conn, path=WEAPON_FILE):
+    """批量写入种子表中还没有的武器（按ID/名称去重，不覆盖管理员改过的数据），返回新增数量"""
+    return conn.executemany('INSERT OR IGNORE INTO weapons (id, name, price, damage, bullet_type) VALUES (?,?,?,?,?)',
+                            load_weapon_file(path)).rowcount
+
+
+# ===================== 武器库结构迁移 =====================
+# schema_version表记录已执行的迁移；迁移按版本号顺序执行，每个都可以重复执行（IF NOT EXISTS / INSERT OR IGNORE），
+# 旧版本留下的库（已有weapons表、没有版本表）也能直接迁移。启动时结构已是最新则只读一次版本号，不开写事务
+def _weapons_columns(conn):
+    return [row[1] for row in conn.execute('PRAGMA table_info(weapons)')]
+
+
+def _create_weapons_table(conn):
+    # 最初版本的游戏建的表是 name TEXT PRIMARY KEY、没有id列，后续迁移的 INSERT (id, ...) 会失败，先重建为带ID的表
+    # （已记录版本1的库都是这里建的带id列的表，对它们没有影响）
+    columns = _weapons_columns(conn)
+    if columns and 'id' not in columns:
+        _rebuild_weapons_table(conn)
+        return
+    conn.execute('CREATE TABLE IF NOT EXISTS weapons (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL, '
+                 'price INTEGER, damage INTEGER, bullet_type TEXT)')
+
+
+def _rebuild_weapons_table(conn, path=WEAPON_FILE):
+    """weapons表重建为AUTOINCREMENT（保留原ID）：普通的INTEGER PRIMARY KEY在删除最大ID的武器后会把该ID分给下一个新武器，
+    买过被删武器的玩家位图就直接变成拥有（甚至装备着）新武器；已经是该结构时不做任何事
+    没有id列的旧表按名称沿用种子表中的ID（与旧版玩家文件按名称记录的已购武器对应），种子表外的武器排在种子ID之后"""
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='weapons'").fetchone()
+    if row and 'AUTOINCREMENT' in row[0].upper():
+        return
+    conn.execute('CREATE TABLE weapons_new (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE NOT NULL, '
+                 'price INTEGER, damage INTEGER, bullet_type TEXT)')
+    if row and 'id' in _weapons_columns(conn):
+        conn.execute('INSERT INTO weapons_new (id, name, price, damage, bullet_type) '
+                     'SELECT id, name, price, damage, bullet_type FROM weapons ORDER BY id')
+    elif row:
+        seed_ids = {name: weapon_id for weapon_id, name, _, _, _ in load_weapon_file(path)}
+        next_id = max(seed_ids.values(), default=0)
+        rows = []
+        for name, price, damage, bullet_type in conn.execute(
+                'SELECT name, price, damage, bullet_type FROM weapons ORDER BY rowid'):
+            weapon_id = seed_ids.get(name)
+            if weapon_id is None:
+                next_id += 1
+                weapon_id = next_id
+            rows.append((weapon_id, name, price, damage, bullet_type))
+        conn.executemany('INSERT INTO weapons_new (id, name, price, damage, bullet_type) VALUES (?,?,?,?,?)', rows)
+    if row:
+        conn.execute('DROP TABLE weapons')
+    conn.execute('ALTER TABLE weapons_new RENAME TO weapons')
+
+
+WEAPON_MIGRATIONS = [
+    # (版本号, 说明, 迁移函数(conn))：只能在末尾追加，已发布的迁移不能修改
+    (1, '建立武器表', _create_weapons_table),
+    (2, '从武器表导入默认武器', _seed_weapons),
+    (3, '武器ID只增不复用', _rebuild_weapons_table),
+]
+
+
+def schema_version(conn):
+    """已执行到的迁移版本号（没有版本表返回0）"""
+    try:
+        return conn.execute('SELECT MAX(version) FROM schema_version').fetchone()[0] or 0
+    except sqlite3.OperationalError as e:
+        if 'no such table' not in str(e):
+            raise
+        return 0
+
+
+def migrate(conn, migrations=WEAPON_MIGRATIONS):
+    """在调用方的写事务中按顺序执行还没执行过的迁移，返回执行的个数"""
+    conn.execute('CREATE TABLE IF NOT EXISTS schema_version '
+                 '(version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at TEXT NOT NULL)')
+    current = schema_version(conn)
+    applied = 0
+    for version, name, func in migrations:
+        if version <= current:
+            continue
+        func(conn)
+        conn.execute('INSERT INTO schema_version (version, name, applied_at) VALUES (?,?,?)',
+                     (version, name, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        applied += 1
+    return applied
+
+
+def _is_corrupt(error):
+    return isinstance(error, sqlite3.DatabaseError) and ("not a database" in str(error) or "malformed" in str(error))
+
+
+def _migrate_weapon_db():
+    conn = sqlite3.connect(DB_FILE, timeout=DB_BUSY_TIMEOUT)
+    try:
+        current = schema_version(conn)
+    finally:
+        conn.close()
+    if current >= WEAPON_MIGRATIONS[-1][0]:
+        return 0
+    with _db_write() as conn:
+        # 拿到写锁后重新读版本：另一台机器可能刚刚迁移完
+        return migrate(conn)
+
+
+def init_weapon_db():
+    """把武器库迁移到最新结构，返回执行的迁移个数（已是最新时为0，不写数据库）
+    文件损坏时改名为 .corrupt 保留后重建一次；被其他机器占用不是损坏，直接抛出"""
+    global _weapon_catalog, _weapon_ids
+    _weapon_catalog = _weapon_ids = None
+    try:
+        return _migrate_weapon_db()
+    except sqlite3.DatabaseError as e:
+        if not _is_corrupt(e):
+            raise
+        print(f"武器数据库损坏：{e}，已改名为 {DB_FILE}.corrupt 后重建")
+        os.replace(DB_FILE, DB_FILE + ".corrupt")
+    return _migrate_weapon_db()
+
+
+def seed_weapons(path=WEAPON_FILE):
+    """把种子表中新增的武器写入目录（已有的武器不变），返回新增数量"""
+    global _weapon_catalog, _weapon_ids
+    with _db_write() as conn:
+        added = _seed_weapons(conn, path)
+    _weapon_catalog = _weapon_ids = None
+    return added
+
+
+def reset_weapon_catalog(path=WEAPON_FILE):
+    """武器目录恢复为种子表（清空和重新写入在同一个事务中，其他机器不会读到空表）"""
+    global _weapon_catalog, _weapon_ids
+    with _db_write() as conn:
+        conn.execute('DELETE FROM weapons')
+        _seed_weapons(conn, path)
+    _weapon_catalog = _weapon_ids = None
+
+
+def get_weapon_catalog():
+    """读取武器目录 {名称: (价格, 伤害, 子弹类型)}，首次读取后缓存在进程内"""
+    global _weapon_catalog
+    if _weapon_catalog is None:
+        conn = sqlite3.connect(DB_FILE, timeout=DB_BUSY_TIMEOUT)
+        try:
+            rows = conn.execute('SELECT name, price, damage, bullet_type FROM weapons').fetchall()
+        finally:
+            conn.close()
+        _weapon_catalog = {name: (price, damage, bullet_type) for name, price, damage, bullet_type in rows}
+    return _weapon_catalog
+
+
+def get_weapon_ids(fallback=True):
+    """武器名称 -> ID（已购武器位图中的第ID-1位），首次读取后缓存；
+    武器库不可读时：fallback为True返回默认武器的ID（只用于解码，不缓存），否则抛出（编码写回不能用不完整的目录）"""
+    global _weapon_ids
+    if _weapon_ids is None:
+        try:
+            conn = sqlite3.connect(DB_FILE, timeout=DB_BUSY_TIMEOUT)
+            try:
+                rows = conn.execute('SELECT rowid, name FROM weapons').fetchall()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            if not fallback:
+                raise
+            return {name: weapon_id for weapon_id, name, _, _, _ in DEFAULT_WEAPONS}
+        _weapon_ids = {name: weapon_id for weapon_id, name in rows}
+    return _weapon_ids
+
+
+def reload_weapon_catalog():
+    """丢弃本进程缓存的武器目录，下次读取时重新查询（其他进程/管理工具修改了目录）"""
+    global _weapon_catalog, _weapon_ids
+    _weapon_catalog = _weapon_ids = None
+
+
+def get_weapon_info(weapon_name):
+    """查询单个武器 (价格, 伤害, 子弹类型)，不存在返回None"""
+    return get_weapon_catalog().get(weapon_name)
+
+
+def get_bullet_type(weapon_name):
+    """武器对应的子弹类型（未知武器按普通子弹处理）"""
+    info = get_weapon_info(weapon_name)
+    return info[2] if info else 'normal'
+
+
+def save_weapon(name, price, damage, bullet_type):
+    """新增或修改武器"""
+    global _weapon_catalog, _weapon_ids
+    with _db_write() as conn:
+        # 按名称更新而不是INSERT OR REPLACE：替换会删除旧行并分配新ID，玩家位图随之失效
+        conn.execute('INSERT INTO weapons (name, price, damage, bullet_type) VALUES (?,?,?,?) '
+                     'ON CONFLICT(name) DO UPDATE SET price=excluded.price, damage=excluded.damage, '
+                     'bullet_type=excluded.bullet_type',
+                     (name, price, damage, bullet_type))
+    _weapon_catalog = _weapon_ids = None
+
+
+def delete_weapon(name):
+    """删除武器，返回是否存在该武器"""
+    global _weapon_catalog, _weapon_ids
+    with _db_write() as conn:
+        deleted = conn.execute('DELETE FROM weapons WHERE name=?', (name,)).rowcount
+    _weapon_catalog = _weapon_ids = None
+    return deleted > 0
\ No newline at end of file
@@ -1,6 +1,8 @@
 import sqlite3
 import csv
 import pygame
+import credentials
+import storage
 # 导入所有需要的常量
 from config import (
     DB_FILE, SOUND_DIR, IMAGE_DIR,
@@ -10,7 +12,7 @@ from config import (
 
 # ===================== 数据库工具 =====================
 def init_db():
-    """初始化数据库（创建表+默认武器）"""
+    """初始化数据库（创建玩家表；武器表结构和默认武器与游戏共用storage的迁移，种子数据来自alien_war_weapons.txt）"""
     conn = sqlite3.connect(DB_FILE)
     c = conn.cursor()
 
@@ -22,28 +24,43 @@ def init_db():
                   best_score INTEGER DEFAULT 0,
                   total_points INTEGER DEFAULT 0)''')
 
-    # 武器商店表
-    c.execute('''CREATE TABLE IF NOT EXISTS weapons
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  name TEXT UNIQUE NOT NULL,
-                  damage INTEGER NOT NULL,
-                  price INTEGER NOT NULL,
-                  bullet_type TEXT NOT NULL)''')
-
-    # 初始化默认武器
-    c.execute('SELECT COUNT(*) FROM weapons')
-    if c.fetchone()[0] == 0:
-        default_weapons = [
-            ('普通子弹', 10, 0, 'normal'),
-            ('激光炮', 30, 50, 'laser'),
-            ('导弹', 50, 100, 'missile')
-        ]
-        c.executemany('INSERT INTO weapons VALUES (NULL,?,?,?,?)', default_weapons)
+    # 武器商店表：按版本执行未执行过的迁移（已是最新时不做任何修改）
+    storage.migrate(conn)
+    _reconcile_seed_ids(conn)
 
     conn.commit()
     conn.close()
 
 
+def _reconcile_seed_ids(conn):
+    """种子武器改用种子表中的ID，与游戏武器库的 ID->名称 一致：旧版本在本库中建的默认武器（如ID 2的'激光炮'）
+    占着种子ID时改用新ID，名称相同但ID不同的种子武器改回种子ID，缺少的种子武器补上；已一致时不修改。
+    本库的武器ID没有被其他数据引用，可以直接改号（游戏武器库的ID是玩家位图的位，不能这样改）。返回改号的武器数"""
+    seeds = storage.load_weapon_file()
+    seed_ids = {name: weapon_id for weapon_id, name, _, _, _ in seeds}
+    rows = dict(conn.execute('SELECT name, id FROM weapons').fetchall())
+    try:
+        sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name='weapons'").fetchone()
+    except sqlite3.OperationalError:
+        sequence = None
+    next_id = max([0, sequence[0] if sequence else 0] + list(rows.values()) + list(seed_ids.values()))
+    moves = {}
+    for name, weapon_id in rows.items():
+        if name in seed_ids:
+            if weapon_id != seed_ids[name]:
+                moves[name] = seed_ids[name]
+        elif weapon_id in seed_ids.values():
+            next_id += 1
+            moves[name] = next_id
+    if moves:
+        print("武器ID与种子表对齐：" + "，".join(f"{name} {rows[name]}->{weapon_id}" for name, weapon_id in moves.items()))
+        # 先全部改成负数ID再改为目标ID，互换ID时不会撞上主键
+        conn.executemany('UPDATE weapons SET id=-id WHERE name=?', [(name,) for name in moves])
+        conn.executemany('UPDATE weapons SET id=? WHERE name=?', [(weapon_id, name) for name, weapon_id in moves.items()])
+    conn.executemany('INSERT OR IGNORE INTO weapons (id, name, price, damage, bullet_type) VALUES (?,?,?,?,?)', seeds)
+    return len(moves)
+
+
 def export_data(filename_prefix):
     """导出玩家/武器数据到CSV"""
     conn = sqlite3.connect(DB_FILE)
@@ -58,7 +75,7 @@ def export_data(filename_prefix):
         writer.writerows(players)
 
     # 导出武器数据
-    c.execute('SELECT * FROM weapons')
+    c.execute('SELECT id, name, damage, price, bullet_type FROM weapons')
     weapons = c.fetchall()
     with open(f'{filename_prefix}_weapons.csv', 'w', newline='', encoding='utf-8') as f:
         writer = csv.writer(f)
@@ -85,7 +102,7 @@ def import_data(player_file, weapon_file):
         with open(weapon_file, 'r', encoding='utf-8') as f:
             reader = csv.reader(f)
             next(reader)  # 跳过表头
-            c.executemany('REPLACE INTO weapons VALUES (?,?,?,?,?)', reader)
+            c.executemany('REPLACE INTO weapons (id, name, damage, price, bullet_type) VALUES (?,?,?,?,?)', reader)
 
         conn.commit()
         return True
@@ -162,21 +179,35 @@ def load_image(filename, width, height):
 
 # ===================== 验证工具 =====================
 def login(username, password):
-    """玩家登录验证"""
+    """玩家登录验证（明文旧记录在验证成功后升级为哈希）"""
+    if credentials.SESSIONS.check(username, password):
+        return True
     conn = sqlite3.connect(DB_FILE)
     c = conn.cursor()
-    c.execute('SELECT * FROM players WHERE username=? AND password=?', (username, password))
-    result = c.fetchone()
-    conn.close()
-    return result is not None
+    try:
+        c.execute('SELECT password FROM players WHERE username=?', (username,))
+        row = c.fetchone()
+        if row is None:
+            return False
+        ok, needs_upgrade = credentials.verify_password(password, row[0])
+        if ok and needs_upgrade:
+            c.execute('UPDATE players SET password=? WHERE username=? AND password=?',
+                      (credentials.hash_password(password), username, row[0]))
+            conn.commit()
+    finally:
+        conn.close()
+    if ok:
+        credentials.SESSIONS.remember(username, password)
+    return ok
 
 
 def register(username, password):
-    """玩家注册"""
+    """玩家注册（保存加盐哈希）"""
+    password_hash = credentials.hash_password(password)
     conn = sqlite3.connect(DB_FILE)
     c = conn.cursor()
     try:
-        c.execute('INSERT INTO players (username, password) VALUES (?, ?)', (username, password))
+        c.execute('INSERT INTO players (username, password) VALUES (?, ?)', (username, password_hash))
         conn.commit()
         return True
     except sqlite3.IntegrityError:
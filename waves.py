@@ -0,0 +1,143 @@
+import csv
+import heapq
+import random
+from collections import namedtuple
+
+from config import (
+    SCREEN_WIDTH, BASE_ALIEN_SPEED, BASE_ALIEN_HEALTH, BASE_ALIEN_POINTS, ALIEN_COUNT_PER_LEVEL
+)
+
+# ===================== 关卡/波次表（数据驱动，不依赖pygame） =====================
+# 每关参数从 alien_war_waves.txt 读取；表中没有的关卡按config.py中的平衡常数外推
+WAVE_FILE = "alien_war_waves.txt"
+FORMATIONS = ('random', 'line', 'v', 'columns')
+SPAWN_Y_RANGE = (-100, -50)  # 出生点纵坐标范围（屏幕上方）
+
+Wave = namedtuple('Wave', [
+    'level', 'alien_count', 'alien_speed', 'alien_health', 'kill_target', 'score', 'points',
+    'spawn_interval', 'formation', 'star_count', 'star_speed',
+])
+
+_FIELD_TYPES = {
+    'level': int, 'alien_count': int, 'alien_speed': float, 'alien_health': int, 'kill_target': int,
+    'score': int, 'points': int, 'spawn_interval': int, 'formation': str, 'star_count': int,
+    'star_speed': float,
+}
+
+
+def default_wave(level):
+    """按原有公式外推关卡参数（表外关卡使用）"""
+    return Wave(
+        level=level,
+        alien_count=5 + level * ALIEN_COUNT_PER_LEVEL,
+        alien_speed=BASE_ALIEN_SPEED + (level - 1) * 0.5,
+        alien_health=BASE_ALIEN_HEALTH + (level - 1) * 5,
+        kill_target=10 * level,
+        score=BASE_ALIEN_POINTS * level,
+        points=5 * level,
+        spawn_interval=60,
+        formation='random',
+        star_count=100 + level * 10,
+        star_speed=(level - 1) * 0.2,
+    )
+
+
+class WaveTable:
+    """关卡表 + 预计算的出生时间表（每关只计算一次）"""
+
+    def __init__(self, path=WAVE_FILE, screen_width=SCREEN_WIDTH, alien_width=50, seed=None):
+        """seed为None时每次启动随机阵型位置；批量模拟时传入固定seed保证可复现"""
+        self.screen_width = screen_width
+        self.alien_width = alien_width
+        self.seed = seed
+        self.waves = {}
+        self._schedules = {}
+        self.load(path)
+        for level in self.waves:
+            self.schedule(level)
+
+    def load(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line_no, row in enumerate(csv.DictReader(f), 2):
+                    try:
+                        wave = Wave(**{k: _FIELD_TYPES[k](row[k]) for k in Wave._fields})
+                    except (KeyError, TypeError, ValueError) as e:
+                        print(f"关卡表第{line_no}行无效：{e}")
+                        continue
+                    if wave.formation not in FORMATIONS:
+                        print(f"关卡表第{line_no}行：未知阵型 {wave.formation}，改用random")
+                        wave = wave._replace(formation='random')
+                    self.waves[wave.level] = wave
+        except FileNotFoundError:
+            print(f"未找到关卡表 {path}，全部关卡按公式生成")
+
+    def wave(self, level):
+        return self.waves.get(level) or default_wave(level)
+
+    def schedule(self, level):
+        """预计算本关首波出生表：[(相对出生时间ms, x, y), ...]，按时间排序"""
+        if level not in self._schedules:
+            wave = self.wave(level)
+            rng = random.Random(None if self.seed is None else self.seed * 1000003 + level)
+            positions = self._formation(wave.formation, wave.alien_count, rng)
+            self._schedules[level] = tuple((i * wave.spawn_interval, x, y) for i, (x, y) in enumerate(positions))
+        return self._schedules[level]
+
+    def _formation(self, formation, count, rng):
+        max_x = self.screen_width - self.alien_width
+        y_top, y_bottom = SPAWN_Y_RANGE
+        if formation == 'line':
+            step = max_x / max(1, count - 1)
+            return [(round(i * step), y_bottom) for i in range(count)]
+        if formation == 'v':
+            center = max_x // 2
+            step = max_x / max(2, count)
+            positions = []
+            for i in range(count):
+                k = (i + 1) // 2
+                side = -1 if i % 2 else 1
+                positions.append((min(max_x, max(0, round(center + side * k * step))), y_bottom - k * 10))
+            return positions
+        if formation == 'columns':
+            columns = [round(max_x * c / 4) for c in range(5)]
+            return [(columns[i % 5], y_bottom - (i // 5) * (self.alien_width + 10)) for i in range(count)]
+        return [(rng.randint(0, max_x), rng.randint(y_top, y_bottom)) for _ in range(count)]
+
+
+class SpawnQueue:
+    """按时间出队的出生队列：首波来自预计算表，被消灭/飞出的外星人以补位方式重新入队"""
+
+    def __init__(self, table, level, seed=None):
+        self.table = table
+        self.level = level
+        self.wave = table.wave(level)
+        self._heap = [(t, i, x, y) for i, (t, x, y) in enumerate(table.schedule(level))]
+        heapq.heapify(self._heap)
+        self._seq = len(self._heap)
+        self._rng = random.Random(seed)
+        self.start_time = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def pop_due(self, now):
+        """取出所有到期的出生点 [(x, y), ...]；第一次调用时开始计时"""
+        if self.start_time is None:
+            self.start_time = now
+        elapsed = now - self.start_time
+        due = []
+        while self._heap and self._heap[0][0] <= elapsed:
+            _, _, x, y = heapq.heappop(self._heap)
+            due.append((x, y))
+        return due
+
+    def respawn(self, now, delay=0):
+        """补位：在随机位置安排一个新外星人"""
+        if self.start_time is None:
+            self.start_time = now
+        max_x = self.table.screen_width - self.table.alien_width
+        x = self._rng.randint(0, max_x)
+        y = self._rng.randint(*SPAWN_Y_RANGE)
+        heapq.heappush(self._heap, (now - self.start_time + delay, self._seq, x, y))
+        self._seq += 1
\ No newline at end of file